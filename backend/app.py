@@ -2,14 +2,25 @@ from flask import Flask, jsonify, session
 from flask_session import Session
 from flask_cors import CORS
 from config import Config
+import threading
 import traceback
 from routes.auth_routes import oauth
+from commands import register_commands
+from services.indexes import ensure_indexes
+from services.storage import UploadRequest
+from services.paper_search import refresh_search_index
+from werkzeug.exceptions import HTTPException
 
 # Import extensions from extensions.py
 from extensions import mongo, jwt, bcrypt
 
 app = Flask(__name__)
+# Uploaded files are streamed into the blob store while they are hashed
+app.request_class = UploadRequest
 app.config["MONGO_URI"] = Config.MONGO_URI
+# Requests over the upload limit (plus room for the form fields) are refused before the body is read
+app.config["MAX_CONTENT_LENGTH"] = Config.MAX_UPLOAD_BYTES + 1024 * 1024
+app.config["USE_X_SENDFILE"] = Config.FILE_SERVING == "x-sendfile"
 # app.config["JWT_SECRET_KEY"] = Config.JWT_SECRET_KEY
 app.config["SECRET_KEY"] = Config.SECRET_KEY  # session security
 
@@ -25,6 +36,8 @@ mongo.init_app(app)
 bcrypt.init_app(app)
 oauth.init_app(app)
 
+register_commands(app)
+
 # CORS(app, resources={r"/*": {"origins": "http://localhost:5173"}}, supports_credentials=True)
 CORS(app, supports_credentials=True) 
 
@@ -32,6 +45,9 @@ try:
     # Test MongoDB connection
     mongo.db.list_collection_names()
     print("✅ Connected to MongoDB successfully!")
+    ensure_indexes()
+    # Build the search index before the first search asks for it
+    threading.Thread(target=refresh_search_index, daemon=True).start()
 except Exception as e:
     print("❌ Error connecting to MongoDB:", e)
 
@@ -46,6 +62,9 @@ for bp, prefix in all_routes:
 # Global error handler with detailed logs
 @app.errorhandler(Exception)
 def handle_exception(e):
+    # Keep the status of HTTP errors such as 413 Request Entity Too Large
+    if isinstance(e, HTTPException):
+        return jsonify({"error": e.description}), e.code
     error_message = traceback.format_exc()
     print("🚨 ERROR:", error_message)  # Logs error to console
     return jsonify({"error": str(e)}), 500
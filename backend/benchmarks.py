@@ -0,0 +1,212 @@
+import math
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import numpy as np
+from bson import ObjectId
+from flask import current_app
+from pymongo import MongoClient, monitoring
+from extensions import mongo
+from routes.conference_routes import attach_conference_relations
+from services.auto_assignment import FORBIDDEN, LOAD_SLACK, solve_assignment
+from services.reviewer_stats import STAT_FIELDS, compute_reviewer_totals, find_paper_conference, review_contribution
+
+# Benchmarks run against an empty <database>_benchmark database on the same
+# server, which is dropped again afterwards, so they never touch real data.
+READ_COMMANDS = {"find", "aggregate", "count", "distinct"}
+POSITIONS = ("superchair", "track_chair", "pc_member")
+
+
+class QueryCounter(monitoring.CommandListener):
+    """Counts the read commands sent by the benchmark client (getMore batches are not queries)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name in READ_COMMANDS:
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+@contextmanager
+def scratch_database():
+    """Points mongo.db at an empty scratch database for the block. Yields the QueryCounter of its client."""
+    counter = QueryCounter()
+    client = MongoClient(current_app.config["MONGO_URI"], event_listeners=[counter])
+    name = f"{mongo.db.name}_benchmark"
+    client.drop_database(name)
+    real_db = mongo.db
+    mongo.db = client[name]
+    try:
+        yield counter
+    finally:
+        mongo.db = real_db
+        client.drop_database(name)
+        client.close()
+
+
+def measure(counter, function, *args):
+    """Runs function(*args) and returns (result, queries, seconds)."""
+    counter.count = 0
+    started = time.perf_counter()
+    result = function(*args)
+    return result, counter.count, time.perf_counter() - started
+
+
+def seed_conferences(count, users_per_conference=5, tracks_per_conference=3):
+    conferences, roles, users, tracks = [], [], [], []
+    for _ in range(count):
+        conference_id = str(uuid.uuid4())
+        conferences.append({"conference_id": conference_id, "name": f"Conference {conference_id[:8]}"})
+        role_ids = []
+        for position in POSITIONS:
+            role_id = ObjectId()
+            role_ids.append(str(role_id))
+            roles.append({"_id": role_id, "conference_id": conference_id, "track_id": None,
+                          "position": position, "is_active": True})
+        for i in range(users_per_conference):
+            users.append({"name": f"User {i}", "surname": conference_id[:8], "email": f"{i}@{conference_id}.test",
+                          "password": "x" * 60, "roles": [role_ids[i % len(role_ids)]]})
+        for i in range(tracks_per_conference):
+            tracks.append({"conference_id": conference_id, "track_name": f"Track {i}", "papers": []})
+
+    mongo.db.conferences.insert_many(conferences)
+    mongo.db.roles.insert_many(roles)
+    mongo.db.users.insert_many(users)
+    mongo.db.tracks.insert_many(tracks)
+    for collection, field in (("roles", "conference_id"), ("users", "roles"), ("tracks", "conference_id")):
+        mongo.db[collection].create_index(field)
+
+
+def per_conference_relations(conf_dicts):
+    # The loop attach_conference_relations replaced: three queries per conference
+    for conf_dict in conf_dicts:
+        roles = [{**role, "_id": str(role["_id"])} for role in mongo.db.roles.find({"conference_id": conf_dict["conference_id"]})]
+        conf_dict["roles"] = roles
+        users = mongo.db.users.find({"roles": {"$in": [role["_id"] for role in roles]}})
+        conf_dict["users"] = [
+            {**user, "_id": str(user["_id"]),
+             "positions_in_this_conference": [role["position"] for role in roles if role["_id"] in user["roles"]]}
+            for user in users
+        ]
+        conf_dict["tracks"] = [
+            {**track, "_id": str(track["_id"])}
+            for track in mongo.db.tracks.find({"conference_id": conf_dict["conference_id"]})
+        ]
+    return conf_dicts
+
+
+def benchmark_conference_listing(count):
+    """Seeds count conferences and times the conference listing relations before and after batching."""
+    with scratch_database() as counter:
+        seed_conferences(count)
+        report = {}
+        for label, function in (("per conference", per_conference_relations), ("batched", attach_conference_relations)):
+            conf_dicts = list(mongo.db.conferences.find())
+            _, queries, seconds = measure(counter, function, conf_dicts)
+            report[label] = (queries, seconds)
+        return report
+
+
+def seed_review_series(review_count, reviewer_count=100, conference_count=5, papers_per_conference=200):
+    """Seeds a conference series whose PC members wrote review_count reviews. Returns the reviewer ids."""
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    reviewer_ids = [str(ObjectId()) for _ in range(reviewer_count)]
+    paper_ids = []
+    conference_ids = []
+    for c in range(conference_count):
+        conference_id = mongo.db.conferences.insert_one({
+            "name": f"Conference {c}", "end_date": start + timedelta(days=90 + 365 * c), "pc_members": reviewer_ids
+        }).inserted_id
+        conference_ids.append(conference_id)
+        track_id = mongo.db.tracks.insert_one({"conference_id": str(conference_id), "track_name": "Main"}).inserted_id
+        result = mongo.db.papers.insert_many([
+            {"track": str(track_id), "created_at": start + timedelta(days=365 * c + rng.randint(0, 30))}
+            for _ in range(papers_per_conference)
+        ])
+        paper_ids.extend(str(paper_id) for paper_id in result.inserted_ids)
+    mongo.db.conference_series.insert_one({"series_name": "Benchmark", "conferences": conference_ids})
+
+    mongo.db.reviews.insert_many([
+        {
+            "paper_id": rng.choice(paper_ids), "reviewer_id": rng.choice(reviewer_ids),
+            "created_at": start + timedelta(days=rng.randint(31, 60) + 365 * rng.randrange(conference_count)),
+            "evaluation_text": " ".join(["word"] * rng.randint(50, 400)),
+            "evaluation": rng.randint(-2, 2),
+            "rates": [{"rate": rng.randint(1, 5)} for _ in range(rng.randint(0, 2))]
+        }
+        for _ in range(review_count)
+    ])
+    mongo.db.reviews.create_index("reviewer_id")
+    return reviewer_ids
+
+
+def per_review_totals(reviewer_ids):
+    # What get_series_stats did before the batched join: the reviews of every
+    # reviewer, then the paper, track and conference of every review
+    totals = {}
+    for reviewer_id in reviewer_ids:
+        for review in mongo.db.reviews.find({"reviewer_id": reviewer_id}):
+            paper = mongo.db.papers.find_one({"_id": ObjectId(review["paper_id"])}, {"track": 1, "created_at": 1})
+            sums = totals.setdefault(reviewer_id, dict.fromkeys(STAT_FIELDS, 0))
+            for field, value in review_contribution(review, paper, find_paper_conference(paper)).items():
+                sums[field] += value
+    return totals
+
+
+def benchmark_series_stats(review_count):
+    """Seeds a series with review_count reviews and times the reviewer totals, per review and batched."""
+    with scratch_database() as counter:
+        reviewer_ids = seed_review_series(review_count)
+        before, queries, seconds = measure(counter, per_review_totals, reviewer_ids)
+        report = {"per review": (queries, seconds)}
+        after, queries, seconds = measure(counter, compute_reviewer_totals, reviewer_ids)
+        report["batched"] = (queries, seconds)
+
+        # Both ways must agree before their times mean anything
+        for reviewer_id, sums in before.items():
+            for field in STAT_FIELDS:
+                if abs(sums[field] - after[reviewer_id][field]) > 1e-6:
+                    raise RuntimeError(f"Totals differ for reviewer {reviewer_id} on {field}")
+        return report
+
+
+def benchmark_solver(paper_count, reviewer_count, reviewers_per_paper=3, conflict_rate=0.01):
+    """
+    Times solve_assignment on a random papers x reviewers cost matrix with the
+    default load cap, at 3000 x 500 every round matches about 3000 papers
+    against 3500 reviewer slots. Needs no database.
+    """
+    rng = np.random.default_rng(0)
+    cost = -rng.random((paper_count, reviewer_count)) * 10
+    cost[rng.random(cost.shape) < conflict_rate] = FORBIDDEN
+    max_load = math.ceil(paper_count * reviewers_per_paper / reviewer_count) + LOAD_SLACK
+    need = np.full(paper_count, reviewers_per_paper, dtype=int)
+    capacity = np.full(reviewer_count, max_load, dtype=int)
+
+    started = time.perf_counter()
+    pairs = solve_assignment(cost, need, capacity)
+    seconds = time.perf_counter() - started
+
+    # The plan must hold before its time means anything
+    if len(set(pairs)) != len(pairs) or any(cost[i, j] >= FORBIDDEN for i, j in pairs):
+        raise RuntimeError("The solver repeated or used a forbidden pair")
+    if np.bincount([j for _, j in pairs], minlength=reviewer_count).max(initial=0) > max_load:
+        raise RuntimeError("A reviewer went over the load cap")
+    if np.bincount([i for i, _ in pairs], minlength=paper_count).max(initial=0) > reviewers_per_paper:
+        raise RuntimeError("A paper got too many reviewers")
+    return {
+        "assigned": len(pairs),
+        "unfilled": paper_count * reviewers_per_paper - len(pairs),
+        "max_load": max_load,
+        "seconds": seconds
+    }
@@ -0,0 +1,134 @@
+import click
+from services.reviewer_stats import rebuild_reviewer_stats
+from services.track_memberships import backfill_track_memberships
+from services.coauthors import rebuild_coauthor_graph
+from services.authors import normalize_all_paper_authors
+from services.paper_scores import rebuild_paper_scores
+from services.bids import backfill_bids
+from services.pdf_processing import DEFAULT_WORKERS, enqueue_missing_pdf_jobs, run_pdf_worker
+from services.storage import backfill_blob_refs
+from services.assignments import remove_duplicate_assignments
+from services.indexes import ensure_assignment_index
+from benchmarks import benchmark_conference_listing, benchmark_series_stats, benchmark_solver
+
+
+@click.command("rebuild-reviewer-stats")
+def rebuild_reviewer_stats_command():
+    """Backfill the reviewer_stats collection from existing reviews."""
+    count = rebuild_reviewer_stats()
+    click.echo(f"Rebuilt stats for {count} reviewer(s)")
+
+
+@click.command("benchmark-reviewer-stats")
+@click.option("--reviews", default=5000, show_default=True, help="Reviews to seed in the scratch series.")
+def benchmark_reviewer_stats_command(reviews):
+    """Time the series reviewer totals on a synthetic series, per review and batched."""
+    echo_benchmark(benchmark_series_stats(max(1, reviews)))
+
+
+@click.command("backfill-track-memberships")
+def backfill_track_memberships_command():
+    """Build the track_memberships index from the users' roles."""
+    count = backfill_track_memberships()
+    click.echo(f"Upserted {count} track membership(s)")
+
+
+@click.command("rebuild-coauthor-graph")
+def rebuild_coauthor_graph_command():
+    """Rebuild the co-authorship graph from all papers."""
+    count = rebuild_coauthor_graph()
+    click.echo(f"Linked the authors of {count} paper(s)")
+
+
+@click.command("normalize-paper-authors")
+def normalize_paper_authors_command():
+    """Rewrite stored paper authors into the canonical array and fill author_emails."""
+    count = normalize_all_paper_authors()
+    click.echo(f"Normalized the authors of {count} paper(s)")
+
+
+@click.command("rebuild-paper-scores")
+def rebuild_paper_scores_command():
+    """Backfill the papers' score sums and avg_acceptance from existing reviews."""
+    count = rebuild_paper_scores()
+    click.echo(f"Rebuilt scores for {count} reviewed paper(s)")
+
+
+@click.command("backfill-bids")
+def backfill_bids_command():
+    """Create bids documents from the papers' biddings arrays."""
+    count = backfill_bids()
+    click.echo(f"Upserted {count} bid(s)")
+
+
+@click.command("process-pdfs")
+@click.option("--workers", default=DEFAULT_WORKERS, show_default=True, help="Processes parsing PDFs in parallel.")
+@click.option("--once", is_flag=True, help="Exit once the queue is empty instead of waiting for new jobs.")
+def process_pdfs_command(workers, once):
+    """Extract page count, text and a thumbnail from queued paper files."""
+    count = run_pdf_worker(workers=max(1, workers), once=once)
+    click.echo(f"Processed {count} file(s)")
+
+
+@click.command("enqueue-pdf-jobs")
+def enqueue_pdf_jobs_command():
+    """Queue PDF processing for papers that were never processed."""
+    count = enqueue_missing_pdf_jobs()
+    click.echo(f"Queued {count} paper(s)")
+
+
+@click.command("backfill-blob-refs")
+def backfill_blob_refs_command():
+    """Count the papers using every stored file, so files are deleted with their last paper."""
+    count = backfill_blob_refs()
+    click.echo(f"Counted references to {count} file(s)")
+
+
+@click.command("remove-duplicate-assignments")
+def remove_duplicate_assignments_command():
+    """Delete the pending copies of repeated assignments, then make the assignments index unique."""
+    deleted, unresolved = remove_duplicate_assignments()
+    click.echo(f"Deleted {deleted} duplicate assignment(s)")
+    for pair in unresolved:
+        click.echo(f"Reviewed more than once, left as is: track {pair.get('track_id')}, "
+                   f"paper {pair.get('paper_id')}, reviewer {pair.get('reviewer_id')}")
+    if ensure_assignment_index():
+        click.echo("The assignments index is unique")
+
+
+def echo_benchmark(report):
+    for label, (queries, seconds) in report.items():
+        click.echo(f"{label}: {queries} quer{'y' if queries == 1 else 'ies'} in {seconds * 1000:.1f} ms")
+
+
+@click.command("benchmark-conference-listing")
+@click.option("--conferences", default=200, show_default=True, help="Conferences to seed in the scratch database.")
+def benchmark_conference_listing_command(conferences):
+    """Time the roles, users and tracks lookups of the conference listing, per conference and batched."""
+    echo_benchmark(benchmark_conference_listing(max(1, conferences)))
+
+
+@click.command("benchmark-auto-assignment")
+@click.option("--papers", default=3000, show_default=True, help="Papers in the synthetic track.")
+@click.option("--reviewers", default=500, show_default=True, help="Reviewers in the synthetic track.")
+def benchmark_auto_assignment_command(papers, reviewers):
+    """Time the assignment solver on a synthetic track with random costs and conflicts."""
+    report = benchmark_solver(max(1, papers), max(1, reviewers))
+    click.echo(f"{report['assigned']} assignment(s), {report['unfilled']} unfilled, "
+               f"at most {report['max_load']} per reviewer in {report['seconds'] * 1000:.1f} ms")
+
+
+def register_commands(app):
+    app.cli.add_command(rebuild_reviewer_stats_command)
+    app.cli.add_command(benchmark_reviewer_stats_command)
+    app.cli.add_command(backfill_track_memberships_command)
+    app.cli.add_command(rebuild_coauthor_graph_command)
+    app.cli.add_command(normalize_paper_authors_command)
+    app.cli.add_command(rebuild_paper_scores_command)
+    app.cli.add_command(backfill_bids_command)
+    app.cli.add_command(process_pdfs_command)
+    app.cli.add_command(enqueue_pdf_jobs_command)
+    app.cli.add_command(backfill_blob_refs_command)
+    app.cli.add_command(remove_duplicate_assignments_command)
+    app.cli.add_command(benchmark_conference_listing_command)
+    app.cli.add_command(benchmark_auto_assignment_command)
@@ -8,3 +8,11 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "your-very-secret-key")
     GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
     GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
+    UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
+    # "local" keeps paper files under UPLOAD_FOLDER, "gridfs" in MongoDB so several replicas can share them
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+    MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+    # "flask" streams files from Python, "x-accel" (nginx) and "x-sendfile" (Apache, lighttpd) hand them to the proxy
+    FILE_SERVING = os.getenv("FILE_SERVING", "flask")
+    # Internal nginx location that aliases UPLOAD_FOLDER
+    ACCEL_REDIRECT_PREFIX = os.getenv("ACCEL_REDIRECT_PREFIX", "/protected-uploads")
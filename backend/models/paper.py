@@ -1,17 +1,24 @@
 from bson import ObjectId
 from datetime import datetime
-from extensions import mongo
 
 class Paper:
     def __init__(self, paper_id, title, abstract, keywords, paper_path, authors, created_by,
                  decision=None, decision_made_by = None, track=None, biddings=None, assignee=None,
-                 reviews=None, created_at=None, submission_date=None, update_date=None):
+                 reviews=None, created_at=None, submission_date=None, update_date=None, author_emails=None,
+                 score_weighted_sum=0.0, confidence_sum=0.0, file_name=None, file_sha256=None, file_size=None,
+                 storage_backend=None, storage_key=None):
         self.id = str(paper_id) if isinstance(paper_id, ObjectId) else paper_id
         self.title = title
         self.abstract = abstract
         self.keywords = keywords
         self.paper_path = paper_path
+        self.file_name = file_name
+        self.file_sha256 = file_sha256
+        self.file_size = file_size
+        self.storage_backend = storage_backend
+        self.storage_key = storage_key
         self.authors = authors
+        self.author_emails = author_emails or []
         self.decision = decision
         self.decision_made_by = decision_made_by
         self.track = track
@@ -22,24 +29,13 @@ class Paper:
         self.created_at = created_at or datetime.utcnow()
         self.submission_date = submission_date or self.created_at
         self.update_date = update_date or []
-        self.avg_acceptance = self.calculate_avg_acceptance()
+        # Running sums kept up to date by the review routes, see services/paper_scores.py
+        self.score_weighted_sum = score_weighted_sum
+        self.confidence_sum = confidence_sum
 
-    def calculate_avg_acceptance(self):
-        if not self.reviews:
-            return 0.0
-
-        total_weighted = 0
-        total_confidence = 0
-
-        for review_id in self.reviews:
-            review = mongo.db.reviews.find_one({"_id": ObjectId(review_id)})
-            if review:
-                eval_score = review.get("evaluation", 0)
-                confidence = review.get("confidence", 1)
-                total_weighted += eval_score * confidence
-                total_confidence += confidence
-
-        return total_weighted / total_confidence if total_confidence else 0.0
+    @property
+    def avg_acceptance(self):
+        return self.score_weighted_sum / self.confidence_sum if self.confidence_sum else 0.0
 
     def to_dict(self):
         return {
@@ -48,7 +44,13 @@ class Paper:
             "abstract": self.abstract,
             "keywords": self.keywords,
             "paper_path": self.paper_path,
+            "file_name": self.file_name,
+            "file_sha256": self.file_sha256,
+            "file_size": self.file_size,
+            "storage_backend": self.storage_backend,
+            "storage_key": self.storage_key,
             "authors": self.authors,
+            "author_emails": self.author_emails,
             "decision": self.decision,
             "decision_made_by": self.decision_made_by,
             "track": self.track,
@@ -59,6 +61,8 @@ class Paper:
             "created_at": self.created_at,
             "submission_date": self.submission_date,
             "update_date": self.update_date,
+            "score_weighted_sum": self.score_weighted_sum,
+            "confidence_sum": self.confidence_sum,
             "avg_acceptance": self.avg_acceptance
         }
 
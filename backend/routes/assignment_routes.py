@@ -3,7 +3,11 @@ from models.assignment import Assignment
 from models.paper import Paper
 from extensions import mongo
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
+from services.coauthors import reviewer_paper_conflict
+from services.auto_assignment import plan_track_assignments, commit_track_assignments
+from services.assignments import bulk_create_assignments, MAX_BULK_ASSIGNMENTS
 
 def create_assignment_for_track(track_id):
     if "user_id" not in session:
@@ -13,6 +17,13 @@ def create_assignment_for_track(track_id):
 
     try:
         track_id = str(track_id)
+
+        if not ObjectId.is_valid(str(data.get("reviewer_id"))) or not ObjectId.is_valid(str(data.get("paper_id"))):
+            return jsonify({"error": "paper_id and reviewer_id must be valid ids"}), 400
+
+        if reviewer_paper_conflict(data.get("reviewer_id"), data.get("paper_id")):
+            return jsonify({"error": "Reviewer has a co-authorship conflict with this paper"}), 409
+
         assignment = Assignment(
             id=ObjectId(),
             reviewer_id=data.get("reviewer_id"),
@@ -21,7 +32,16 @@ def create_assignment_for_track(track_id):
             created_at=datetime.utcnow()
         )
 
-        mongo.db.assignments.insert_one(assignment.to_dict())
+        try:
+            mongo.db.assignments.insert_one(assignment.to_dict())
+        except DuplicateKeyError:
+            existing = mongo.db.assignments.find_one(
+                {"track_id": track_id, "paper_id": assignment.paper_id, "reviewer_id": assignment.reviewer_id}, {"id": 1}
+            )
+            return jsonify({
+                "message": "Reviewer is already assigned to this paper",
+                "assignment_id": existing.get("id") if existing else None
+            }), 200
 
         mongo.db.tracks.update_one(
             {"_id": ObjectId(track_id)},
@@ -34,6 +54,71 @@ def create_assignment_for_track(track_id):
         print("Assignment creation error:", e)
         return jsonify({"error": "Failed to create assignment"}), 500
     
+def bulk_assign_track(track_id):
+    """
+    Creates many assignments at once from {"assignments": [{"paper_id", "reviewer_id"}, ...]}.
+    Pairs that are already assigned are reported as existing, so the call can be repeated safely.
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+    items = data.get("assignments")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "assignments must be a non-empty list"}), 400
+    if len(items) > MAX_BULK_ASSIGNMENTS:
+        return jsonify({"error": f"At most {MAX_BULK_ASSIGNMENTS} assignments per request"}), 400
+
+    try:
+        track = mongo.db.tracks.find_one({"_id": ObjectId(track_id)}, {"papers": 1})
+        if not track:
+            return jsonify({"error": "Track not found"}), 404
+
+        results = bulk_create_assignments(track, items)
+
+        counts = {}
+        for result in results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+
+        return jsonify({"results": results, "counts": counts}), 200
+
+    except Exception as e:
+        print("Bulk assignment error:", e)
+        return jsonify({"error": "Failed to create assignments"}), 500
+
+def auto_assign_track(track_id):
+    """
+    Completes the assignments of a track with the solver. Returns a preview
+    unless the body has "commit": true, in which case the plan is written.
+    Optional "reviewers_per_paper" and "max_load" override the defaults.
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+
+    try:
+        track = mongo.db.tracks.find_one({"_id": ObjectId(track_id)})
+        if not track:
+            return jsonify({"error": "Track not found"}), 404
+
+        plan = plan_track_assignments(track, data.get("reviewers_per_paper"), data.get("max_load"))
+
+        if not data.get("commit"):
+            return jsonify({"message": "Assignment preview", "committed": False, **plan}), 200
+
+        assignment_ids = commit_track_assignments(str(track["_id"]), plan["assignments"])
+        return jsonify({
+            "message": f"{len(assignment_ids)} assignment(s) created",
+            "committed": True,
+            "assignment_ids": assignment_ids,
+            **plan
+        }), 201
+
+    except Exception as e:
+        print("Auto assignment error:", e)
+        return jsonify({"error": "Failed to assign reviewers"}), 500
+
 def get_assignments_for_reviewer(reviewer_id):
     try:
         assignments = list(mongo.db.assignments.find({"reviewer_id": reviewer_id}))
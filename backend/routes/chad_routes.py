@@ -1,9 +1,9 @@
 from flask import jsonify, request, session, Blueprint
 from models.chad import ChadMail
-from bson import ObjectId
 from datetime import datetime
 from extensions import mongo
 from routes.notification_routes import send_notification
+from services.dataloader import get_loader
 
 def get_sent_chad():
     user_id = session.get('user_id')
@@ -60,7 +60,7 @@ def send_chad():
     )
     
     # Get sender's name
-    sender = mongo.db.users.find_one({"_id": ObjectId(from_user)})
+    sender = get_loader("users", {"name": 1, "surname": 1}).load(from_user)
     sender_name = f"{sender['name']} {sender['surname']}" if sender else "Unknown User"
     
     # send notification
@@ -1,13 +1,26 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, current_app, stream_with_context
 from models.conference import Conference
 from bson import ObjectId
-from datetime import datetime
 from extensions import mongo
+from pymongo import ReturnDocument
 from models.pc_member_invitation import PCMemberInvitation
 from routes.notification_routes import send_notification
 from models.role import Role
 from routes.role_routes import assign_role
 from models.conference_series import ConferenceSeries
+from bson.errors import InvalidId
+from services.pagination import parse_fields, parse_page, find_page
+from services.reviewer_stats import summarize_stats, compute_reviewer_totals
+from services.settings_cache import bump_version
+from services.dataloader import get_loader
+from services.paper_export import DECISION_QUERIES, stream_papers_zip
+from services.conferences import conference_query
+
+CONFERENCE_RELATIONS = ("roles", "users", "tracks")
+# Listings without ?limit= get this many conferences per page, follow next_cursor for more
+DEFAULT_CONFERENCE_PAGE_SIZE = 50
+# Compact user shape embedded in conference responses, never the full user document
+USER_SUMMARY_PROJECTION = {"name": 1, "surname": 1, "email": 1, "affiliation": 1, "roles": 1}
 
 def create_conference():
     if "user_id" not in session:
@@ -277,54 +290,90 @@ def create_conference_from_series():
         return jsonify({"error": f"Failed to create conference from series: {str(e)}"}), 500
 
 
+def attach_conference_relations(conf_dicts, key="conference_id", include=CONFERENCE_RELATIONS):
+    # Fills roles, users and tracks for every conference with a fixed number
+    # of queries, no matter how many conferences are listed
+    conf_keys = [str(conf_dict[key]) for conf_dict in conf_dicts]
+
+    roles_by_conf = {conf_key: [] for conf_key in conf_keys}
+    users_by_conf = {conf_key: [] for conf_key in conf_keys}
+    tracks_by_conf = {conf_key: [] for conf_key in conf_keys}
+
+    if "roles" in include or "users" in include:
+        for role in mongo.db.roles.find({"conference_id": {"$in": conf_keys}}):
+            role_dict = dict(role)
+            role_dict['_id'] = str(role_dict['_id'])
+            roles_by_conf[role_dict["conference_id"]].append(role_dict)
+
+    if "users" in include:
+        # Get users models having the array roles which have these role ids in them
+        conf_by_role = {role['_id']: conf_key for conf_key, role_list in roles_by_conf.items() for role in role_list}
+        users = mongo.db.users.find({"roles": {"$in": list(conf_by_role)}}, USER_SUMMARY_PROJECTION) if conf_by_role else []
+
+        # Route every user to the conferences their role ids belong to
+        for user in users:
+            user_role_ids = set(user.pop('roles', []))
+            user_confs = {conf_by_role[role_id] for role_id in user_role_ids if role_id in conf_by_role}
+            for conf_key in user_confs:
+                user_dict = dict(user)
+                user_dict['_id'] = str(user_dict['_id'])
+                user_dict['positions_in_this_conference'] = [role['position'] for role in roles_by_conf[conf_key] if role['_id'] in user_role_ids]
+                users_by_conf[conf_key].append(user_dict)
+
+    if "tracks" in include:
+        for track in mongo.db.tracks.find({"conference_id": {"$in": conf_keys}}):
+            track_dict = dict(track)
+            track_dict['_id'] = str(track_dict['_id'])
+            tracks_by_conf[track_dict["conference_id"]].append(track_dict)
+
+    relations = {"roles": roles_by_conf, "users": users_by_conf, "tracks": tracks_by_conf}
+    for conf_key, conf_dict in zip(conf_keys, conf_dicts):
+        for name in include:
+            conf_dict[name] = relations[name][conf_key]
+
+    return conf_dicts
+
+def conference_projection(fields, key):
+    # Splits ?fields= into a Mongo projection and the relations to attach
+    if fields is None:
+        return None, CONFERENCE_RELATIONS
+
+    projection = {field: 1 for field in fields if field not in CONFERENCE_RELATIONS}
+    projection[key] = 1
+    include = tuple(field for field in fields if field in CONFERENCE_RELATIONS)
+    return projection, include
+
 def get_conferences():
     try:
         user_id = request.args.get('user_id')  # optional query param
 
+        try:
+            limit, cursor = parse_page(request.args)
+        except InvalidId:
+            return jsonify({"error": "Invalid cursor"}), 400
+        projection, include = conference_projection(parse_fields(request.args), "conference_id")
+
         if user_id:
             # Find conferences where user is in any important role
-            conferences = mongo.db.conferences.find({
+            query = {
                 "$or": [
                     {"superchairs": user_id},
                     {"track_chairs": user_id},
                     {"pc_members": user_id},
                     {"authors": user_id}
                 ]
-            })
+            }
         else:
-            conferences = mongo.db.conferences.find()
+            query = {}
 
-        result = []
-        for conference in conferences:
-            conf_dict = dict(conference)
-            roles = mongo.db.roles.find({"conference_id": conf_dict["conference_id"]})
-            role_list = []
-            for role in roles:
-                role_dict = dict(role)
-                role_dict['_id'] = str(role_dict['_id'])
-                role_list.append(role_dict)
-            conf_dict['roles'] = role_list
-            # Get users models having the array roles which have these role ids in them
-            role_ids = [str(role['_id']) for role in role_list]
-            users = mongo.db.users.find({"roles": {"$in": role_ids}})
-            user_list = []
-            for user in users:
-                user_dict = dict(user)
-                user_dict['_id'] = str(user_dict['_id'])
-                user_dict['positions_in_this_conference'] = [role['position'] for role in role_list if str(role['_id']) in user_dict['roles']]
-                user_list.append(user_dict)
-            conf_dict['users'] = user_list
+        conferences, next_cursor = find_page(
+            mongo.db.conferences, query, projection, limit or DEFAULT_CONFERENCE_PAGE_SIZE, cursor
+        )
 
-            tracks = mongo.db.tracks.find({"conference_id": conf_dict["conference_id"]})
-            track_list = []
-            for track in tracks:
-                track_dict = dict(track)
-                track_dict['_id'] = str(track_dict['_id'])
-                track_list.append(track_dict)
-            conf_dict['tracks'] = track_list
-            result.append(conf_dict)
+        result = [dict(conference) for conference in conferences]
+        attach_conference_relations(result, include=include)
 
-        return jsonify({"conferences": result}), 200
+        return jsonify({"conferences": result, "next_cursor": next_cursor}), 200
 
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve conferences: {str(e)}"}), 500
@@ -424,125 +473,39 @@ def get_series_stats(series_id):
         if not series:
             return jsonify({"error": "Conference series not found"}), 404
 
-        conference_ids = series.get("conferences", [])
+        conference_ids = [ObjectId(conf_id) for conf_id in series.get("conferences", [])]
+
+        # Step 2: Collect the PC members of every conference in one query
         pc_member_ids = set()
+        for conference in mongo.db.conferences.find({"_id": {"$in": conference_ids}}, {"pc_members": 1}):
+            pc_member_ids.update(conference.get("pc_members") or [])
 
-        # Step 2: For each conference, collect all PC members
-        for conf_id in conference_ids:
-            conference = mongo.db.conferences.find_one({"_id": ObjectId(conf_id)})
-            if conference:
-                pc_members = conference.get("pc_members", [])
-                pc_member_ids.update(pc_members)
+        # Step 3: Read the materialized stats of those members, kept up to date by the review routes
+        member_stats = list(mongo.db.reviewer_stats.find({"reviewer_id": {"$in": list(pc_member_ids)}}))
 
-        result_stats = []
+        # Members without materialized stats yet are computed from their reviews in one batch
+        missing_ids = pc_member_ids - {stats["reviewer_id"] for stats in member_stats}
+        if missing_ids:
+            computed = compute_reviewer_totals(missing_ids)
+            member_stats.extend({"reviewer_id": reviewer_id, **totals} for reviewer_id, totals in computed.items())
 
-        # Step 3: For each PC member, calculate stats
-        for pc_member in pc_member_ids:
-            # Collect values for all stats
-            total_submit_time = 0
-            total_review_rating = 0
-            total_words = 0
-            total_review_time = 0
-            total_eval_score = 0
-
-            review_count = 0
-            rating_count = 0
-
-            # Step 3a: Find all reviews by this reviewer in any track of any conference
-            reviews = mongo.db.reviews.find({"reviewer_id": pc_member})
-
-            for review in reviews:
-                print(1)
-                review_count += 1
-
-                # ---------- 1. avg_submit_time_before_deadline ----------
-                paper = mongo.db.papers.find_one({"_id": ObjectId(review["paper_id"])})
-                if not paper:
-                    print(2)
-                    continue  # skip if paper not found
-
-                paper_created = paper["created_at"]
-                review_created = review["created_at"]
-
-                # Get conference
-                track = mongo.db.tracks.find_one({"_id": ObjectId(paper["track"])})
-                if not track:
-                    print(3)
-                    continue
-
-                conference = mongo.db.conferences.find_one({"_id": ObjectId(track["conference_id"])})
-                if not conference:
-                    print(4)
-                    continue
-
-                conf_end_date = conference.get("end_date")
-                if not conf_end_date:
-                    print(5)
-                    continue  # Skip if end date missing
-
-                # If conf_end_date is a string, convert to datetime
-                if isinstance(conf_end_date, str):
-                    conf_end_date = datetime.fromisoformat(conf_end_date.replace("Z", "+00:00"))
-
-                if conf_end_date.tzinfo is not None:
-                    conf_end_date = conf_end_date.replace(tzinfo=None)
-
-                if review_created.tzinfo is not None:
-                    review_created = review_created.replace(tzinfo=None)
-
-                if paper_created.tzinfo is not None:
-                    paper_created = paper_created.replace(tzinfo=None)
-
-                submit_time = (conf_end_date - review_created).total_seconds() / 3600
-
-                total_submit_time += submit_time
-
-                # ---------- 2. review_rating ----------
-                if "review_rating" in review:
-                    total_review_rating += review["review_rating"]
-                    rating_count += 1
-
-                # ---------- 3. avg_words_per_review ----------
-                word_count = len(review.get("evaluation_text", "").split())
-                total_words += word_count
-
-                # ---------- 4. avg_time_to_review ----------
-                time_to_review = (review_created - paper_created).total_seconds() / 3600  # hours
-                total_review_time += time_to_review
-
-                # ---------- 5. avg_rating_given ----------
-                if "evaluation" in review:
-
-                    try:
-                        eval_value = float(review["evaluation"])
-                        total_eval_score += eval_value
-                    except:
-                        pass
-
-            if review_count == 0:
-                continue  # no reviews by this reviewer
-
-            submit_time_avg = total_submit_time / review_count
-            review_time_avg = total_review_time / review_count
-
-            user = mongo.db.users.find_one({"_id": ObjectId(pc_member)})
-            if user:
-                pc_member_name = user.get("name", "") + " " + user.get("surname", "")
-            else:
-                pc_member_name = "Unknown"
-
-            stats = {
-                "pc_member_id": str(pc_member),
-                "pc_member_name": pc_member_name,
-                "avg_submit_time_before_deadline": format_duration(submit_time_avg),
-                "review_rating": (total_review_rating / rating_count) if rating_count > 0 else 0,
-                "avg_words_per_review": total_words / review_count,
-                "avg_time_to_review": format_duration(review_time_avg),
-                "avg_rating_given": total_eval_score / review_count
-            }
+        member_stats = [stats for stats in member_stats if stats.get("review_count", 0) > 0]
 
+        users = get_loader("users", {"name": 1, "surname": 1}).load_many(stats["reviewer_id"] for stats in member_stats)
+        names = {str(user["_id"]): user.get("name", "") + " " + user.get("surname", "") for user in users if user}
 
-            result_stats.append(stats)
+        result_stats = []
+        for stats in member_stats:
+            summary = summarize_stats(stats)
+            result_stats.append({
+                "pc_member_id": stats["reviewer_id"],
+                "pc_member_name": names.get(stats["reviewer_id"], "Unknown"),
+                "avg_submit_time_before_deadline": format_duration(summary["avg_submit_time_before_deadline"]),
+                "review_rating": summary["review_rating"],
+                "avg_words_per_review": summary["avg_words_per_review"],
+                "avg_time_to_review": format_duration(summary["avg_time_to_review"]),
+                "avg_rating_given": summary["avg_rating_given"]
+            })
 
         return jsonify({
             "series_id": str(series_id),
@@ -554,7 +517,8 @@ def get_series_stats(series_id):
 
 def get_conference(conference_id):
     try:
-        conference = mongo.db.conferences.find_one({"conference_id": conference_id})
+        projection, include = conference_projection(parse_fields(request.args), "conference_id")
+        conference = mongo.db.conferences.find_one({"conference_id": conference_id}, projection)
         
         if not conference:
             return jsonify({"error": "Conference not found"}), 404
@@ -564,35 +528,7 @@ def get_conference(conference_id):
         conf_dict = dict(conference)
         conf_dict['_id'] = str(conf_dict['_id'])
 
-        # Get roles in the conference 
-        roles = mongo.db.roles.find({"conference_id": conference_id})
-        role_list = []
-        for role in roles:
-            role_dict = dict(role)
-            role_dict['_id'] = str(role_dict['_id'])
-            role_list.append(role_dict)
-        conf_dict['roles'] = role_list
-        # Get users models having the array roles which have these role ids in them
-        role_ids = [str(role['_id']) for role in role_list]
-        users = mongo.db.users.find({"roles": {"$in": role_ids}})
-        user_list = []
-        for user in users:
-            user_dict = dict(user)
-            user_dict['_id'] = str(user_dict['_id'])
-            user_dict['positions_in_this_conference'] = [role['position'] for role in role_list if str(role['_id']) in user_dict['roles']]
-            user_list.append(user_dict)
-        conf_dict['users'] = user_list
-
-        # Get tracks for the conference
-        tracks = mongo.db.tracks.find({"conference_id": conference_id})
-        track_list = []
-
-        for track in tracks:
-            track_dict = dict(track)
-            track_dict['_id'] = str(track_dict['_id'])
-            track_list.append(track_dict)
-        conf_dict['tracks'] = track_list
-
+        attach_conference_relations([conf_dict], include=include)
 
         return jsonify({
             "conference": conf_dict
@@ -601,9 +537,42 @@ def get_conference(conference_id):
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve conference: {str(e)}"}), 500
     
+def export_conference_papers(conference_id):
+    """GET /conference/<conference_id>/export?decision=accepted streams the PDFs of every track as one ZIP."""
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    decision = request.args.get("decision")
+    if decision and decision not in DECISION_QUERIES:
+        return jsonify({"error": f"decision must be one of {', '.join(DECISION_QUERIES)}"}), 400
+
+    try:
+        conference = mongo.db.conferences.find_one(conference_query(conference_id), {"conference_id": 1, "superchairs": 1})
+        if not conference:
+            return jsonify({"error": "Conference not found"}), 404
+        if session["user_id"] not in {str(chair) for chair in conference.get("superchairs") or []}:
+            return jsonify({"error": "Only superchairs can export the papers"}), 403
+
+        conference_keys = [str(conference["_id"])] + ([conference["conference_id"]] if conference.get("conference_id") else [])
+        tracks = list(mongo.db.tracks.find(
+            {"conference_id": {"$in": conference_keys}}, {"track_name": 1, "papers": 1}
+        ).sort("_id", 1))
+
+        response = current_app.response_class(
+            stream_with_context(stream_papers_zip(tracks, decision)), mimetype="application/zip"
+        )
+        response.headers["Content-Disposition"] = f'attachment; filename="conference-{conference_id}-papers.zip"'
+        # Let nginx pass the archive on as it is written
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    except Exception as e:
+        return jsonify({"error": f"Failed to export papers: {str(e)}"}), 500
+
 def get_conference_by_id(conference_id):
     try:
-        conference = mongo.db.conferences.find_one({"_id": ObjectId(conference_id)})
+        projection, include = conference_projection(parse_fields(request.args), "_id")
+        conference = mongo.db.conferences.find_one({"_id": ObjectId(conference_id)}, projection)
         
         if not conference:
             return jsonify({"error": "Conference not found"}), 404
@@ -613,35 +582,7 @@ def get_conference_by_id(conference_id):
         conf_dict = dict(conference)
         conf_dict['_id'] = str(conf_dict['_id'])
 
-        # Get roles in the conference 
-        roles = mongo.db.roles.find({"conference_id": conference_id})
-        role_list = []
-        for role in roles:
-            role_dict = dict(role)
-            role_dict['_id'] = str(role_dict['_id'])
-            role_list.append(role_dict)
-        conf_dict['roles'] = role_list
-        # Get users models having the array roles which have these role ids in them
-        role_ids = [str(role['_id']) for role in role_list]
-        users = mongo.db.users.find({"roles": {"$in": role_ids}})
-        user_list = []
-        for user in users:
-            user_dict = dict(user)
-            user_dict['_id'] = str(user_dict['_id'])
-            user_dict['positions_in_this_conference'] = [role['position'] for role in role_list if str(role['_id']) in user_dict['roles']]
-            user_list.append(user_dict)
-        conf_dict['users'] = user_list
-
-        # Get tracks for the conference
-        tracks = mongo.db.tracks.find({"conference_id": conference_id})
-        track_list = []
-
-        for track in tracks:
-            track_dict = dict(track)
-            track_dict['_id'] = str(track_dict['_id'])
-            track_list.append(track_dict)
-        conf_dict['tracks'] = track_list
-
+        attach_conference_relations([conf_dict], key="_id", include=include)
 
         return jsonify({
             "conference": conf_dict
@@ -695,93 +636,71 @@ def update_conference(conference_id):
         return jsonify({"error": "Unauthorized"}), 401
 
     data = request.get_json()
+    if not data:
+        return jsonify({"error": "No fields provided to update"}), 400
 
     try:
-        # Step 1: Get the old conference before updating
-        old_conf = mongo.db.conferences.find_one({"_id": ObjectId(conference_id)})
-        if not old_conf:
-            return jsonify({"error": "Conference not found"}), 404
-
-        # Step 2: Update the conference fields with the new data
+        # Step 1: Update the conference fields and get the old document in the same round trip
         update_fields = {}
         for key, value in data.items():
             update_fields[key] = value
 
-        mongo.db.conferences.update_one(
+        old_conf = mongo.db.conferences.find_one_and_update(
             {"_id": ObjectId(conference_id)},
-            {"$set": update_fields}
+            {"$set": update_fields},
+            return_document=ReturnDocument.BEFORE
         )
+        if not old_conf:
+            return jsonify({"error": "Conference not found"}), 404
 
-        # Step 3: Get the updated conference after applying the changes
-        updated_conf = mongo.db.conferences.find_one({"_id": ObjectId(conference_id)})
+        # Step 2: The updated conference is the old one with the new top-level fields
+        updated_conf = {**old_conf, **update_fields}
 
-        # Step 4: Compare old and new settings to detect what changed
-        changed_settings = {}
+        # Step 3: Turn the scope and value changes into one dotted-path update for all tracks
+        track_set = {}
+        track_unset = {}
 
         for key in data:
             old_value = old_conf.get(key)
             new_value = updated_conf.get(key)
 
             # Only consider settings that have a scope (i.e., configurable settings)
-            if isinstance(new_value, dict) and "scope" in new_value:
-                old_scope = old_value.get("scope") if isinstance(old_value, dict) else None
-                new_scope = new_value.get("scope")
-
-                old_val = old_value.get("value") if isinstance(old_value, dict) else None
-                new_val = new_value.get("value")
-
-                changed_settings[key] = {
-                    "old_scope": old_scope,
-                    "new_scope": new_scope,
-                    "old_value": old_val,
-                    "new_value": new_val
+            if not (isinstance(new_value, dict) and "scope" in new_value):
+                continue
+
+            old_scope = old_value.get("scope") if isinstance(old_value, dict) else None
+            new_scope = new_value.get("scope")
+            new_val = new_value.get("value")
+
+            # Case 1: The setting changed from track scope to conference scope
+            # In this case, remove it from track settings
+            if old_scope == "track" and new_scope == "conference":
+                track_unset[f"settings.{key}"] = ""
+
+            # Case 2: The setting changed from conference scope to track scope
+            # Case 3: The setting was and remains at track scope
+            # In both cases every track gets the new value at track scope
+            elif new_scope == "track" and old_scope in ("conference", "track"):
+                track_set[f"settings.{key}"] = {
+                    "value": new_val,
+                    "scope": "track"
                 }
 
-        # Step 5: For every track in this conference, apply the necessary changes
-        tracks = mongo.db.tracks.find({"conference_id": str(conference_id)})
-        for track in tracks:
-            print("girdik")
-            track_settings = track.get("settings", {})
-            modified = False
-
-            for key, change in changed_settings.items():
-                # Case 1: The setting changed from track scope to conference scope
-                # In this case, remove it from track settings
-                if change["old_scope"] == "track" and change["new_scope"] == "conference":
-                    if key in track_settings:
-                        del track_settings[key]
-                        modified = True
-
-                # Case 2: The setting changed from conference scope to track scope
-                # In this case, add it to track settings
-                elif change["old_scope"] == "conference" and change["new_scope"] == "track":
-                    track_settings[key] = {
-                        "value": change["new_value"],
-                        "scope": "track"
-                    }
-                    modified = True
-
-                # Case 3: The setting was and remains at track scope
-                # Update the value if it changed
-                elif change["old_scope"] == "track" and change["new_scope"] == "track":
-                    if key in track_settings:
-                        if track_settings[key]["value"] != change["new_value"]:
-                            track_settings[key]["value"] = change["new_value"]
-                            modified = True
-                    else:
-                        # The key didn't exist in track settings before, so add it now
-                        track_settings[key] = {
-                            "value": change["new_value"],
-                            "scope": "track"
-                        }
-                        modified = True
-
-            # If any modifications were made to the track settings, update them in the database
-            if modified:
-                mongo.db.tracks.update_one(
-                    {"_id": track["_id"]},
-                    {"$set": {"settings": track_settings}}
-                )
+        # Step 4: Apply the changes to every track of this conference at once
+        track_update = {}
+        if track_set:
+            track_update["$set"] = track_set
+        if track_unset:
+            track_update["$unset"] = track_unset
+
+        if track_update:
+            mongo.db.tracks.update_many(
+                {"conference_id": str(conference_id)},
+                track_update
+            )
+
+        # Drop the cached effective settings of every track in this conference
+        bump_version("conference", conference_id)
 
         return jsonify({"message": "Conference updated and track settings adjusted for changes."}), 200
 
@@ -0,0 +1,116 @@
+from datetime import datetime
+from flask import request, jsonify, session
+from bson import ObjectId
+from extensions import mongo
+from services.pagination import MAX_PAGE_SIZE
+
+DEFAULT_SECTION_SIZE = 10
+
+
+def section_lookup(collection, match, sort, limit, project, counts=None, item_stages=()):
+    """
+    A $lookup that runs a $facet on another collection: the first page of
+    the matching documents plus their total and any extra counts.
+    """
+    facets = {
+        "items": [{"$sort": sort}, {"$limit": limit}, *item_stages, {"$project": project}],
+        "total": [{"$count": "count"}],
+    }
+    for name, condition in (counts or {}).items():
+        facets[name] = [{"$match": condition}, {"$count": "count"}]
+
+    return {"$lookup": {
+        "from": collection,
+        "pipeline": [{"$match": match}, {"$facet": facets}],
+        "as": collection
+    }}
+
+
+def format_section(facet):
+    # $count yields [] instead of 0 when nothing matches
+    section = {"items": facet.get("items", [])}
+    for name, value in facet.items():
+        if name != "items":
+            section[name] = value[0]["count"] if value else 0
+    section["has_more"] = section["total"] > len(section["items"])
+
+    for item in section["items"]:
+        for key, value in item.items():
+            if isinstance(value, datetime):
+                item[key] = value.isoformat()
+    return section
+
+
+def get_my_dashboard():
+    """Assignments, assigned papers, notifications and own submissions of the logged in user in one aggregation."""
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    user_id = session["user_id"]
+    limit = request.args.get("limit", DEFAULT_SECTION_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    # Assignments carry their paper's summary, which makes them the assigned papers too
+    assigned_paper = {"$lookup": {
+        "from": "papers",
+        "let": {"paper_id": "$paper_id"},
+        "pipeline": [
+            {"$match": {"$expr": {"$eq": [
+                "$_id", {"$convert": {"input": "$$paper_id", "to": "objectId", "onError": None}}
+            ]}}},
+            {"$project": {"_id": {"$toString": "$_id"}, "title": 1, "track": 1, "keywords": 1, "decision": 1}}
+        ],
+        "as": "paper"
+    }}
+
+    pipeline = [
+        {"$match": {"_id": ObjectId(user_id)}},
+        {"$project": {"_id": 1}},
+        section_lookup(
+            "assignments",
+            {"reviewer_id": user_id},
+            {"created_at": -1},
+            limit,
+            {
+                "_id": {"$toString": "$_id"}, "id": 1, "paper_id": 1, "track_id": 1,
+                "is_pending": 1, "created_at": 1, "paper": {"$arrayElemAt": ["$paper", 0]}
+            },
+            counts={"pending": {"is_pending": True}},
+            item_stages=[assigned_paper]
+        ),
+        section_lookup(
+            "notifications",
+            {"to_whom": user_id},
+            {"created_at": -1},
+            limit,
+            {
+                "_id": 0, "id": {"$toString": "$_id"}, "title": 1, "content": 1, "is_interactive": 1,
+                "is_answered": 1, "is_accepted": 1, "is_read": 1, "invitation_id": 1, "created_at": 1
+            },
+            counts={"unread": {"is_read": {"$ne": True}}}
+        ),
+        section_lookup(
+            "papers",
+            {"created_by": user_id},
+            {"created_at": -1},
+            limit,
+            {
+                "_id": {"$toString": "$_id"}, "title": 1, "track": 1, "keywords": 1,
+                "decision": 1, "submission_date": 1, "created_at": 1
+            }
+        ),
+    ]
+
+    try:
+        result = next(mongo.db.users.aggregate(pipeline), None)
+        if result is None:
+            return jsonify({"error": "User not found"}), 404
+
+        return jsonify({
+            "assignments": format_section(result["assignments"][0]),
+            "notifications": format_section(result["notifications"][0]),
+            "submissions": format_section(result["papers"][0])
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": f"Failed to load dashboard: {str(e)}"}), 500
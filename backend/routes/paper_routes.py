@@ -1,4 +1,4 @@
-from flask import request, jsonify, session, send_file
+from flask import request, jsonify, session, send_file, current_app
 from models.paper import Paper
 from models.review import Review
 from models.role import Role
@@ -7,7 +7,57 @@ from bson import ObjectId
 from datetime import datetime
 import os
 from werkzeug.utils import secure_filename
-
+from werkzeug.wsgi import wrap_file
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from services.track_memberships import add_track_membership
+from services.conflicts import invalidate_track_conflicts
+from services.authors import normalize_authors
+from services.coauthors import add_paper_to_graph, remove_paper_from_graph, reviewer_paper_conflict
+from services.relevance import update_paper_relevance
+from services.bid_suggestions import record_bid_change, refresh_paper_suggestions
+from services.storage import store_upload, release_upload, discard_upload, resolve_paper_file, paper_blob
+from services.pdf_processing import enqueue_pdf_job
+from services.paper_search import DEFAULT_SEARCH_SIZE, FACETS, mark_search_index_stale, refresh_search_paper, rank_papers
+from services.pagination import MAX_PAGE_SIZE, parse_fields, parse_page, parse_sort, find_page, json_ready
+from services.paper_export import DECISION_QUERIES
+from bson.errors import InvalidId
+from config import Config
+from services.bids import DEFAULT_PREFERENCE, parse_preference, place_bid, withdraw_bid, has_bid, paper_bidders
+
+
+PAPER_SORT_FIELDS = ("submission_date", "avg_acceptance")
+DEFAULT_PAPER_PAGE_SIZE = 50
+
+def list_papers(query, args, default_limit=None):
+    """
+    Answers a paper listing: ?track_id= and ?decision= filters, ?fields=
+    projection, ?sort=submission_date|avg_acceptance (- for descending) and
+    keyset pages through ?limit= and ?cursor=. The conditions in query win
+    over the filters.
+    """
+    try:
+        sort = parse_sort(args, PAPER_SORT_FIELDS)
+        limit, cursor = parse_page(args, sort)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except InvalidId:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    filters = {}
+    if args.get("track_id"):
+        filters["track"] = args["track_id"]
+    decision = args.get("decision")
+    if decision:
+        if decision not in DECISION_QUERIES:
+            return jsonify({"error": f"decision must be one of {', '.join(DECISION_QUERIES)}"}), 400
+        filters.update(DECISION_QUERIES[decision])
+
+    fields = parse_fields(args, required=("_id",))
+    projection = {field: 1 for field in fields} if fields else None
+    papers, next_cursor = find_page(
+        mongo.db.papers, {**filters, **query}, projection, limit or default_limit, cursor, sort
+    )
+    return jsonify({"papers": json_ready(papers), "next_cursor": next_cursor}), 200
 
 def get_paper(paper_id):
     try:
@@ -28,28 +78,8 @@ def get_papers_of_user():
     if "user_id" not in session:
         return jsonify({"error": "Unauthorized"}), 401
 
-    user_id = session["user_id"]
-
     try:
-        papers = mongo.db.papers.find({"created_by": user_id})
-
-        paper_list = []
-        for paper in papers:
-            paper["_id"] = str(paper["_id"])
-            if "created_at" in paper:
-                paper["created_at"] = paper["created_at"].isoformat()
-            if "submission_date" in paper and paper["submission_date"]:
-                paper["submission_date"] = paper["submission_date"].isoformat()
-            if "update_date" in paper and paper["update_date"]:
-                if isinstance(paper["update_date"], list):
-                    paper["update_date"] = [d.isoformat() for d in paper["update_date"]]
-                else:
-                    paper["update_date"] = paper["update_date"].isoformat()
-
-            paper_list.append(paper)
-
-        return jsonify({"papers": paper_list}), 200
-
+        return list_papers({"created_by": session["user_id"]}, request.args)
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve user's papers: {str(e)}"}), 500
 
@@ -71,7 +101,7 @@ def submit_paper():
     title = request.form.get("title")
     abstract = request.form.get("abstract")
     keywords = request.form.getlist("keywords") if request.form.getlist("keywords") else []
-    authors = request.form.getlist("authors") if request.form.getlist("authors") else []
+    authors, author_emails = normalize_authors(request.form.getlist("authors"))
     track_id = request.form.get("track_id")
     conference_id = request.form.get("conference_id")
     
@@ -84,18 +114,11 @@ def submit_paper():
         if not track:
             return jsonify({"error": "Invalid track ID"}), 400
         
-        track_name = track.get("name", "default")
-        
-        # Save file
-        safe_filename = secure_filename(file.filename)
         paper_id = str(ObjectId())
-        
-        save_dir = os.path.join(UPLOAD_FOLDER, conference_id, track_name)
-        os.makedirs(save_dir, exist_ok=True)
-        
-        save_path = os.path.join(save_dir, f"{paper_id}_{safe_filename}")
-        file.save(save_path)
-        
+
+        # Move the streamed upload into the content-addressed store
+        stored = store_upload(file)
+
         submission_date = datetime.utcnow()
 
         # Create paper document
@@ -104,30 +127,57 @@ def submit_paper():
             title=title,
             abstract=abstract,
             keywords=keywords,
-            paper_path=f"/{save_path}",
+            paper_path=stored["path"],
             authors=authors,
+            author_emails=author_emails,
             created_by=session["user_id"],
-            track=track_id
+            track=track_id,
+            file_name=secure_filename(file.filename),
+            file_sha256=stored["sha256"],
+            file_size=stored["size"],
+            storage_backend=stored["backend"],
+            storage_key=stored["key"]
         )
 
-        result = mongo.db.papers.insert_one({
-            "id": paper.id,
-            "title": paper.title,
-            "abstract": paper.abstract,
-            "keywords": paper.keywords,
-            "paper_path": paper.paper_path,
-            "authors": paper.authors,
-            "track": paper.track,
-            "created_by": paper.created_by,
-            "submission_date": submission_date,
-            "created_at": paper.created_at
-        })
+        try:
+            result = mongo.db.papers.insert_one({
+                "id": paper.id,
+                "title": paper.title,
+                "abstract": paper.abstract,
+                "keywords": paper.keywords,
+                "paper_path": paper.paper_path,
+                "file_name": paper.file_name,
+                "file_sha256": paper.file_sha256,
+                "file_size": paper.file_size,
+                "storage_backend": paper.storage_backend,
+                "storage_key": paper.storage_key,
+                "authors": paper.authors,
+                "author_emails": paper.author_emails,
+                "track": paper.track,
+                "created_by": paper.created_by,
+                "submission_date": submission_date,
+                "created_at": paper.created_at,
+                "score_weighted_sum": paper.score_weighted_sum,
+                "confidence_sum": paper.confidence_sum,
+                "avg_acceptance": paper.avg_acceptance
+            })
+        except Exception:
+            # No paper points at the file, so its reference goes too
+            discard_upload(stored)
+            raise
 
         inserted_id = result.inserted_id
         mongo.db.tracks.update_one(
             {"_id": ObjectId(track_id)},
             {"$push": {"papers": inserted_id}}
         )
+        invalidate_track_conflicts(track_id)
+        add_paper_to_graph(inserted_id, author_emails)
+        update_paper_relevance(track_id, {"_id": inserted_id, "title": title, "abstract": abstract, "keywords": keywords})
+        refresh_paper_suggestions(track_id, inserted_id)
+        # Page count, text and thumbnail are extracted by the PDF worker
+        enqueue_pdf_job(inserted_id, stored["sha256"])
+        mark_search_index_stale()
         # After saving paper and updating track, assign author role
         author_role = Role(
             conference_id=conference_id,
@@ -151,17 +201,21 @@ def submit_paper():
                 {'$addToSet': {'roles': real_role_id}}  # Save the ObjectId, NOT string
             )
 
+        add_track_membership(track_id, session["user_id"], "author", conference_id,
+                             existing_role["_id"] if existing_role else real_role_id)
+
         return jsonify({
             "message": "Paper created successfully!",
             "paper_id": str(inserted_id),
-            "file_path": f"/{save_path}"
+            "file_path": stored["path"],
+            "file_sha256": stored["sha256"],
+            "file_size": stored["size"]
         }), 201
 
     except Exception as e:
         print("Paper creation error:", e)
         return jsonify({"error": f"Failed to create paper: {str(e)}"}), 500
 
-UPLOAD_FOLDER = "uploads"
 ALLOWED_EXTENSIONS = {'pdf'}
 
 def allowed_file(filename):
@@ -169,45 +223,135 @@ def allowed_file(filename):
 
 def download_paper(paper_id):
     try:
-        print(f"Downloading paper with ID: {paper_id}")
-        paper = mongo.db.papers.find_one({"_id":ObjectId(paper_id)})
-        print(f"paper path: {paper}")
+        paper = mongo.db.papers.find_one(
+            {"_id": ObjectId(paper_id)},
+            {
+                "paper_path": 1, "file_name": 1, "file_sha256": 1, "file_size": 1, "storage_backend": 1,
+                "storage_key": 1, "submission_date": 1, "update_date": 1
+            }
+        )
         if not paper:
             return jsonify({"error": "Paper not found"}), 404
-        paper_path = paper.get("paper_path")
-        if not paper_path:
+        if not paper.get("paper_path"):
             return jsonify({"error": "No file path associated with this paper"}), 404
 
-        # Ensure the path is absolute
-        abs_path = os.path.abspath(paper_path.strip("/"))
+        store, key = paper_blob(paper)
+        # Content-addressed files never change, their hash is a strong validator
+        etag = paper.get("file_sha256") or False
 
-        if not os.path.exists(abs_path):
-            return jsonify({"error": "File does not exist on server"}), 404
-
-        return send_file(abs_path, as_attachment=True)
+        if key and store.local_path(key) is None:
+            # Blobs outside the local disk are streamed chunk by chunk
+            blob = store.open(key)
+            response = current_app.response_class(
+                wrap_file(request.environ, blob), mimetype="application/pdf", direct_passthrough=True
+            )
+            response.content_length = blob.length
+            response.headers["Content-Disposition"] = f'attachment; filename="{paper.get("file_name") or "paper.pdf"}"'
+            response.cache_control.no_cache = True
+            if etag:
+                response.set_etag(etag)
+            response.last_modified = blob.upload_date
+            try:
+                return response.make_conditional(request, accept_ranges=True, complete_length=blob.length)
+            except RequestedRangeNotSatisfiable:
+                blob.close()
+                raise
+
+        abs_path, relative_path = resolve_paper_file(paper)
+        download_name = paper.get("file_name") or os.path.basename(abs_path)
+
+        if Config.FILE_SERVING == "x-accel" and relative_path:
+            # nginx serves the bytes, including Range requests, from an internal location
+            response = current_app.response_class(mimetype="application/pdf")
+            response.headers["X-Accel-Redirect"] = f"{Config.ACCEL_REDIRECT_PREFIX}/{relative_path}"
+            response.headers["Content-Disposition"] = f'attachment; filename="{download_name}"'
+            if etag:
+                response.set_etag(etag)
+            if isinstance(paper.get("update_date") or paper.get("submission_date"), datetime):
+                response.last_modified = paper.get("update_date") or paper.get("submission_date")
+            return response.make_conditional(request)
+
+        # send_file answers If-None-Match, If-Modified-Since and Range itself, and uses
+        # X-Sendfile when USE_X_SENDFILE is on
+        return send_file(
+            abs_path,
+            mimetype="application/pdf",
+            as_attachment=True,
+            download_name=download_name,
+            etag=etag or True,
+            conditional=True
+        )
 
+    except FileNotFoundError:
+        return jsonify({"error": "File does not exist on server"}), 404
+    except RequestedRangeNotSatisfiable:
+        raise
     except Exception as e:
         return jsonify({"error": f"Failed to download paper: {str(e)}"}), 500
 
+def get_paper_thumbnail(paper_id):
+    """PNG of the first page, available once the PDF worker has processed the paper's file."""
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        paper = mongo.db.papers.find_one({"_id": ObjectId(paper_id)}, {"file_sha256": 1, "pdf_info": 1})
+        if not paper:
+            return jsonify({"error": "Paper not found"}), 404
+
+        derived = None
+        if paper.get("file_sha256"):
+            derived = mongo.db.pdf_derived.find_one({"sha256": paper["file_sha256"]}, {"thumbnail": 1, "processed_at": 1})
+        if not derived or not derived.get("thumbnail"):
+            status = (paper.get("pdf_info") or {}).get("status", "missing")
+            return jsonify({"error": "No thumbnail for this paper", "status": status}), 404
+
+        response = current_app.response_class(bytes(derived["thumbnail"]), mimetype="image/png")
+        response.set_etag(paper["file_sha256"])
+        response.last_modified = derived["processed_at"]
+        response.cache_control.private = True
+        response.cache_control.max_age = 3600
+        return response.make_conditional(request)
+
+    except Exception as e:
+        return jsonify({"error": f"Failed to get thumbnail: {str(e)}"}), 500
+
 def get_all_papers():
     if "user_id" not in session:
         return jsonify({"error": "Unauthorized"}), 401
 
     try:
-        papers = mongo.db.papers.find()
-        paper_list = []
-        
-        for paper in papers:
-            # Convert ObjectId to string for JSON serialization
-            paper["_id"] = str(paper["_id"])
-            if "created_at" in paper:
-                paper["created_at"] = paper["created_at"].isoformat()
-            paper_list.append(paper)
-
-        return jsonify({"papers": paper_list}), 200
+        # Unlike the older per-user and per-track listings this one is always paged
+        return list_papers({}, request.args, default_limit=DEFAULT_PAPER_PAGE_SIZE)
     except Exception as e:
         return jsonify({"error": f"Failed to fetch papers: {str(e)}"}), 500
 
+def search_papers():
+    """
+    GET /paper/search?q=...&fulltext=1&track_id=...&decision=accepted&limit=20&offset=0
+    Ranked papers with facet counts for conference, track, decision, review
+    count and avg_acceptance buckets.
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    limit = max(1, min(request.args.get("limit", DEFAULT_SEARCH_SIZE, type=int), MAX_PAGE_SIZE))
+    offset = max(0, request.args.get("offset", 0, type=int))
+    fulltext = request.args.get("fulltext", "").lower() in ("1", "true", "yes")
+
+    try:
+        result = rank_papers(
+            request.args.get("q", ""),
+            {name: request.args.get(name) for name in FACETS},
+            fulltext=fulltext,
+            limit=limit,
+            offset=offset
+        )
+        return jsonify(result), 200
+
+    except Exception as e:
+        return jsonify({"error": f"Failed to search papers: {str(e)}"}), 500
+
 def bid(paper_id):
     if "user_id" not in session:
         return jsonify({"error": "Unauthorized"}), 401
@@ -215,40 +359,43 @@ def bid(paper_id):
     user_id = session["user_id"]
 
     try:
-        paper = mongo.db.papers.find_one({"_id": ObjectId(paper_id)})
+        paper = mongo.db.papers.find_one({"_id": ObjectId(paper_id)}, {"track": 1})
         if not paper:
             return jsonify({"error": "Paper not found"}), 404
 
-        biddings = paper.get("biddings", [])
-
-        if user_id in biddings:
-            # Remove the bid if it already exists
-            biddings.remove(user_id)
-            action = "removed"
-        else:
-            # Add the bid
-            biddings.append(user_id)
-            action = "added"
-
-        mongo.db.papers.update_one(
-            {"_id": ObjectId(paper_id)},
-            {"$set": {"biddings": biddings}}
-        )
-
-        return jsonify({"message": f"Bid {action} successfully", "biddings": biddings}), 200
+        # {"bid": level} sets the preference, 0 withdraws it, no level toggles the bid
+        preference = parse_preference((request.get_json(silent=True) or {}).get("bid"))
+        if preference is None:
+            if withdraw_bid(paper_id, user_id):
+                record_bid_change(paper.get("track"), paper_id, -1)
+                return jsonify({"message": "Bid removed successfully", "preference": 0}), 200
+            preference = DEFAULT_PREFERENCE
+        elif preference == 0:
+            if withdraw_bid(paper_id, user_id):
+                record_bid_change(paper.get("track"), paper_id, -1)
+            return jsonify({"message": "Bid removed successfully", "preference": 0}), 200
+
+        existing = has_bid(paper_id, user_id)
+        if not existing and reviewer_paper_conflict(user_id, paper_id):
+            return jsonify({"error": "You cannot bid on a paper you have a co-authorship conflict with"}), 409
+
+        place_bid(paper, user_id, preference)
+        if not existing:
+            record_bid_change(paper.get("track"), paper_id, 1)
+
+        action = "updated" if existing else "added"
+        return jsonify({"message": f"Bid {action} successfully", "preference": preference}), 200
 
     except Exception as e:
         return jsonify({"error": f"Failed to toggle bid: {str(e)}"}), 500
 
 def get_biddings(paper_id):
     try:
-        paper = mongo.db.papers.find_one({"_id": ObjectId(paper_id)})
+        paper = mongo.db.papers.find_one({"_id": ObjectId(paper_id)}, {"_id": 1})
         if not paper:
             return jsonify({"error": "Paper not found"}), 404
 
-        biddings = paper.get("biddings", [])
-
-        return jsonify({"biddings": biddings}), 200
+        return jsonify({"biddings": paper_bidders(paper_id)}), 200
 
     except Exception as e:
         return jsonify({"error": f"Failed to get biddings: {str(e)}"}), 500
@@ -276,28 +423,49 @@ def update_paper(paper_id):
         if "keywords" in data:
             update_fields["keywords"] = request.form.getlist("keywords")
         if "authors" in data:
-            update_fields["authors"] = request.form.getlist("authors")
+            update_fields["authors"], update_fields["author_emails"] = normalize_authors(request.form.getlist("authors"))
 
         # If a new file is uploaded
         if file and allowed_file(file.filename):
-            old_path = paper.get("paper_path")
-            if old_path and os.path.exists(old_path.lstrip("/")):
-                os.remove(old_path.lstrip("/"))
-
-            # Save new file
-            safe_filename = secure_filename(file.filename)
-            new_path = os.path.join(UPLOAD_FOLDER, f"{paper_id}_{safe_filename}")
-            os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-            file.save(new_path)
-
-            update_fields["paper"] = f"/{new_path}"
+            stored = store_upload(file)
+            update_fields["paper_path"] = stored["path"]
+            update_fields["file_name"] = secure_filename(file.filename)
+            update_fields["file_sha256"] = stored["sha256"]
+            update_fields["file_size"] = stored["size"]
+            update_fields["storage_backend"] = stored["backend"]
+            update_fields["storage_key"] = stored["key"]
 
         # Apply updates
         if update_fields:
-            mongo.db.papers.update_one(
-                {"_id": ObjectId(paper_id)},
-                {"$set": update_fields}
-            )
+            try:
+                mongo.db.papers.update_one(
+                    {"_id": ObjectId(paper_id)},
+                    {"$set": update_fields}
+                )
+            except Exception:
+                # The paper still points at its old file
+                if "storage_key" in update_fields:
+                    discard_upload(stored)
+                raise
+
+        # The old file goes once the paper points at the new one, unless another paper shares it
+        if "storage_key" in update_fields and paper_blob(paper) != paper_blob({**paper, **update_fields}):
+            release_upload(paper)
+        if "file_sha256" in update_fields and paper.get("file_sha256") != update_fields["file_sha256"]:
+            enqueue_pdf_job(paper_id, update_fields["file_sha256"])
+        if any(field in update_fields for field in ("title", "abstract", "keywords", "file_sha256")):
+            mark_search_index_stale()
+
+        if "authors" in update_fields:
+            remove_paper_from_graph(paper_id)
+            add_paper_to_graph(paper_id, update_fields["author_emails"])
+            if paper.get("track"):
+                invalidate_track_conflicts(paper["track"])
+
+        if paper.get("track") and {"title", "abstract", "keywords"} & update_fields.keys():
+            update_paper_relevance(paper["track"], {**paper, **update_fields})
+        if paper.get("track") and {"title", "abstract", "keywords", "authors"} & update_fields.keys():
+            refresh_paper_suggestions(paper["track"], paper_id)
 
         return jsonify({"message": "Paper updated successfully"}), 200
 
@@ -332,6 +500,7 @@ def decide(paper_id):
                 "decision_made_by": decision_made_by
             }}
         )
+        refresh_search_paper(paper_id)
 
         return jsonify({"message": "Decision updated successfully"}), 200
 
@@ -2,6 +2,9 @@ from flask import request, jsonify, session
 from extensions import mongo
 from bson.objectid import ObjectId
 from models.affiliations import Affiliations
+from services.conflicts import invalidate_user_conflicts
+from services.relevance import invalidate_reviewer_relevance
+from services.bid_suggestions import invalidate_reviewer_suggestions
 
 def get_profile(user_id=None):
     if not user_id:
@@ -86,6 +89,14 @@ def update_profile():
         {"$set": update_fields}
     )
 
+    # Affiliations and emails feed the conflict of interest checks
+    if "affiliation" in update_fields or "email" in update_fields:
+        invalidate_user_conflicts(session["user_id"], [session.get("email"), update_fields.get("email")])
+    if "preferred_keywords" in update_fields:
+        invalidate_reviewer_relevance(session["user_id"])
+    if {"preferred_keywords", "not_preferred_keywords", "affiliation", "email"} & update_fields.keys():
+        invalidate_reviewer_suggestions(session["user_id"])
+
     # Update common session fields if they were changed
     for field in ["email", "name", "surname"]:
         if field in update_fields:
@@ -3,6 +3,11 @@ from models.review import Review
 from extensions import mongo
 from bson import ObjectId
 from datetime import datetime
+from services.reviewer_stats import record_new_review, record_review_change, record_rate_change
+from services.relevance import invalidate_reviewer_relevance
+from services.bid_suggestions import invalidate_reviewer_suggestions
+from services.paper_scores import record_review_score, record_review_score_change
+from services.paper_search import refresh_search_paper
 
 def get_review_by_assignment_id(assignment_id):
     try:
@@ -59,29 +64,6 @@ def get_review(review_id):
     except Exception as e:
         return jsonify({"error": f"Failed to fetch review: {str(e)}"}), 500
 
-def update_paper_avg_acceptance(paper_id):
-    paper = mongo.db.papers.find_one({"_id": ObjectId(paper_id)})
-    if not paper:
-        print("Paper not found for avg_acceptance update")
-        return
-
-    review_cursor = mongo.db.reviews.find({"paper_id": paper_id})
-    total_weighted = 0
-    total_confidence = 0
-
-    for review in review_cursor:
-        eval_score = review.get("evaluation", 0)
-        confidence = review.get("confidence", 1) or 1
-        total_weighted += eval_score * confidence
-        total_confidence += confidence
-
-    avg_acceptance = total_weighted / total_confidence if total_confidence else 0.0
-
-    mongo.db.papers.update_one(
-        {"_id": ObjectId(paper_id)},
-        {"$set": {"avg_acceptance": avg_acceptance}}
-    )
-
 def update_review(review_id):
     if "user_id" not in session:
         return jsonify({"error": "Unauthorized"}), 401
@@ -115,8 +97,9 @@ def update_review(review_id):
             {"$set": update_fields}
         )
 
-        paper_id = review["paper_id"]
-        update_paper_avg_acceptance(paper_id)
+        record_review_score_change(review, {**review, **update_fields})
+        record_review_change(review, {**review, **update_fields})
+        refresh_search_paper(review["paper_id"])
 
         return jsonify({"message": "Review updated successfully"}), 200
 
@@ -209,7 +192,8 @@ def submit_review(paper_id):
             }}
         )
         
-        result = mongo.db.reviews.insert_one(review.to_dict())
+        review_dict = review.to_dict()
+        result = mongo.db.reviews.insert_one(review_dict)
 
         mongo.db.papers.update_one(
             {"_id": ObjectId(paper_id)},
@@ -225,7 +209,11 @@ def submit_review(paper_id):
         else:
             print("Warning: Paper has no track_id assigned.")
 
-        update_paper_avg_acceptance(paper_id)
+        record_review_score(review_dict)
+        record_new_review(review_dict, paper)
+        invalidate_reviewer_relevance(review_dict["reviewer_id"])
+        invalidate_reviewer_suggestions(review_dict["reviewer_id"])
+        refresh_search_paper(paper_id)
 
         return jsonify({
             "message": "Review created successfully",
@@ -272,16 +260,15 @@ def rate_review(review_id):
             return jsonify({"error": "Review not found"}), 404
 
         rates = review.get("rates", [])
-        updated = False
+        old_rate = None
 
         # Update rate if already rated by this user
         for r in rates:
             if r["userid"] == user_id:
+                old_rate = r["rate"]
                 r["rate"] = rate_value
-                updated = True
                 break
-
-        if not updated:
+        else:
             # Add new rate
             rates.append({"userid": user_id, "rate": rate_value})
 
@@ -290,6 +277,7 @@ def rate_review(review_id):
             {"_id": ObjectId(review_id)},
             {"$set": {"rates": rates}}
         )
+        record_rate_change(review, old_rate, rate_value)
 
         return jsonify({"message": "Rate added/updated successfully"}), 200
 
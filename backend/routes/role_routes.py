@@ -2,7 +2,9 @@ from flask import request, jsonify, session
 from extensions import mongo
 from bson.objectid import ObjectId
 from models.role import Role
+from services.dataloader import get_loader
 from datetime import datetime
+from services.track_memberships import add_track_membership
 
 def assign_role():
     if 'user_id' not in session:
@@ -41,6 +43,7 @@ def assign_role():
         )
         
         if result.modified_count > 0:
+            add_track_membership(track_id, user_id, position, conference_id, new_role.id)
             return jsonify({
                 'success': True, 
                 'message': 'Role assigned successfully',
@@ -117,22 +120,27 @@ def get_role_status():
     active_roles = []
     past_roles = []
 
-    for role_id in role_ids:
-        try:
-            role_obj_id = ObjectId(role_id)
-        except Exception:
-            print(f"Removing invalid role from user: {role_id}")
-            mongo.db.users.update_one(
-                {"_id": ObjectId(user_id)},
-                {"$pull": {"roles": role_id}}
-            )
-            continue
+    # Drop role ids that are not valid ObjectIds from the user
+    invalid_role_ids = [role_id for role_id in role_ids if not ObjectId.is_valid(role_id)]
+    for role_id in invalid_role_ids:
+        print(f"Removing invalid role from user: {role_id}")
+    if invalid_role_ids:
+        mongo.db.users.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$pull": {"roles": {"$in": invalid_role_ids}}}
+        )
 
-        role = mongo.db.roles.find_one({'_id': role_obj_id})
-        if not role:
-            continue
+    # Load the roles, then their conferences and tracks, one batch per collection
+    role_loader = get_loader("roles")
+    conference_loader = get_loader("conferences")
+    track_loader = get_loader("tracks")
+
+    roles = [role for role in role_loader.load_many(role_ids) if role]
+    conference_loader.prime(role.get("conference_id") for role in roles)
+    track_loader.prime(role.get("track_id") for role in roles if role.get("track_id") not in (None, "None"))
 
-        conference = mongo.db.conferences.find_one({'_id': ObjectId(role['conference_id'])})
+    for role in roles:
+        conference = conference_loader.load(role.get("conference_id"))
         if not conference:
             continue
 
@@ -154,7 +162,7 @@ def get_role_status():
 
         track_id = role.get("track_id")
         if track_id and track_id != "None":
-            track = mongo.db.tracks.find_one({'_id': ObjectId(track_id)})
+            track = track_loader.load(track_id)
             if track:
                 role_info["track_name"] = track.get("track_name", "Unknown Track")
             else:
@@ -1,18 +1,19 @@
 from flask import Blueprint
 from routes.auth_routes import login, signup, logout, check_session, login_google, google_callback
-from routes.conference_routes import get_conference_by_id, create_conference, create_conference_from_series, get_conferences, get_my_conference_series, get_conference, invite_pc_member, update_conference, appoint_superchair, get_series_stats
+from routes.conference_routes import get_conference_by_id, create_conference, create_conference_from_series, get_conferences, get_my_conference_series, get_conference, invite_pc_member, update_conference, appoint_superchair, get_series_stats, export_conference_papers
 
 from routes.ping_routes import ping
 from routes.profile_routes import get_profile, update_profile, get_all_users, get_affiliations, add_affiliations
 from routes.role_routes import assign_role, get_roles, get_role, get_role_status
 from routes.chad_routes import send_chad, get_received_chad, get_sent_chad
-from routes.paper_routes import  get_paper, get_all_papers, submit_paper, download_paper, get_biddings, bid, update_paper, decide, get_papers_of_user
+from routes.paper_routes import  get_paper, get_all_papers, submit_paper, download_paper, get_paper_thumbnail, search_papers, get_biddings, bid, update_paper, decide, get_papers_of_user
 from routes.review_routes import get_review, update_review, submit_review, get_reviews_by_paper, rate_review, avg_rate, get_review_by_assignment_id, avg_rate_of_user 
 from routes.notification_routes import get_notification, mark_notification_as_answered, mark_all_read
 from routes.keywords_routes import get_keywords, add_keyword, set_keywords
-from routes.track_routes import create_track, get_tracks_by_conference, appoint_track_chair, get_track_by_people, get_track_by_author, get_track_by_reviewer, get_track, get_all_tracks, get_all_relevant_people, get_all_papers_in_track, appoint_track_member, get_track_members, get_effective_track_settings, update_track,  get_track_authors_by_papers_in_the_track, conflict_of_interest
+from routes.track_routes import create_track, get_tracks_by_conference, appoint_track_chair, get_track_by_people, get_track_by_author, get_track_by_reviewer, get_track, get_all_tracks, get_all_relevant_people, get_all_papers_in_track, appoint_track_member, get_track_members, get_effective_track_settings, update_track,  get_track_authors_by_papers_in_the_track, conflict_of_interest, get_track_relevance_matrix, get_track_bid_matrix, get_bid_suggestions, export_track_papers
 
-from routes.assignment_routes import create_assignment_for_track, get_assignments_for_reviewer, get_assigned_papers, get_assignments_by_paper
+from routes.dashboard_routes import get_my_dashboard
+from routes.assignment_routes import create_assignment_for_track, bulk_assign_track, auto_assign_track, get_assignments_for_reviewer, get_assigned_papers, get_assignments_by_paper
 
 
 # Define blueprints
@@ -29,6 +30,7 @@ notification_bp = Blueprint("notification", __name__)
 keywords_bp = Blueprint("keywords", __name__)
 track_bp = Blueprint("track", __name__)
 assignment_bp = Blueprint("assignment", __name__)
+me_bp = Blueprint("me", __name__)
 
 # Route bindings (logic attached here)
 auth_bp.route("/login", methods=["POST"])(login)
@@ -46,6 +48,7 @@ conference_bp.route("/by_id/<conference_id>", methods=["GET"])(get_conference_by
 conference_bp.route("/series/my_series", methods=["GET"])(get_my_conference_series)
 conference_bp.route("/<conference_id>", methods=["GET"])(get_conference)
 conference_bp.route("/<conference_id>/superchair", methods=["POST"])(appoint_superchair)
+conference_bp.route("/<conference_id>/export", methods=["GET"])(export_conference_papers)
 conference_bp.route("/update_conference/<conference_id>", methods=["POST"])(update_conference)
 conference_bp.route("/series/stats/<series_id>", methods=["GET"])(get_series_stats)
 
@@ -68,8 +71,10 @@ chad_bp.route("/outbox", methods=["GET"])(get_sent_chad)
 
 paper_bp.route("/<paper_id>", methods=["GET"])(get_paper)
 paper_bp.route("/", methods=["GET"])(get_all_papers)
+paper_bp.route("/search", methods=["GET"])(search_papers)
 paper_bp.route("/submit", methods=["POST"])(submit_paper)
 paper_bp.route("/<paper_id>/download", methods=["GET"])(download_paper)
+paper_bp.route("/<paper_id>/thumbnail", methods=["GET"])(get_paper_thumbnail)
 paper_bp.route("/<paper_id>/bid", methods=["POST"])(bid)
 paper_bp.route("/<paper_id>/biddings", methods=["GET"])(get_biddings)
 paper_bp.route("/<paper_id>/update", methods=["POST"])(update_paper)
@@ -103,6 +108,8 @@ track_bp.route("/<track_id>/reviewer", methods=["GET"])(get_track_by_reviewer)
 track_bp.route("/<track_id>", methods=["GET"])(get_track)
 track_bp.route("/<track_id>/relevant", methods=["GET"])(get_all_relevant_people)
 track_bp.route("/<track_id>/assign", methods=["POST"])(create_assignment_for_track)
+track_bp.route("/<track_id>/assign/bulk", methods=["POST"])(bulk_assign_track)
+track_bp.route("/<track_id>/auto_assign", methods=["POST"])(auto_assign_track)
 track_bp.route("/<track_id>/papers", methods=["GET"])(get_all_papers_in_track)
 track_bp.route("/appoint_track_members", methods=["POST"])(appoint_track_member)
 track_bp.route("/<track_id>/members", methods=["GET"])(get_track_members)
@@ -110,12 +117,18 @@ track_bp.route('/<track_id>/effective_settings', methods=['GET'])(get_effective_
 track_bp.route('/update_track/<track_id>', methods=['post'])(update_track)
 track_bp.route("/<track_id>/authors", methods=["GET"])(get_track_authors_by_papers_in_the_track)
 track_bp.route("/<track_id>/conflicts", methods=["GET"])(conflict_of_interest)
+track_bp.route("/<track_id>/relevance", methods=["GET"])(get_track_relevance_matrix)
+track_bp.route("/<track_id>/bids", methods=["GET"])(get_track_bid_matrix)
+track_bp.route("/<track_id>/bid_suggestions", methods=["GET"])(get_bid_suggestions)
+track_bp.route("/<track_id>/export", methods=["GET"])(export_track_papers)
 
 
 assignment_bp.route("/reviewer/<reviewer_id>", methods=["GET"])(get_assignments_for_reviewer)
 assignment_bp.route("/reviewer/<reviewer_id>/papers", methods=["GET"])(get_assigned_papers)
 assignment_bp.route("/paper/<paper_id>", methods=["GET"])(get_assignments_by_paper)
 
+me_bp.route("/dashboard", methods=["GET"])(get_my_dashboard)
+
 
 # Register list
 all_routes = [
@@ -131,4 +144,5 @@ all_routes = [
     (keywords_bp, "/keywords"),
     (track_bp, "/track"),
     (assignment_bp, "/assignment"),
+    (me_bp, "/me"),
 ]
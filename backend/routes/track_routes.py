@@ -1,14 +1,25 @@
-import json
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, current_app, stream_with_context
 from models.conference import Conference
 from bson import ObjectId
 from extensions import mongo
 from models.pc_member_invitation import PCMemberInvitation
 from routes.notification_routes import send_notification
+from routes.paper_routes import list_papers
 from models.track import Track
 from models.paper import Paper
 from models.role import Role
 from models.user import User
+from services.track_memberships import add_track_membership
+from services.dataloader import get_loader
+from services.authors import paper_author_emails
+from services.conflicts import get_track_conflicts, invalidate_track_conflicts
+from services.settings_cache import get_cached_settings, store_settings, version_of, bump_version, setting_value
+from services.bids import track_bid_preferences, pack_bid_matrix
+from services.bid_suggestions import suggest_papers, invalidate_track_suggestions, DEFAULT_SUGGESTIONS
+from services.pagination import MAX_PAGE_SIZE
+from services.relevance import get_track_relevance, invalidate_track_relevance
+from services.paper_export import DECISION_QUERIES, stream_papers_zip
+from services.conferences import find_track_conference
 
 
 def get_all_tracks():
@@ -107,6 +118,7 @@ def appoint_track_chair():
             {"_id": ObjectId(track_chair)},
             {"$push": {"roles": role_id}}
         )
+        add_track_membership(track_id, track_chair, "track_chair", conference_id, role_id)
 
         return jsonify({"message": "Track chair appointed successfully"}), 200
     except Exception as e:
@@ -166,6 +178,10 @@ def appoint_track_member():
             {"_id": ObjectId(track_member)},
             {"$push": {"roles": role_id}}
         )
+        add_track_membership(track_id, track_member, "track_member", conference_id, role_id)
+        invalidate_track_conflicts(track_id)
+        invalidate_track_relevance(track_id)
+        invalidate_track_suggestions(track_id)
 
         return jsonify({"message": "Track member appointed successfully"}), 200
     except Exception as e:
@@ -233,34 +249,20 @@ def get_all_relevant_people(track_id):
         return jsonify({"error": "Unauthorized"}), 401
 
     try:
-        track = mongo.db.tracks.find_one({"_id": ObjectId(track_id)})
+        track = mongo.db.tracks.find_one({"_id": ObjectId(track_id)}, {"_id": 1})
         if not track:
             return jsonify({"error": "Track not found"}), 404
 
-        # find all the people who have roles with role_id in the roles
-        # people have roles keeping role_ids, roles have track_ids
-
-        # find all people who has role array non null
-        people = mongo.db.users.find({"roles": {"$ne": []}})
-
-   
-        # find all the roles of the track
-
-        # cross references people.roles with roles_of_track
-        # and get the user_id and role name of the people and return it
-        people_position = []
+        # track_memberships is the reverse index of the users' track roles
+        memberships = mongo.db.track_memberships.find(
+            {"track_id": str(track_id)},
+            {"user_id": 1, "position": 1}
+        )
 
-        for person in people:
-            if "roles" in person:
-                for role_data in person["roles"]:
-                    if isinstance(role_data, dict) and "track_id" in role_data:
-                        track_id_str = str(track_id)
-                        if role_data["track_id"] == track_id_str:
-                            people_position.append({
-                                "user_id": str(person["_id"]),
-                                "role": role_data["position"]
-                            })
-                        
+        people_position = [
+            {"user_id": membership["user_id"], "role": membership["position"]}
+            for membership in memberships
+        ]
 
         return jsonify({"people": people_position}), 200
     except Exception as e:
@@ -289,36 +291,16 @@ def get_track_by_people(people_id):
 
 def get_all_papers_in_track(track_id):
     try:
-        # Fetch the track document by track_id
-        track = mongo.db.tracks.find_one({"_id": ObjectId(track_id)})
+        track = mongo.db.tracks.find_one({"_id": ObjectId(track_id)}, {"papers": 1})
 
         if not track:
             return jsonify({"error": "Track not found"}), 404
 
-        # Get all paper IDs associated with the track
-        paper_ids = track.get("papers", [])
-        # print(f"Paper IDs associated with track: {paper_ids}")  # Debugging
-
-        if not paper_ids:
+        if not track.get("papers"):
             return jsonify({"error": "No papers associated with this track"}), 404
 
-        # Convert paper IDs to ObjectId for querying papers
-        paper_ids_object = [ObjectId(paper_id) for paper_id in paper_ids]
-        # print(f"Converted Paper IDs to ObjectId: {paper_ids_object}")  # Debugging
-
-        # Fetch the papers using the ObjectId list
-        papers_cursor = mongo.db.papers.find({"_id": {"$in": paper_ids_object}})
-        papers = list(papers_cursor)  # Convert cursor to list to inspect the documents
-
-        # print(f"Papers fetched from DB: {papers}")  # Debugging
-
-        # Convert papers to a list and return the results
-        paper_list = []
-        for paper in papers:
-            paper["_id"] = str(paper["_id"])  # Convert ObjectId to string for the response
-            paper_list.append(paper)
-
-        return jsonify({"papers": paper_list}), 200
+        # Papers carry their track, which the (track, sort field, _id) indexes cover
+        return list_papers({"track": track_id}, request.args)
 
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve papers: {str(e)}"}), 500
@@ -334,11 +316,11 @@ def get_track_members(track_id):
 
         track_members = track.get("track_members", [])
         
-        # Get full user details for each track member
+        # Get full user details for all track members in one batch
         member_details = []
-        for member_id in track_members:
-            user = mongo.db.users.find_one({"_id": ObjectId(member_id)})
+        for user in get_loader("users").load_many(track_members):
             if user:
+                user = dict(user)
                 user["_id"] = str(user["_id"])
                 member_details.append(user)
 
@@ -361,53 +343,7 @@ def get_track_authors_by_papers_in_the_track(track_id):
         # Collect all unique author emails from papers
         author_emails = set()
         for paper in papers:
-            # Handle both string-encoded JSON and proper lists
-            authors_data = paper.get("authors", [])
-            
-            # If authors is a string, parse it as JSON
-            if isinstance(authors_data, str):
-                try:
-                    authors = json.loads(authors_data)
-                except json.JSONDecodeError:
-                    continue  # Skip invalid JSON
-            # If it's already a list, use directly
-            elif isinstance(authors_data, list):
-                authors = authors_data
-            else:
-                continue  # Skip invalid format
-            
-            # Process authors
-            for author in authors:
-                # If author is a string, try to parse it as JSON
-                if isinstance(author, str):
-                    try:
-                        author_data = json.loads(author)
-                    except json.JSONDecodeError:
-                        continue
-                else:
-                    author_data = author
-
-                if isinstance(author_data, list):
-                    for single_author_data in author_data:
-
-                        if single_author_data and isinstance(single_author_data, str):
-                            normalized_email = single_author_data.strip().lower()
-                            author_emails.add(normalized_email)
-                        elif single_author_data and isinstance(single_author_data, dict):
-                            email = single_author_data.get("email")
-                            if email:
-                                normalized_email = email.strip().lower()
-                                author_emails.add(normalized_email)
-
-                else:
-                    if isinstance(author_data, str):
-                        normalized_email = author_data.strip().lower()
-                        author_emails.add(normalized_email)
-                    elif isinstance(author_data, dict):
-                        email = author_data.get("email")
-                        if email:
-                            normalized_email = email.strip().lower()
-                            author_emails.add(normalized_email)
+            author_emails.update(paper_author_emails(paper))
 
         # Retrieve user details for collected emails
         # print(f"Author emails found: {author_emails}")
@@ -425,93 +361,132 @@ def get_track_authors_by_papers_in_the_track(track_id):
         return jsonify({"error": str(e)}), 500
     
 
-# def conflict_of_interest(track_id):
-    # using the get_track_authors_by_papers_in_the_track and get_track_members, we have the profiles of both sides
-    # now, we need to check if the authors and members to see if they have similar affiliations.
-    # we need to return the conflicting pairs, who have the same affiliations 
 def conflict_of_interest(track_id):
     if "user_id" not in session:
         return jsonify({"error": "Unauthorized"}), 401
     
     try:
-        # Get track members
-        members_response = get_track_members(track_id)
-        if members_response[1] != 200:
-            return members_response
-        members = members_response[0].get_json().get("track_members", [])
-        # Get authors
-        authors_response = get_track_authors_by_papers_in_the_track(track_id)
-        if authors_response[1] != 200:
-            return authors_response
-        authors = authors_response[0].get_json().get("authors", [])
-        
-        # Check for conflicts based on affiliation
-        conflicts = []
-        for member in members:
-            member_affiliation = member.get("affiliation", "").lower().strip()
-            if not member_affiliation:
-                continue
-                
-            for author in authors:
-                author_affiliation = author.get("affiliation", "").lower().strip()
-                if not author_affiliation:
-                    continue
-                
-                # Skip if member and author are the same person
-                if member.get("_id") == author.get("_id"):
-                    continue
-                    
-                # Check if affiliations match or are similar
-                if (member_affiliation == author_affiliation or 
-                    member_affiliation in author_affiliation or 
-                    author_affiliation in member_affiliation):
-                    conflicts.append({
-                        "member": {
-                            "id": member.get("_id"),
-                            "name": member.get("name", ""),
-                            "email": member.get("email", ""),
-                            "affiliation": member.get("affiliation", "")
-                        },
-                        "author": {
-                            "id": author.get("_id"),
-                            "name": author.get("name", ""),
-                            "email": author.get("email", ""),
-                            "affiliation": author.get("affiliation", "")
-                        }
-                    })
-        
-        # After conflicts are identified
-        # Get all papers in the track
-        paper_response = get_all_papers_in_track(track_id)
-        if paper_response[1] != 200:
-            return paper_response
-            
-        all_papers = paper_response[0].get_json().get("papers", [])
+        track = mongo.db.tracks.find_one({"_id": ObjectId(track_id)}, {"track_members": 1, "papers": 1})
+        if not track:
+            return jsonify({"error": "Track not found"}), 404
 
-        # For each conflict, find the author's papers
-        for conflict in conflicts:
-            author_email = conflict["author"]["email"].lower().strip()
-            author_papers = []
-            
-            for paper in all_papers:
-                # Check if this paper has the conflicting author
-                authors_data = str(paper.get("authors", ""))  # Convert to string for simple search
-                
-                # Simple string search - if the email is found anywhere in the authors data
-                if author_email in authors_data.lower():
-                    author_papers.append({
-                        "id": paper.get("_id"),
-                        "title": paper.get("title", "Untitled Paper")
-                    })
-            
-            # Add the papers to the conflict information
-            conflict["reason"] = f"Affiliation conflict with {len(author_papers)} paper(s)"
-            conflict["papers"] = author_papers
+        # Conflicts are precomputed per track and refreshed when its papers or members change
+        conflicts = get_track_conflicts(track)
         return jsonify({"conflicts": conflicts}), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
+def get_track_relevance_matrix(track_id):
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        track = mongo.db.tracks.find_one({"_id": ObjectId(track_id)}, {"track_members": 1, "papers": 1})
+        if not track:
+            return jsonify({"error": "Track not found"}), 404
+
+        # Cosine similarity of paper and reviewer tf-idf vectors, cached per track
+        relevance = get_track_relevance(track)
+        return jsonify({
+            "paper_ids": relevance["paper_ids"],
+            "reviewer_ids": relevance["reviewer_ids"],
+            "scores": relevance["similarity"].round(4).tolist()
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def get_track_bid_matrix(track_id):
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        track = mongo.db.tracks.find_one(
+            {"_id": ObjectId(track_id)},
+            {"papers": 1, "track_members": 1, "track_chairs": 1, "conference_id": 1, "settings": 1}
+        )
+        if not track:
+            return jsonify({"error": "Track not found"}), 404
+
+        conference = find_track_conference(track, {"superchairs": 1, "chairs_can_view_bids": 1})
+
+        user_id = session["user_id"]
+        chairs = {str(chair) for chair in track.get("track_chairs") or []}
+        chairs.update(str(chair) for chair in (conference or {}).get("superchairs") or [])
+        if user_id not in chairs:
+            return jsonify({"error": "Only chairs can view the bids"}), 403
+        if not setting_value(track, conference, "chairs_can_view_bids", False):
+            return jsonify({"error": "Bids are hidden from chairs in this track"}), 403
+
+        # papers x users preference matrix from a single query on bids
+        return jsonify(pack_bid_matrix(track, track_bid_preferences(track_id))), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def export_track_papers(track_id):
+    """GET /track/<track_id>/export?decision=accepted streams the track's PDFs and a manifest as one ZIP."""
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    decision = request.args.get("decision")
+    if decision and decision not in DECISION_QUERIES:
+        return jsonify({"error": f"decision must be one of {', '.join(DECISION_QUERIES)}"}), 400
+
+    try:
+        track = mongo.db.tracks.find_one(
+            {"_id": ObjectId(track_id)}, {"track_name": 1, "papers": 1, "track_chairs": 1, "conference_id": 1}
+        )
+        if not track:
+            return jsonify({"error": "Track not found"}), 404
+
+        conference = find_track_conference(track, {"superchairs": 1})
+
+        chairs = {str(chair) for chair in track.get("track_chairs") or []}
+        chairs.update(str(chair) for chair in (conference or {}).get("superchairs") or [])
+        if session["user_id"] not in chairs:
+            return jsonify({"error": "Only chairs can export the papers"}), 403
+
+        response = current_app.response_class(
+            stream_with_context(stream_papers_zip([track], decision)), mimetype="application/zip"
+        )
+        response.headers["Content-Disposition"] = f'attachment; filename="track-{track_id}-papers.zip"'
+        # Let nginx pass the archive on as it is written
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    except Exception as e:
+        return jsonify({"error": f"Failed to export papers: {str(e)}"}), 500
+
+def get_bid_suggestions(track_id):
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        track = mongo.db.tracks.find_one(
+            {"_id": ObjectId(track_id)},
+            {"papers": 1, "track_members": 1, "conference_id": 1, "settings": 1}
+        )
+        if not track:
+            return jsonify({"error": "Track not found"}), 404
+
+        user_id = session["user_id"]
+        if user_id not in {str(member) for member in track.get("track_members", [])}:
+            return jsonify({"error": "Only track members can bid in this track"}), 403
+
+        conference = find_track_conference(track, {"bidding_enabled": 1})
+        if not setting_value(track, conference, "bidding_enabled", False):
+            return jsonify({"error": "Bidding is not enabled for this track"}), 403
+
+        limit = max(1, min(request.args.get("limit", DEFAULT_SUGGESTIONS, type=int), MAX_PAGE_SIZE))
+
+        # Ranked from per-track scores that are kept current as papers and bids change
+        return jsonify({"papers": suggest_papers(track, user_id, limit)}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 ### FOR LATER USE/UPDATE
 def create_track():
     if "user_id" not in session:
@@ -561,52 +536,64 @@ def create_track():
 
 def get_effective_track_settings(track_id):
     try:
-        # 1️⃣ Find the track
-        track = mongo.db.tracks.find_one({"_id": ObjectId(track_id)})
-        if not track:
-            return jsonify({"error": "Track not found"}), 404
+        # Repeat reads are answered from the cache, the version stamps are rechecked every few seconds
+        cached = get_cached_settings(track_id)
+        if cached is None:
+            track_version = version_of("track", track_id)
 
-        conference_id = track.get("conference_id")
-        if not conference_id:
-            return jsonify({"error": "Conference ID not found in track"}), 400
-
-        # 2️⃣ Find the conference
-        conference = mongo.db.conferences.find_one({"_id": ObjectId(conference_id)})
-        if not conference:
-            return jsonify({"error": "Conference not found"}), 404
-
-        # 3️⃣ Prepare the response dictionary
-        effective_settings = {}
-
-        # 4️⃣ Iterate all keys in the conference
-        for key, value in conference.items():
-            if isinstance(value, dict) and "scope" in value:
-                # If it's a setting object with scope
-                if value["scope"] == "track":
-                    # If the track has an override for this setting, use it
-                    track_setting = track.get("settings", {}).get(key)
-                    if track_setting:
-                        effective_settings[key] = {
-                            "value": track_setting.get("value"),
-                            "scope": "track"
-                        }
-                    else:
-                        # If no override in track, use the conference default
+            # 1️⃣ Find the track
+            track = mongo.db.tracks.find_one({"_id": ObjectId(track_id)}, {"conference_id": 1, "settings": 1})
+            if not track:
+                return jsonify({"error": "Track not found"}), 404
+
+            conference_id = track.get("conference_id")
+            if not conference_id:
+                return jsonify({"error": "Conference ID not found in track"}), 400
+
+            stamp = (version_of("conference", conference_id), track_version)
+
+            # 2️⃣ Find the conference
+            conference = mongo.db.conferences.find_one({"_id": ObjectId(conference_id)})
+            if not conference:
+                return jsonify({"error": "Conference not found"}), 404
+
+            # 3️⃣ Prepare the response dictionary
+            effective_settings = {}
+
+            # 4️⃣ Iterate all keys in the conference
+            for key, value in conference.items():
+                if isinstance(value, dict) and "scope" in value:
+                    # If it's a setting object with scope
+                    if value["scope"] == "track":
+                        # If the track has an override for this setting, use it
+                        track_setting = track.get("settings", {}).get(key)
+                        if track_setting:
+                            effective_settings[key] = {
+                                "value": track_setting.get("value"),
+                                "scope": "track"
+                            }
+                        else:
+                            # If no override in track, use the conference default
+                            effective_settings[key] = {
+                                "value": value.get("value"),
+                                "scope": "track"
+                            }
+                    elif value["scope"] == "conference":
                         effective_settings[key] = {
                             "value": value.get("value"),
-                            "scope": "track"
+                            "scope": "conference"
                         }
-                elif value["scope"] == "conference":
-                    effective_settings[key] = {
-                        "value": value.get("value"),
-                        "scope": "conference"
-                    }
 
-        return jsonify({
-            "track_id": str(track_id),
-            "conference_id": conference_id,
-            "effective_settings": effective_settings
-        }), 200
+            cached = store_settings(track_id, conference_id, stamp, {
+                "track_id": str(track_id),
+                "conference_id": conference_id,
+                "effective_settings": effective_settings
+            })
+
+        # ETag lets the frontend revalidate with If-None-Match and get a 304
+        response = jsonify(cached["payload"])
+        response.set_etag(cached["etag"])
+        return response.make_conditional(request)
 
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve effective settings: {str(e)}"}), 500
@@ -648,6 +635,8 @@ def update_track(track_id):
                 {"$set": {"settings": current_settings}}
             )
 
+        bump_version("track", track_id)
+
         return jsonify({"message": "Track updated successfully"}), 200
 
     except Exception as e:
@@ -0,0 +1,176 @@
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from extensions import mongo
+from models.assignment import Assignment
+from services.authors import paper_author_emails
+from services.coauthors import direct_coauthors
+
+MAX_BULK_ASSIGNMENTS = 5000
+DUPLICATE_KEY = 11000
+
+
+def insert_track_assignments(track_id, pairs):
+    """
+    Writes (paper_id, reviewer_id) pairs as assignments of a track with one
+    insert and one $push $each on the track. The pairs must already be
+    deduplicated. Returns the new assignment ids in the same order, None for
+    pairs the unique index rejected because they were assigned meanwhile.
+    """
+    assignments = [
+        Assignment(id=ObjectId(), reviewer_id=reviewer_id, paper_id=paper_id, track_id=track_id)
+        for paper_id, reviewer_id in pairs
+    ]
+    if not assignments:
+        return []
+
+    assignment_ids = [assignment.id for assignment in assignments]
+    try:
+        # Unordered, so a duplicate only skips its own document
+        mongo.db.assignments.insert_many([assignment.to_dict() for assignment in assignments], ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if e.details.get("writeConcernErrors") or any(error["code"] != DUPLICATE_KEY for error in errors):
+            raise
+        for error in errors:
+            assignment_ids[error["index"]] = None
+
+    created = [assignment_id for assignment_id in assignment_ids if assignment_id]
+    if created:
+        mongo.db.tracks.update_one({"_id": ObjectId(track_id)}, {"$push": {"assignments": {"$each": created}}})
+    return assignment_ids
+
+
+def duplicate_assignment_groups():
+    """
+    Repeated assignments of the same reviewer to the same paper of a track,
+    one group per pair, reviewed assignments first and then the oldest.
+    """
+    return mongo.db.assignments.aggregate([
+        {"$sort": {"is_pending": 1, "_id": 1}},
+        {"$group": {
+            "_id": {"track_id": "$track_id", "paper_id": "$paper_id", "reviewer_id": "$reviewer_id"},
+            "assignments": {"$push": {"_id": "$_id", "id": "$id", "is_pending": "$is_pending"}}
+        }},
+        {"$match": {"assignments.1": {"$exists": True}}}
+    ], allowDiskUse=True)
+
+
+def remove_duplicate_assignments():
+    """
+    Deletes the pending copies of repeated assignments, keeping a reviewed one
+    if there is one, else the oldest. Reviewed copies are never deleted, so
+    pairs reviewed more than once are left for a chair to resolve. Returns
+    (deleted, unresolved pairs).
+    """
+    deleted = 0
+    unresolved = []
+    for group in duplicate_assignment_groups():
+        extras = [assignment for assignment in group["assignments"][1:] if assignment.get("is_pending", True)]
+        if len(extras) < len(group["assignments"]) - 1:
+            unresolved.append(group["_id"])
+        if not extras:
+            continue
+        mongo.db.assignments.delete_many({"_id": {"$in": [assignment["_id"] for assignment in extras]}})
+        if ObjectId.is_valid(str(group["_id"].get("track_id"))):
+            mongo.db.tracks.update_one(
+                {"_id": ObjectId(group["_id"]["track_id"])},
+                {"$pull": {"assignments": {"$in": [assignment.get("id") for assignment in extras]}}}
+            )
+        deleted += len(extras)
+    return deleted, unresolved
+
+
+def find_conflicting_pairs(pairs):
+    """Pairs whose reviewer wrote the paper or co-authored with one of its authors, in a constant number of queries."""
+    reviewer_ids = {ObjectId(reviewer_id) for _, reviewer_id in pairs}
+    paper_ids = {ObjectId(paper_id) for paper_id, _ in pairs}
+
+    reviewer_emails = {
+        str(user["_id"]): (user.get("email") or "").strip().lower()
+        for user in mongo.db.users.find({"_id": {"$in": list(reviewer_ids)}}, {"email": 1})
+    }
+    author_emails = {
+        str(paper["_id"]): set(paper_author_emails(paper))
+        for paper in mongo.db.papers.find({"_id": {"$in": list(paper_ids)}}, {"authors": 1, "author_emails": 1})
+    }
+    coauthors = direct_coauthors([email for email in reviewer_emails.values() if email])
+
+    conflicting = set()
+    for paper_id, reviewer_id in pairs:
+        email = reviewer_emails.get(reviewer_id)
+        if not email:
+            continue
+        authors = author_emails.get(paper_id, set())
+        if email in authors or authors & coauthors.get(email, set()):
+            conflicting.add((paper_id, reviewer_id))
+    return conflicting
+
+
+def bulk_create_assignments(track, items):
+    """
+    Creates the assignments listed as {"paper_id", "reviewer_id"} items.
+    Returns one result per item, in order, with a status of "created",
+    "exists" (already assigned, or repeated in the request), "invalid" or
+    "conflict". Sending the same items again creates nothing new.
+    """
+    track_id = str(track["_id"])
+    track_papers = {str(paper_id) for paper_id in track.get("papers", [])}
+
+    results = []
+    candidates = {}
+    repeats = []
+    for index, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        paper_id = str(item.get("paper_id") or "")
+        reviewer_id = str(item.get("reviewer_id") or "")
+        result = {"index": index, "paper_id": paper_id, "reviewer_id": reviewer_id}
+        results.append(result)
+
+        if not ObjectId.is_valid(paper_id) or not ObjectId.is_valid(reviewer_id):
+            result.update(status="invalid", error="paper_id and reviewer_id must be valid ids")
+        elif paper_id not in track_papers:
+            result.update(status="invalid", error="Paper is not in this track")
+        elif (paper_id, reviewer_id) in candidates:
+            repeats.append((result, candidates[(paper_id, reviewer_id)]))
+        else:
+            candidates[(paper_id, reviewer_id)] = result
+
+    if candidates:
+        existing = mongo.db.assignments.find(
+            {"track_id": track_id, "paper_id": {"$in": list({paper_id for paper_id, _ in candidates})}},
+            {"id": 1, "paper_id": 1, "reviewer_id": 1}
+        )
+        for assignment in existing:
+            result = candidates.pop((assignment["paper_id"], assignment["reviewer_id"]), None)
+            if result:
+                result.update(status="exists", assignment_id=assignment.get("id"))
+
+    if candidates:
+        for pair in find_conflicting_pairs(list(candidates)):
+            candidates.pop(pair).update(status="conflict", error="Reviewer has a co-authorship conflict with this paper")
+
+    pairs = list(candidates)
+    raced = {}
+    for pair, assignment_id in zip(pairs, insert_track_assignments(track_id, pairs)):
+        if assignment_id:
+            candidates[pair].update(status="created", assignment_id=assignment_id)
+        else:
+            raced[pair] = candidates[pair]
+            raced[pair].update(status="exists")
+
+    if raced:
+        # Assigned by a concurrent request after the check above
+        for assignment in mongo.db.assignments.find(
+            {"track_id": track_id, "paper_id": {"$in": list({paper_id for paper_id, _ in raced})}},
+            {"id": 1, "paper_id": 1, "reviewer_id": 1}
+        ):
+            result = raced.get((assignment["paper_id"], assignment["reviewer_id"]))
+            if result:
+                result["assignment_id"] = assignment.get("id")
+
+    # Repeats within the request follow whatever their first occurrence resolved to
+    for result, first in repeats:
+        status = "exists" if first["status"] == "created" else first["status"]
+        result.update({key: value for key, value in first.items() if key in ("assignment_id", "error")}, status=status)
+
+    return results
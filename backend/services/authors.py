@@ -0,0 +1,123 @@
+import json
+from pymongo import UpdateOne
+from extensions import mongo
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+def extract_author_emails(authors_data):
+    """
+    Collects the lowercased emails from a paper's authors field. It may be a JSON
+    string, a list of JSON strings, nested lists, dicts with an email key or plain emails.
+    """
+    # If authors is a string, parse it as JSON
+    if isinstance(authors_data, str):
+        try:
+            authors = json.loads(authors_data)
+        except json.JSONDecodeError:
+            return set()
+    # If it's already a list, use directly
+    elif isinstance(authors_data, list):
+        authors = authors_data
+    else:
+        return set()
+
+    if not isinstance(authors, list):
+        authors = [authors]
+
+    author_emails = set()
+    for author in authors:
+        # If author is a string, try to parse it as JSON
+        if isinstance(author, str):
+            try:
+                author_data = json.loads(author)
+            except json.JSONDecodeError:
+                continue
+        else:
+            author_data = author
+
+        entries = author_data if isinstance(author_data, list) else [author_data]
+        for entry in entries:
+            if entry and isinstance(entry, str):
+                author_emails.add(normalize_email(entry))
+            elif entry and isinstance(entry, dict) and entry.get("email"):
+                author_emails.add(normalize_email(entry["email"]))
+
+    return author_emails
+
+
+AUTHOR_FIELDS = ("user_id", "firstname", "lastname", "email", "country", "organization")
+
+
+def _author_from_string(value):
+    # Legacy entries are a bare email address or just the author's name
+    value = value.strip()
+    if not value:
+        return []
+    if "@" in value:
+        return [{"email": value}]
+    names = value.rsplit(None, 1)
+    if len(names) == 1:
+        return [{"lastname": value}]
+    return [{"firstname": names[0], "lastname": names[1]}]
+
+
+def _flatten_authors(value):
+    # Unwraps JSON strings and nested lists down to single author entries
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return _author_from_string(value)
+        if isinstance(value, str):
+            return _author_from_string(value)
+
+    if isinstance(value, list):
+        return [author for item in value for author in _flatten_authors(item)]
+    if isinstance(value, dict):
+        return [value]
+    return []
+
+
+def normalize_authors(authors_data):
+    """
+    Turns whatever the submission form sent into the canonical authors array.
+    Returns (authors, author_emails), the emails lowercased and unique.
+    """
+    authors = []
+    author_emails = []
+    for entry in _flatten_authors(authors_data):
+        author = {field: (entry.get(field) or "") for field in AUTHOR_FIELDS}
+        author["email"] = str(author["email"]).strip()
+        authors.append(author)
+
+        email = normalize_email(author["email"])
+        if email and email not in author_emails:
+            author_emails.append(email)
+
+    return authors, author_emails
+
+
+def paper_author_emails(paper):
+    # Papers written since authors are normalized carry author_emails
+    if "author_emails" in paper:
+        return set(paper["author_emails"])
+    return extract_author_emails(paper.get("authors", []))
+
+
+def normalize_all_paper_authors():
+    """Rewrites every paper's authors into the canonical form. Returns the number of papers updated."""
+    operations = []
+    for paper in mongo.db.papers.find({}, {"authors": 1}):
+        authors, author_emails = normalize_authors(paper.get("authors", []))
+        operations.append(UpdateOne(
+            {"_id": paper["_id"]},
+            {"$set": {"authors": authors, "author_emails": author_emails}}
+        ))
+
+    # Write in chunks so large databases do not build one huge batch
+    for start in range(0, len(operations), 1000):
+        mongo.db.papers.bulk_write(operations[start:start + 1000], ordered=False)
+    return len(operations)
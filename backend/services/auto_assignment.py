@@ -0,0 +1,254 @@
+import math
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from bson import ObjectId
+from extensions import mongo
+from services.assignments import insert_track_assignments
+from services.authors import paper_author_emails
+from services.bids import MAX_PREFERENCE, track_bid_preferences
+from services.coauthors import direct_coauthors
+from services.conferences import find_track_conference
+from services.conflicts import get_track_conflicts
+from services.relevance import relevance_scores
+from services.settings_cache import setting_value
+
+# Cost of giving a paper to a reviewer, lower is better
+BID_BONUS = 10.0
+PREFERRED_KEYWORD_BONUS = 3.0
+NOT_PREFERRED_KEYWORD_PENALTY = 5.0
+# Weight of the tf-idf cosine similarity when the track matches by relevance
+RELEVANCE_WEIGHT = 10.0
+# Pairs that must never be assigned. Finite so the solver always has a solution,
+# matches at this cost are dropped afterwards
+FORBIDDEN = 1e6
+
+DEFAULT_REVIEWERS_PER_PAPER = 3
+# Extra papers each reviewer may take over the even split, leaves room around conflicts
+LOAD_SLACK = 1
+
+
+def to_positive_int(value, default):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+def normalize_keyword(keyword):
+    return str(keyword).strip().lower()
+
+
+def keyword_matrix(keyword_lists, vocabulary):
+    """One row per keyword list, one column per vocabulary keyword."""
+    matrix = np.zeros((len(keyword_lists), len(vocabulary)), dtype=np.float32)
+    for row, keywords in enumerate(keyword_lists):
+        for keyword in keywords or []:
+            column = vocabulary.get(normalize_keyword(keyword))
+            if column is not None:
+                matrix[row, column] = 1.0
+    return matrix
+
+
+def conflict_mask(track, papers, reviewers):
+    """True where a reviewer must not review a paper: affiliation conflicts, own papers and co-authors."""
+    paper_index = {str(paper["_id"]): i for i, paper in enumerate(papers)}
+    reviewer_index = {str(reviewer["_id"]): j for j, reviewer in enumerate(reviewers)}
+    mask = np.zeros((len(papers), len(reviewers)), dtype=bool)
+
+    for conflict in get_track_conflicts(track):
+        j = reviewer_index.get(conflict["member"]["id"])
+        if j is None:
+            continue
+        for conflict_paper in conflict["papers"]:
+            i = paper_index.get(conflict_paper["id"])
+            if i is not None:
+                mask[i, j] = True
+
+    papers_by_email = {}
+    for i, paper in enumerate(papers):
+        j = reviewer_index.get(str(paper.get("created_by")))
+        if j is not None:
+            mask[i, j] = True
+        for email in paper_author_emails(paper):
+            papers_by_email.setdefault(email, []).append(i)
+
+    reviewer_emails = {}
+    for j, reviewer in enumerate(reviewers):
+        email = (reviewer.get("email") or "").strip().lower()
+        if email:
+            reviewer_emails[email] = j
+
+    # One query for the co-authors of every reviewer
+    for email, coauthors in direct_coauthors(list(reviewer_emails)).items():
+        j = reviewer_emails[email]
+        for author_email in {email, *coauthors}:
+            for i in papers_by_email.get(author_email, []):
+                mask[i, j] = True
+
+    return mask
+
+
+def keyword_affinity(papers, reviewers):
+    """papers x reviewers score, up for the share of a paper's keywords a reviewer prefers and down for those they avoid."""
+    affinity = np.zeros((len(papers), len(reviewers)))
+
+    vocabulary = {}
+    for paper in papers:
+        for keyword in paper.get("keywords") or []:
+            vocabulary.setdefault(normalize_keyword(keyword), len(vocabulary))
+    if not vocabulary:
+        return affinity
+
+    paper_keywords = keyword_matrix([paper.get("keywords") for paper in papers], vocabulary)
+    preferred = keyword_matrix([reviewer.get("preferred_keywords") for reviewer in reviewers], vocabulary)
+    not_preferred = keyword_matrix([reviewer.get("not_preferred_keywords") for reviewer in reviewers], vocabulary)
+
+    keyword_counts = np.maximum(paper_keywords.sum(axis=1, keepdims=True), 1.0)
+    affinity += PREFERRED_KEYWORD_BONUS * (paper_keywords @ preferred.T) / keyword_counts
+    affinity -= NOT_PREFERRED_KEYWORD_PENALTY * (paper_keywords @ not_preferred.T) / keyword_counts
+    return affinity
+
+
+def build_cost_matrix(papers, reviewers, bid_preferences):
+    """papers x reviewers cost from bids and the reviewers' keyword preferences."""
+    paper_index = {str(paper["_id"]): i for i, paper in enumerate(papers)}
+    reviewer_index = {str(reviewer["_id"]): j for j, reviewer in enumerate(reviewers)}
+    cost = -keyword_affinity(papers, reviewers)
+
+    # Stronger bids earn a bigger share of the bonus
+    for (paper_id, user_id), preference in bid_preferences.items():
+        i = paper_index.get(paper_id)
+        j = reviewer_index.get(user_id)
+        if i is not None and j is not None:
+            cost[i, j] -= BID_BONUS * preference / MAX_PREFERENCE
+
+    return cost
+
+
+def solve_assignment(cost, need, capacity):
+    """
+    Picks need[i] reviewers for every paper i while reviewer j takes at most
+    capacity[j] papers, minimizing the total cost. Each round gives every
+    paper still short of reviewers one more through a rectangular linear
+    assignment in which a reviewer appears once per paper it may take in that
+    round. Returns the chosen (paper index, reviewer index) pairs.
+    """
+    cost = cost.copy()
+    need = need.copy()
+    capacity = capacity.copy()
+    pairs = []
+
+    while need.any() and capacity.any():
+        rows = np.flatnonzero(need > 0)
+
+        # Spread every reviewer's capacity over the rounds left, and keep the
+        # matrix close to square however large the caps are
+        rounds_left = int(need.max())
+        per_round_limit = math.ceil(len(rows) / np.count_nonzero(capacity)) + 1
+        slots = np.minimum(np.ceil(capacity / rounds_left), per_round_limit).astype(int)
+        columns = np.repeat(np.arange(len(capacity)), slots)
+
+        matched_rows, matched_columns = linear_sum_assignment(cost[np.ix_(rows, columns)])
+        papers = rows[matched_rows]
+        reviewers = columns[matched_columns]
+        allowed = cost[papers, reviewers] < FORBIDDEN
+        if not allowed.any():
+            break
+
+        for i, j in zip(papers[allowed], reviewers[allowed]):
+            pairs.append((int(i), int(j)))
+            cost[i, j] = FORBIDDEN
+            need[i] -= 1
+            capacity[j] -= 1
+
+    return pairs
+
+
+def plan_track_assignments(track, reviewers_per_paper=None, max_load=None):
+    """
+    Proposes the assignments that complete a track: every paper gets
+    reviewers_per_paper reviewers among the track members, no reviewer goes
+    over max_load papers in the track and no conflicted pair is used.
+    Existing assignments are kept and count towards both limits, so planning
+    again after a commit only fills what is still missing.
+    """
+    track_id = str(track["_id"])
+    conference = find_track_conference(track, {"reviewers_per_paper": 1, "use_bidding_or_relevance": 1})
+
+    reviewers_per_paper = to_positive_int(
+        reviewers_per_paper,
+        to_positive_int(setting_value(track, conference, "reviewers_per_paper"), DEFAULT_REVIEWERS_PER_PAPER)
+    )
+
+    paper_ids = [ObjectId(paper_id) for paper_id in track.get("papers", [])]
+    papers = list(mongo.db.papers.find(
+        {"_id": {"$in": paper_ids}},
+        {"title": 1, "keywords": 1, "authors": 1, "author_emails": 1, "created_by": 1}
+    ))
+    reviewer_ids = [ObjectId(member_id) for member_id in track.get("track_members", [])]
+    reviewers = list(mongo.db.users.find(
+        {"_id": {"$in": reviewer_ids}},
+        {"email": 1, "preferred_keywords": 1, "not_preferred_keywords": 1}
+    ))
+
+    if max_load is None and reviewers:
+        max_load = math.ceil(len(papers) * reviewers_per_paper / len(reviewers)) + LOAD_SLACK
+    max_load = to_positive_int(max_load, 0)
+
+    plan = {
+        "track_id": track_id,
+        "reviewers_per_paper": reviewers_per_paper,
+        "max_load": max_load,
+        "assignments": [],
+        "unfilled": []
+    }
+    if not papers:
+        return plan
+
+    paper_index = {str(paper["_id"]): i for i, paper in enumerate(papers)}
+    reviewer_index = {str(reviewer["_id"]): j for j, reviewer in enumerate(reviewers)}
+
+    need = np.full(len(papers), reviewers_per_paper, dtype=int)
+    capacity = np.full(len(reviewers), max_load, dtype=int)
+    cost = build_cost_matrix(papers, reviewers, track_bid_preferences(track_id))
+    if setting_value(track, conference, "use_bidding_or_relevance") == "relevance":
+        cost -= RELEVANCE_WEIGHT * relevance_scores(
+            track, [paper["_id"] for paper in papers], [reviewer["_id"] for reviewer in reviewers]
+        )
+    cost[conflict_mask(track, papers, reviewers)] = FORBIDDEN
+
+    for assignment in mongo.db.assignments.find({"track_id": track_id}, {"paper_id": 1, "reviewer_id": 1}):
+        i = paper_index.get(str(assignment["paper_id"]))
+        j = reviewer_index.get(str(assignment["reviewer_id"]))
+        if i is not None:
+            need[i] -= 1
+        if j is not None:
+            capacity[j] -= 1
+        if i is not None and j is not None:
+            cost[i, j] = FORBIDDEN
+
+    need = np.maximum(need, 0)
+    capacity = np.maximum(capacity, 0)
+    pairs = solve_assignment(cost, need, capacity) if reviewers else []
+
+    for i, j in pairs:
+        need[i] -= 1
+        plan["assignments"].append({
+            "paper_id": str(papers[i]["_id"]),
+            "reviewer_id": str(reviewers[j]["_id"]),
+            "cost": float(cost[i, j])
+        })
+
+    plan["unfilled"] = [
+        {"paper_id": str(papers[i]["_id"]), "title": papers[i].get("title", ""), "missing": int(need[i])}
+        for i in np.flatnonzero(need > 0)
+    ]
+    return plan
+
+
+def commit_track_assignments(track_id, planned):
+    """Writes planned assignments with one insert and one track update. Returns the new assignment ids."""
+    assignment_ids = insert_track_assignments(track_id, [(item["paper_id"], item["reviewer_id"]) for item in planned])
+    # Pairs assigned by someone else since the plan was made are already there
+    return [assignment_id for assignment_id in assignment_ids if assignment_id]
@@ -0,0 +1,236 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from bson import ObjectId
+from extensions import mongo
+from services.auto_assignment import conflict_mask, keyword_affinity, to_positive_int, DEFAULT_REVIEWERS_PER_PAPER
+from services.relevance import relevance_scores
+from services.settings_cache import setting_value
+from services.conferences import find_track_conference
+
+# Ranking inputs per track, least recently used tracks are dropped first
+MAX_TRACKS = 64
+# Changes made by other processes or replicas only show up once the entry is this old
+MAX_ENTRY_AGE = 300
+RELEVANCE_WEIGHT = 3.0
+# Added in full to papers without any bid, fading out once a paper has as many bids as it needs reviewers
+SCARCITY_WEIGHT = 2.0
+DEFAULT_SUGGESTIONS = 20
+
+PAPER_PROJECTION = {"title": 1, "keywords": 1, "authors": 1, "author_emails": 1, "created_by": 1}
+REVIEWER_PROJECTION = {"email": 1, "preferred_keywords": 1, "not_preferred_keywords": 1}
+
+_entries = OrderedDict()
+# Track id -> ids of submitted or updated papers, their rows are recomputed on the next read
+_pending = {}
+# Bumped by every invalidation so a build that raced with one is not stored
+_generation = 0
+_lock = threading.Lock()
+
+
+def paper_scores(track, papers, reviewers):
+    """Keyword overlap plus text relevance, -inf where the reviewer has a conflict with the paper."""
+    scores = keyword_affinity(papers, reviewers)
+    scores += RELEVANCE_WEIGHT * relevance_scores(
+        track, [paper["_id"] for paper in papers], [reviewer["_id"] for reviewer in reviewers]
+    )
+    scores[conflict_mask(track, papers, reviewers)] = -np.inf
+    return scores
+
+
+def paper_summary(paper):
+    return {"title": paper.get("title", ""), "keywords": paper.get("keywords") or []}
+
+
+def count_bids(track_id, paper_ids, only_these=False):
+    """Bids per paper of a track, in the order of paper_ids. only_these narrows the query to those papers."""
+    match = {"track_id": track_id}
+    if only_these:
+        match["paper_id"] = {"$in": paper_ids}
+    counts = {bid["_id"]: bid["count"] for bid in mongo.db.bids.aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$paper_id", "count": {"$sum": 1}}}
+    ])}
+    return np.array([counts.get(paper_id, 0) for paper_id in paper_ids], dtype=int)
+
+
+def build_track_suggestions(track):
+    started = time.monotonic()
+    paper_ids = [ObjectId(paper_id) for paper_id in track.get("papers", [])]
+    papers = list(mongo.db.papers.find({"_id": {"$in": paper_ids}}, PAPER_PROJECTION))
+    member_ids = [ObjectId(member_id) for member_id in track.get("track_members", [])]
+    reviewers = list(mongo.db.users.find({"_id": {"$in": member_ids}}, REVIEWER_PROJECTION))
+
+    conference = find_track_conference(track, {"reviewers_per_paper": 1})
+
+    paper_ids = [str(paper["_id"]) for paper in papers]
+    return {
+        "paper_ids": paper_ids,
+        "papers": [paper_summary(paper) for paper in papers],
+        "reviewer_ids": [str(reviewer["_id"]) for reviewer in reviewers],
+        "reviewers": reviewers,
+        "scores": paper_scores(track, papers, reviewers),
+        "bid_counts": count_bids(str(track["_id"]), paper_ids),
+        "target_bids": to_positive_int(
+            setting_value(track, conference, "reviewers_per_paper"), DEFAULT_REVIEWERS_PER_PAPER
+        ),
+        "built_at": started
+    }
+
+
+def get_track_suggestions(track):
+    """
+    Returns the cached ranking inputs of a track, building them when missing
+    or older than MAX_ENTRY_AGE. Entries are replaced, never changed.
+    """
+    track_id = str(track["_id"])
+    with _lock:
+        entry = _entries.get(track_id)
+        if entry and time.monotonic() - entry["built_at"] <= MAX_ENTRY_AGE:
+            _entries.move_to_end(track_id)
+        else:
+            entry = None
+            generation = _generation
+
+    if entry is None:
+        entry = build_track_suggestions(track)
+        with _lock:
+            if generation == _generation:
+                _entries[track_id] = entry
+                _entries.move_to_end(track_id)
+                while len(_entries) > MAX_TRACKS:
+                    _entries.popitem(last=False)
+    return apply_pending_papers(track_id, entry)
+
+
+def _replace_entry(track_id, entry, **changes):
+    replacement = {**entry, **changes}
+    with _lock:
+        # Drop the change if the entry was rebuilt or invalidated meanwhile
+        if _entries.get(track_id) is entry:
+            _entries[track_id] = replacement
+    return replacement
+
+
+def apply_pending_papers(track_id, entry):
+    """Recomputes the rows of the papers refresh_paper_suggestions marked, in one batch."""
+    with _lock:
+        pending = _pending.pop(track_id, None)
+    if not pending:
+        return entry
+
+    track = mongo.db.tracks.find_one({"_id": ObjectId(track_id)}, {"papers": 1, "track_members": 1})
+    papers = list(mongo.db.papers.find({"_id": {"$in": [ObjectId(paper_id) for paper_id in pending]}}, PAPER_PROJECTION))
+    if not track or not papers:
+        return entry
+    rows = paper_scores(track, papers, entry["reviewers"])
+
+    paper_rows = {paper_id: i for i, paper_id in enumerate(entry["paper_ids"])}
+    paper_ids, summaries, scores = list(entry["paper_ids"]), list(entry["papers"]), entry["scores"].copy()
+    new_ids, new_rows = [], []
+    for paper, row in zip(papers, rows):
+        paper_id = str(paper["_id"])
+        if paper_id in paper_rows:
+            scores[paper_rows[paper_id]] = row
+            summaries[paper_rows[paper_id]] = paper_summary(paper)
+        else:
+            new_ids.append(paper_id)
+            summaries.append(paper_summary(paper))
+            new_rows.append(row)
+
+    return _replace_entry(
+        track_id,
+        entry,
+        paper_ids=paper_ids + new_ids,
+        papers=summaries,
+        scores=np.vstack([scores, *new_rows]) if new_rows else scores,
+        # New papers may have been bid on before their row was added
+        bid_counts=np.append(entry["bid_counts"], count_bids(track_id, new_ids, only_these=True) if new_ids else [])
+    )
+
+
+def suggest_papers(track, user_id, limit=DEFAULT_SUGGESTIONS):
+    """
+    Ranks the papers of a track for one member, best first. Papers the
+    member has a conflict with or already bid on are left out.
+    """
+    entry = get_track_suggestions(track)
+    user_id = str(user_id)
+    if user_id not in entry["reviewer_ids"]:
+        return []
+
+    scores = entry["scores"][:, entry["reviewer_ids"].index(user_id)].copy()
+    shortfall = np.maximum(entry["target_bids"] - entry["bid_counts"], 0) / entry["target_bids"]
+    scores += SCARCITY_WEIGHT * shortfall
+
+    paper_rows = {paper_id: i for i, paper_id in enumerate(entry["paper_ids"])}
+    for bid in mongo.db.bids.find({"track_id": str(track["_id"]), "user_id": user_id}, {"paper_id": 1}):
+        i = paper_rows.get(bid["paper_id"])
+        if i is not None:
+            scores[i] = -np.inf
+
+    candidates = np.flatnonzero(np.isfinite(scores))
+    top = candidates[np.argsort(-scores[candidates], kind="stable")[:limit]]
+    return [
+        {
+            "paper_id": entry["paper_ids"][i],
+            **entry["papers"][i],
+            "score": round(float(scores[i]), 4),
+            "bid_count": int(entry["bid_counts"][i])
+        }
+        for i in top
+    ]
+
+
+def record_bid_change(track_id, paper_id, delta):
+    """
+    Call with +1 when a bid is created and -1 when one is withdrawn. A paper
+    the cached entry does not have yet is marked like a submitted paper, its
+    bids are counted when its row is added.
+    """
+    track_id = str(track_id)
+    with _lock:
+        entry = _entries.get(track_id)
+        if entry and str(paper_id) not in entry["paper_ids"]:
+            _pending.setdefault(track_id, set()).add(str(paper_id))
+            return
+    if not entry:
+        return
+
+    bid_counts = entry["bid_counts"].copy()
+    i = entry["paper_ids"].index(str(paper_id))
+    bid_counts[i] = max(0, bid_counts[i] + delta)
+    _replace_entry(track_id, entry, bid_counts=bid_counts)
+
+
+def refresh_paper_suggestions(track_id, paper_id):
+    """
+    Call after a paper is submitted or updated. Only the paper's row is
+    recomputed, on the next read of the track, so the request that changed
+    the paper does not wait for the track conflicts to be rebuilt.
+    """
+    track_id = str(track_id)
+    with _lock:
+        if track_id in _entries:
+            _pending.setdefault(track_id, set()).add(str(paper_id))
+
+
+def invalidate_track_suggestions(track_id):
+    """Call when the members of a track change."""
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.pop(str(track_id), None)
+        _pending.pop(str(track_id), None)
+
+
+def invalidate_reviewer_suggestions(reviewer_id):
+    """Call when a reviewer's keywords, affiliation or email change."""
+    global _generation
+    reviewer_id = str(reviewer_id)
+    with _lock:
+        _generation += 1
+        for track_id in [track_id for track_id, entry in _entries.items() if reviewer_id in entry["reviewer_ids"]]:
+            del _entries[track_id]
+            _pending.pop(track_id, None)
@@ -0,0 +1,114 @@
+import base64
+from datetime import datetime
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateOne
+from extensions import mongo
+
+# One bids document per (paper_id, user_id), preference goes from 1 (weak) to MAX_PREFERENCE
+MAX_PREFERENCE = 5
+DEFAULT_PREFERENCE = 3
+
+
+def parse_preference(value):
+    """None when no level was sent, otherwise an int clamped to 0..MAX_PREFERENCE where 0 withdraws the bid."""
+    if value is None:
+        return None
+    try:
+        return max(0, min(int(value), MAX_PREFERENCE))
+    except (TypeError, ValueError):
+        return None
+
+
+def place_bid(paper, user_id, preference=DEFAULT_PREFERENCE):
+    """Creates or updates a bid in one atomic upsert."""
+    paper_id = str(paper["_id"])
+    now = datetime.utcnow()
+    mongo.db.bids.update_one(
+        {"paper_id": paper_id, "user_id": str(user_id)},
+        {
+            "$set": {"preference": preference, "track_id": str(paper.get("track")), "updated_at": now},
+            "$setOnInsert": {"created_at": now}
+        },
+        upsert=True
+    )
+    # papers.biddings mirrors the bidders for older readers
+    mongo.db.papers.update_one({"_id": ObjectId(paper_id)}, {"$addToSet": {"biddings": str(user_id)}})
+
+
+def withdraw_bid(paper_id, user_id):
+    """Deletes a bid. Returns True if there was one."""
+    result = mongo.db.bids.delete_one({"paper_id": str(paper_id), "user_id": str(user_id)})
+    mongo.db.papers.update_one({"_id": ObjectId(paper_id)}, {"$pull": {"biddings": str(user_id)}})
+    return result.deleted_count > 0
+
+
+def has_bid(paper_id, user_id):
+    return mongo.db.bids.count_documents({"paper_id": str(paper_id), "user_id": str(user_id)}, limit=1) > 0
+
+
+def paper_bidders(paper_id):
+    return [bid["user_id"] for bid in mongo.db.bids.find({"paper_id": str(paper_id)}, {"user_id": 1})]
+
+
+def track_bid_preferences(track_id):
+    """{(paper_id, user_id): preference} for every bid of a track, one query."""
+    return {
+        (bid["paper_id"], bid["user_id"]): bid.get("preference", DEFAULT_PREFERENCE)
+        for bid in mongo.db.bids.find({"track_id": str(track_id)}, {"paper_id": 1, "user_id": 1, "preference": 1})
+    }
+
+
+def pack_bid_matrix(track, preferences):
+    """
+    Lays the bids of a track out as a papers x users uint8 matrix, 0 where
+    there is no bid. Papers follow the track's order and users are the track
+    members followed by anyone else who bid. Returns the axes and the matrix
+    as row-major base64.
+    """
+    paper_ids = [str(paper_id) for paper_id in track.get("papers", [])]
+    user_ids = list(dict.fromkeys([str(member_id) for member_id in track.get("track_members", [])]))
+    paper_rows = {paper_id: i for i, paper_id in enumerate(paper_ids)}
+    user_columns = {user_id: j for j, user_id in enumerate(user_ids)}
+
+    for _, user_id in preferences:
+        if user_id not in user_columns:
+            user_columns[user_id] = len(user_ids)
+            user_ids.append(user_id)
+
+    matrix = np.zeros((len(paper_ids), len(user_ids)), dtype=np.uint8)
+    for (paper_id, user_id), preference in preferences.items():
+        i = paper_rows.get(paper_id)
+        if i is not None:
+            matrix[i, user_columns[user_id]] = preference
+
+    return {
+        "paper_ids": paper_ids,
+        "user_ids": user_ids,
+        "shape": list(matrix.shape),
+        "dtype": "uint8",
+        "max_preference": MAX_PREFERENCE,
+        "matrix": base64.b64encode(matrix.tobytes()).decode("ascii")
+    }
+
+
+def backfill_bids():
+    """Creates bids at the default preference from the papers' biddings arrays. Returns the number of bids upserted."""
+    now = datetime.utcnow()
+    operations = []
+    for paper in mongo.db.papers.find({"biddings.0": {"$exists": True}}, {"biddings": 1, "track": 1}):
+        for user_id in paper["biddings"]:
+            operations.append(UpdateOne(
+                {"paper_id": str(paper["_id"]), "user_id": str(user_id)},
+                {"$setOnInsert": {
+                    "preference": DEFAULT_PREFERENCE,
+                    "track_id": str(paper.get("track")),
+                    "created_at": now,
+                    "updated_at": now
+                }},
+                upsert=True
+            ))
+
+    if operations:
+        mongo.db.bids.bulk_write(operations, ordered=False)
+    return len(operations)
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+from itertools import permutations
+from bson import ObjectId
+from pymongo import UpdateOne
+from extensions import mongo
+from services.authors import paper_author_emails
+
+# Co-authorship graph: one coauthor_edges document per ordered (email, coauthor)
+# pair, holding the ids of the papers the two wrote together
+MAX_DEPTH = 2
+CACHE_SIZE = 4096
+CACHE_TTL_SECONDS = 300
+
+_adjacency = OrderedDict()
+_lock = threading.Lock()
+
+
+def _forget(emails):
+    with _lock:
+        for email in emails:
+            _adjacency.pop(email, None)
+
+
+def add_paper_to_graph(paper_id, author_emails):
+    """Links every pair of authors of a paper. Safe to call again for the same paper."""
+    emails = sorted(set(author_emails))
+    operations = [
+        UpdateOne(
+            {"email": email, "coauthor": coauthor},
+            {"$addToSet": {"paper_ids": str(paper_id)}},
+            upsert=True
+        )
+        for email, coauthor in permutations(emails, 2)
+    ]
+    if operations:
+        mongo.db.coauthor_edges.bulk_write(operations, ordered=False)
+    _forget(emails)
+
+
+def remove_paper_from_graph(paper_id):
+    """Drops the links a paper created, edges without any remaining paper disappear."""
+    paper_id = str(paper_id)
+    emails = mongo.db.coauthor_edges.distinct("email", {"paper_ids": paper_id})
+    if not emails:
+        return
+
+    mongo.db.coauthor_edges.update_many({"paper_ids": paper_id}, {"$pull": {"paper_ids": paper_id}})
+    mongo.db.coauthor_edges.delete_many({"paper_ids": {"$size": 0}})
+    _forget(emails)
+
+
+def direct_coauthors(emails):
+    """Returns {email: set of co-author emails}, answering from the adjacency cache where possible."""
+    now = time.monotonic()
+    result = {}
+    missing = []
+
+    with _lock:
+        for email in emails:
+            entry = _adjacency.get(email)
+            if entry and now - entry[0] < CACHE_TTL_SECONDS:
+                _adjacency.move_to_end(email)
+                result[email] = entry[1]
+            else:
+                missing.append(email)
+
+    if missing:
+        loaded = {email: set() for email in missing}
+        for edge in mongo.db.coauthor_edges.find({"email": {"$in": missing}}, {"email": 1, "coauthor": 1}):
+            loaded[edge["email"]].add(edge["coauthor"])
+
+        with _lock:
+            for email, coauthors in loaded.items():
+                _adjacency[email] = (now, frozenset(coauthors))
+                _adjacency.move_to_end(email)
+            while len(_adjacency) > CACHE_SIZE:
+                _adjacency.popitem(last=False)
+        result.update(loaded)
+
+    return result
+
+
+def coauthor_neighbors(email, depth=1):
+    """Every author reachable from email within depth co-authorship hops, one query per hop at most."""
+    depth = max(1, min(depth, MAX_DEPTH))
+    email = email.strip().lower()
+
+    seen = {email}
+    frontier = {email}
+    for _ in range(depth):
+        adjacency = direct_coauthors(frontier)
+        frontier = set().union(*adjacency.values()) - seen
+        if not frontier:
+            break
+        seen |= frontier
+
+    seen.discard(email)
+    return seen
+
+
+def has_coauthor_conflict(reviewer_email, author_emails, depth=1):
+    """True when the reviewer wrote this paper or co-authored with one of its authors."""
+    if not reviewer_email:
+        return False
+
+    reviewer_email = reviewer_email.strip().lower()
+    if reviewer_email in author_emails:
+        return True
+
+    neighbors = coauthor_neighbors(reviewer_email, depth)
+    return any(email in neighbors for email in author_emails)
+
+
+def reviewer_paper_conflict(reviewer_id, paper_id, depth=1):
+    reviewer = mongo.db.users.find_one({"_id": ObjectId(reviewer_id)}, {"email": 1})
+    paper = mongo.db.papers.find_one({"_id": ObjectId(paper_id)}, {"authors": 1, "author_emails": 1})
+    if not reviewer or not paper:
+        return False
+    return has_coauthor_conflict(reviewer.get("email"), paper_author_emails(paper), depth)
+
+
+def rebuild_coauthor_graph():
+    """Rebuilds coauthor_edges from the papers of every conference. Returns the number of papers read."""
+    mongo.db.coauthor_edges.delete_many({})
+    count = 0
+    for paper in mongo.db.papers.find({}, {"authors": 1, "author_emails": 1}):
+        add_paper_to_graph(paper["_id"], paper_author_emails(paper))
+        count += 1
+    with _lock:
+        _adjacency.clear()
+    return count
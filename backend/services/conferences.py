@@ -0,0 +1,18 @@
+from bson import ObjectId
+from extensions import mongo
+
+
+def conference_query(conference_id):
+    """Matches a conference by its conference_id or its _id, tracks may refer to it by either."""
+    conference_id = str(conference_id)
+    query = {"conference_id": conference_id}
+    if ObjectId.is_valid(conference_id):
+        query = {"$or": [query, {"_id": ObjectId(conference_id)}]}
+    return query
+
+
+def find_track_conference(track, projection=None):
+    """The conference of a track, None if it has none or it no longer exists."""
+    if not track.get("conference_id"):
+        return None
+    return mongo.db.conferences.find_one(conference_query(track["conference_id"]), projection)
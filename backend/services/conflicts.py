@@ -0,0 +1,143 @@
+import re
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument
+from extensions import mongo
+from services.authors import paper_author_emails
+
+PERSON_PROJECTION = {"name": 1, "email": 1, "affiliation": 1}
+
+
+def affiliation_tokens(affiliation):
+    return frozenset(re.findall(r"\w+", (affiliation or "").lower()))
+
+
+def build_affiliation_index(people):
+    # normalized affiliation token -> ids of the people whose affiliation has it
+    index = {}
+    for person_id, tokens in people.items():
+        for token in tokens:
+            index.setdefault(token, set()).add(person_id)
+    return index
+
+
+def build_email_paper_index(papers):
+    # author email -> papers of the track listing that email, built once per track
+    index = {}
+    for paper in papers:
+        for email in paper_author_emails(paper):
+            index.setdefault(email, []).append({
+                "id": str(paper["_id"]),
+                "title": paper.get("title", "Untitled Paper")
+            })
+    return index
+
+
+def person_summary(person):
+    return {
+        "id": str(person["_id"]),
+        "name": person.get("name", ""),
+        "email": person.get("email", ""),
+        "affiliation": person.get("affiliation", "")
+    }
+
+
+def compute_track_conflicts(track):
+    """
+    Pairs every track member with the authors of the track's papers whose
+    affiliation is the same or contains the other one word for word.
+    Returns the conflicts, the ids of the users they were computed from and
+    the author emails of the track.
+    """
+    member_ids = [ObjectId(member_id) for member_id in track.get("track_members", [])]
+    members = list(mongo.db.users.find({"_id": {"$in": member_ids}}, PERSON_PROJECTION))
+
+    paper_ids = [ObjectId(paper_id) for paper_id in track.get("papers", [])]
+    papers = mongo.db.papers.find({"_id": {"$in": paper_ids}}, {"title": 1, "authors": 1, "author_emails": 1})
+    papers_by_email = build_email_paper_index(papers)
+    authors = {
+        str(author["_id"]): author
+        for author in mongo.db.users.find({"email": {"$in": list(papers_by_email)}}, PERSON_PROJECTION)
+    }
+
+    author_tokens = {author_id: affiliation_tokens(author.get("affiliation")) for author_id, author in authors.items()}
+    author_index = build_affiliation_index({author_id: tokens for author_id, tokens in author_tokens.items() if tokens})
+
+    conflicts = []
+    for member in members:
+        tokens = affiliation_tokens(member.get("affiliation"))
+        if not tokens:
+            continue
+
+        # Only authors sharing at least one affiliation token can conflict
+        candidates = set().union(*(author_index.get(token, set()) for token in tokens))
+        for author_id in sorted(candidates):
+            # Skip if member and author are the same person
+            if author_id == str(member["_id"]):
+                continue
+            if not (tokens <= author_tokens[author_id] or author_tokens[author_id] <= tokens):
+                continue
+
+            author = authors[author_id]
+            author_papers = papers_by_email.get((author.get("email") or "").strip().lower(), [])
+            conflicts.append({
+                "member": person_summary(member),
+                "author": person_summary(author),
+                "reason": f"Affiliation conflict with {len(author_papers)} paper(s)",
+                "papers": author_papers
+            })
+
+    user_ids = [str(member["_id"]) for member in members] + list(authors)
+    return conflicts, user_ids, list(papers_by_email)
+
+
+def get_track_conflicts(track):
+    """Returns the cached conflicts of a track, computing and storing them when they are stale."""
+    track_id = str(track["_id"])
+    cached = mongo.db.track_conflicts.find_one({"track_id": track_id})
+    if cached and "conflicts" in cached:
+        return cached["conflicts"]
+
+    if not cached:
+        cached = mongo.db.track_conflicts.find_one_and_update(
+            {"track_id": track_id},
+            {"$setOnInsert": {"version": 0}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    conflicts, user_ids, author_emails = compute_track_conflicts(track)
+
+    # Only store the result if nothing invalidated the track while computing it
+    mongo.db.track_conflicts.update_one(
+        {"track_id": track_id, "version": cached["version"]},
+        {"$set": {
+            "conflicts": conflicts,
+            "user_ids": user_ids,
+            "author_emails": author_emails,
+            "computed_at": datetime.utcnow()
+        }}
+    )
+    return conflicts
+
+
+def invalidate_track_conflicts(track_id):
+    """Call when the papers or members of a track change."""
+    mongo.db.track_conflicts.update_one(
+        {"track_id": str(track_id)},
+        {"$inc": {"version": 1}, "$unset": {"conflicts": ""}},
+        upsert=True
+    )
+
+
+def invalidate_user_conflicts(user_id, emails=()):
+    """
+    Call when a user's affiliation or email changes. emails are the user's old
+    and new addresses, so tracks where the user only now matches an author are
+    refreshed too.
+    """
+    emails = [email.strip().lower() for email in emails if email]
+    mongo.db.track_conflicts.update_many(
+        {"$or": [{"user_ids": str(user_id)}, {"author_emails": {"$in": emails}}]},
+        {"$inc": {"version": 1}, "$unset": {"conflicts": ""}}
+    )
@@ -0,0 +1,69 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import g
+from extensions import mongo
+
+
+class DataLoader:
+    """
+    Batches find-by-_id lookups on one collection. Ids passed to prime() are
+    collected and fetched together with a single $in query the next time
+    anything is loaded; every document is memoized for the rest of the request.
+    Documents are shared between callers, copy them before changing them.
+    """
+
+    def __init__(self, collection, projection=None):
+        self.collection = collection
+        self.projection = projection
+        self.cache = {}
+        self.pending = set()
+
+    @staticmethod
+    def _key(document_id):
+        try:
+            return str(ObjectId(document_id))
+        except (InvalidId, TypeError):
+            return None
+
+    def prime(self, document_ids):
+        for document_id in document_ids:
+            key = self._key(document_id)
+            if key and key not in self.cache:
+                self.pending.add(key)
+
+    def dispatch(self):
+        if not self.pending:
+            return
+
+        keys = list(self.pending)
+        self.pending.clear()
+        for key in keys:
+            self.cache[key] = None
+
+        query = {"_id": {"$in": [ObjectId(key) for key in keys]}}
+        for document in self.collection.find(query, self.projection):
+            self.cache[str(document["_id"])] = document
+
+    def load_many(self, document_ids):
+        """Returns the documents in the same order as the ids, None where missing or invalid."""
+        document_ids = list(document_ids)
+        self.prime(document_ids)
+        self.dispatch()
+        return [self.cache.get(self._key(document_id)) for document_id in document_ids]
+
+    def load(self, document_id):
+        return self.load_many([document_id])[0]
+
+
+def get_loader(collection_name, projection=None):
+    """
+    Returns the request-scoped loader of a collection, stored on flask.g.
+    Each projection gets its own loader, so a slim document is never handed
+    to a caller that asked for the whole one.
+    """
+    if "dataloaders" not in g:
+        g.dataloaders = {}
+    key = (collection_name, tuple(sorted(projection.items())) if projection else None)
+    if key not in g.dataloaders:
+        g.dataloaders[key] = DataLoader(mongo.db[collection_name], projection)
+    return g.dataloaders[key]
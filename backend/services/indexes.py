@@ -0,0 +1,67 @@
+from pymongo import ASCENDING, DESCENDING
+from extensions import mongo
+from services.assignments import duplicate_assignment_groups
+
+ASSIGNMENT_INDEX = "track_id_1_paper_id_1_reviewer_id_1"
+
+
+def ensure_indexes():
+    """Creates the indexes the routes rely on. Safe to call on every start."""
+    mongo.db.reviewer_stats.create_index([("reviewer_id", ASCENDING)], unique=True)
+    mongo.db.track_memberships.create_index(
+        [("track_id", ASCENDING), ("user_id", ASCENDING), ("position", ASCENDING)], unique=True
+    )
+    mongo.db.track_memberships.create_index([("user_id", ASCENDING)])
+    mongo.db.track_conflicts.create_index([("track_id", ASCENDING)], unique=True)
+    mongo.db.track_conflicts.create_index([("user_ids", ASCENDING)])
+    mongo.db.track_conflicts.create_index([("author_emails", ASCENDING)])
+    mongo.db.coauthor_edges.create_index([("email", ASCENDING), ("coauthor", ASCENDING)], unique=True)
+    mongo.db.coauthor_edges.create_index([("paper_ids", ASCENDING)])
+    mongo.db.papers.create_index([("author_emails", ASCENDING)])
+    mongo.db.papers.create_index([("file_sha256", ASCENDING)])
+    ensure_assignment_index()
+    mongo.db.bids.create_index([("paper_id", ASCENDING), ("user_id", ASCENDING)], unique=True)
+    mongo.db.bids.create_index([("track_id", ASCENDING)])
+    mongo.db.bids.create_index([("user_id", ASCENDING)])
+    # Dashboard sections, newest first per user
+    mongo.db.assignments.create_index([("reviewer_id", ASCENDING), ("created_at", DESCENDING)])
+    mongo.db.notifications.create_index([("to_whom", ASCENDING), ("created_at", DESCENDING)])
+    mongo.db.papers.create_index([("created_by", ASCENDING), ("created_at", DESCENDING)])
+    # PDF processing queue, see services/pdf_processing.py
+    mongo.db.pdf_jobs.create_index([("paper_id", ASCENDING)], unique=True)
+    mongo.db.pdf_jobs.create_index([("status", ASCENDING), ("available_at", ASCENDING)])
+    mongo.db.pdf_derived.create_index([("sha256", ASCENDING)], unique=True)
+    # Paper listings sorted by submission_date or avg_acceptance, per track, per author or overall
+    for sort_field in ("submission_date", "avg_acceptance"):
+        mongo.db.papers.create_index([("track", ASCENDING), (sort_field, ASCENDING), ("_id", ASCENDING)])
+        mongo.db.papers.create_index([("created_by", ASCENDING), (sort_field, ASCENDING), ("_id", ASCENDING)])
+        mongo.db.papers.create_index([(sort_field, ASCENDING), ("_id", ASCENDING)])
+    mongo.db.papers.create_index([("track", ASCENDING), ("_id", ASCENDING)])
+    mongo.db.papers.create_index([("created_by", ASCENDING), ("_id", ASCENDING)])
+
+
+def ensure_assignment_index():
+    """
+    Makes the assignments index unique, so concurrent requests cannot assign a
+    reviewer to the same paper twice. Existing duplicates are never deleted
+    here: the index is skipped with an error until `flask
+    remove-duplicate-assignments` has been run. Returns whether it is unique.
+    """
+    assignment_index = mongo.db.assignments.index_information().get(ASSIGNMENT_INDEX)
+    if assignment_index and assignment_index.get("unique"):
+        return True
+    if next(iter(duplicate_assignment_groups()), None):
+        print(f"🚨 ERROR: duplicate assignments found, {ASSIGNMENT_INDEX} is not unique yet. "
+              "Run `flask remove-duplicate-assignments` to resolve them.")
+        if not assignment_index:
+            mongo.db.assignments.create_index(
+                [("track_id", ASCENDING), ("paper_id", ASCENDING), ("reviewer_id", ASCENDING)], name=ASSIGNMENT_INDEX
+            )
+        return False
+    if assignment_index:
+        mongo.db.assignments.drop_index(ASSIGNMENT_INDEX)
+    mongo.db.assignments.create_index(
+        [("track_id", ASCENDING), ("paper_id", ASCENDING), ("reviewer_id", ASCENDING)],
+        unique=True, name=ASSIGNMENT_INDEX
+    )
+    return True
@@ -0,0 +1,129 @@
+import base64
+from datetime import datetime
+from bson import ObjectId, json_util
+from bson.errors import InvalidId
+
+MAX_PAGE_SIZE = 200
+
+
+def parse_fields(args, required=()):
+    """Reads ?fields=a,b,c and returns the requested field names, or None for all fields."""
+    raw = args.get("fields")
+    if not raw:
+        return None
+
+    fields = [field.strip() for field in raw.split(",") if field.strip()]
+    # keep the order stable and the required keys first
+    return list(dict.fromkeys([*required, *fields]))
+
+
+def parse_sort(args, allowed):
+    """
+    Reads ?sort=field or ?sort=-field for descending. Returns (field, direction),
+    or None when no sort was asked for. Raises ValueError for a field not in allowed.
+    """
+    raw = args.get("sort")
+    if not raw:
+        return None
+
+    field = raw.lstrip("-")
+    if field not in allowed:
+        raise ValueError(f"sort must be one of {', '.join(allowed)}")
+    return field, -1 if raw.startswith("-") else 1
+
+
+def encode_cursor(value, document_id):
+    return base64.urlsafe_b64encode(json_util.dumps([value, document_id]).encode()).decode("ascii")
+
+
+def decode_cursor(raw):
+    try:
+        value, document_id = json_util.loads(base64.urlsafe_b64decode(raw.encode("ascii")))
+    except Exception:
+        raise InvalidId(f"{raw!r} is not a valid cursor")
+    if not isinstance(document_id, ObjectId) or not isinstance(value, (int, float, str, datetime, type(None))):
+        raise InvalidId(f"{raw!r} is not a valid cursor")
+    return value, document_id
+
+
+def parse_page(args, sort=None):
+    """
+    Reads ?limit= and ?cursor= from the query string. Raises bson InvalidId for a bad cursor.
+    The cursor is an _id, or a (sort value, _id) pair when the page is sorted on another field.
+    """
+    limit = args.get("limit", type=int)
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    cursor = args.get("cursor")
+    if not cursor:
+        cursor = None
+    elif sort is None:
+        cursor = ObjectId(cursor)
+    else:
+        cursor = decode_cursor(cursor)
+
+    return limit, cursor
+
+
+def after_cursor(field, direction, value, document_id):
+    """
+    The documents that come after (value, document_id) in a (field, _id) sort.
+    Missing values sort as null, which MongoDB puts first ascending and last
+    descending, and range operators never match them.
+    """
+    if direction == 1:
+        if value is None:
+            return {"$or": [{field: None, "_id": {"$gt": document_id}}, {field: {"$ne": None}}]}
+        return {"$or": [{field: {"$gt": value}}, {field: value, "_id": {"$gt": document_id}}]}
+
+    if value is None:
+        return {field: None, "_id": {"$lt": document_id}}
+    return {"$or": [{field: {"$lt": value}}, {field: value, "_id": {"$lt": document_id}}, {field: None}]}
+
+
+def find_page(collection, query, projection=None, limit=None, cursor=None, sort=None):
+    """
+    Keyset pagination on _id, or on (field, _id) when sort is a (field, direction)
+    pair from parse_sort. Returns (documents, next_cursor); without a limit
+    everything is returned.
+    """
+    if sort is None:
+        if cursor is not None:
+            query = {"$and": [query, {"_id": {"$gt": cursor}}]}
+        order = [("_id", 1)]
+    else:
+        field, direction = sort
+        if cursor is not None:
+            query = {"$and": [query, after_cursor(field, direction, *cursor)]}
+        order = [(field, direction), ("_id", direction)]
+        if projection:
+            # the sort value goes into the next cursor
+            projection = {**projection, field: 1}
+
+    documents = collection.find(query, projection).sort(order)
+    if limit is None:
+        return list(documents), None
+
+    # fetch one extra document to know whether another page exists
+    documents = list(documents.limit(limit + 1))
+    if len(documents) <= limit:
+        return documents, None
+
+    last = documents[limit - 1]
+    if sort is None:
+        return documents[:limit], str(last["_id"])
+    return documents[:limit], encode_cursor(last.get(sort[0]), last["_id"])
+
+
+def json_ready(value):
+    """Turns ObjectIds into strings and datetimes into ISO strings, in nested dicts and lists too."""
+    if isinstance(value, dict):
+        return {key: json_ready(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [json_ready(item) for item in value]
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
@@ -0,0 +1,143 @@
+import csv
+import io
+import zipfile
+from datetime import datetime
+from bson import ObjectId
+from werkzeug.utils import secure_filename
+from extensions import mongo
+from services.authors import normalize_authors
+from services.paper_search import decision_label
+from services.storage import CHUNK_SIZE, open_paper_file
+
+# Archives are written straight into the response: zipfile falls back to data
+# descriptors on an unseekable output, so only the entry currently being
+# written and the central directory records are held in memory.
+CURSOR_BATCH_SIZE = 100
+MAX_TITLE_LENGTH = 80
+MANIFEST_NAME = "manifest.csv"
+MANIFEST_FIELDS = ["paper_id", "track", "title", "authors", "decision", "submission_date", "file", "file_sha256"]
+EXPORT_PROJECTION = {
+    "title": 1, "authors": 1, "decision": 1, "submission_date": 1, "update_date": 1, "paper_path": 1,
+    "file_sha256": 1, "storage_backend": 1, "storage_key": 1
+}
+DECISION_QUERIES = {
+    "accepted": {"decision": True},
+    "rejected": {"decision": False},
+    "pending": {"decision": {"$nin": [True, False]}}
+}
+
+
+class StreamSink(io.RawIOBase):
+    """Write-only file that keeps what zipfile wrote until the generator hands it on."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def track_folder(track):
+    return secure_filename(track.get("track_name") or "") or str(track["_id"])
+
+
+def entry_name(track, paper):
+    title = secure_filename(paper.get("title") or "")[:MAX_TITLE_LENGTH] or "paper"
+    return f"{track_folder(track)}/{paper['_id']}-{title}.pdf"
+
+
+def format_authors(authors):
+    names = []
+    for author in normalize_authors(authors)[0]:
+        name = f"{author['firstname']} {author['lastname']}".strip()
+        if author["email"]:
+            name = f"{name} <{author['email']}>" if name else author["email"]
+        if name:
+            names.append(name)
+    return "; ".join(names)
+
+
+def iterate_papers(tracks, decision=None):
+    """Yields (track, paper) through one cursor per track, ordered by paper id."""
+    for track in tracks:
+        paper_ids = [ObjectId(paper_id) for paper_id in track.get("papers") or [] if ObjectId.is_valid(str(paper_id))]
+        if not paper_ids:
+            continue
+        cursor = mongo.db.papers.find(
+            {"_id": {"$in": paper_ids}, **DECISION_QUERIES.get(decision, {})}, EXPORT_PROJECTION
+        ).sort("_id", 1).batch_size(CURSOR_BATCH_SIZE)
+        for paper in cursor:
+            yield track, paper
+
+
+def zip_date(value):
+    # ZIP timestamps cannot go before 1980
+    return value.timetuple()[:6] if isinstance(value, datetime) and value.year >= 1980 else (1980, 1, 1, 0, 0, 0)
+
+
+def stream_papers_zip(tracks, decision=None):
+    """
+    Generates a ZIP of the PDFs of the given tracks, one folder per track,
+    with manifest.csv first. Papers whose file cannot be found are listed in
+    missing.txt at the end instead of failing the whole download.
+    """
+    sink = StreamSink()
+    missing = []
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        # The manifest comes from its own pass over the cursors, so no row is kept around
+        manifest = zipfile.ZipInfo(MANIFEST_NAME, zip_date(datetime.utcnow()))
+        manifest.compress_type = zipfile.ZIP_DEFLATED
+        with archive.open(manifest, "w") as entry:
+            text = io.TextIOWrapper(entry, encoding="utf-8-sig", newline="")
+            writer = csv.DictWriter(text, fieldnames=MANIFEST_FIELDS)
+            writer.writeheader()
+            for track, paper in iterate_papers(tracks, decision):
+                submitted = paper.get("submission_date")
+                writer.writerow({
+                    "paper_id": str(paper["_id"]),
+                    "track": track.get("track_name") or str(track["_id"]),
+                    "title": paper.get("title") or "",
+                    "authors": format_authors(paper.get("authors")),
+                    "decision": decision_label(paper.get("decision")),
+                    "submission_date": submitted.isoformat() if isinstance(submitted, datetime) else "",
+                    "file": entry_name(track, paper) if paper.get("paper_path") else "",
+                    "file_sha256": paper.get("file_sha256") or ""
+                })
+                if sink.chunks:
+                    yield sink.drain()
+            text.flush()
+            text.detach()
+        yield sink.drain()
+
+        for track, paper in iterate_papers(tracks, decision):
+            if not paper.get("paper_path"):
+                continue
+            name = entry_name(track, paper)
+            try:
+                source = open_paper_file(paper)
+            except FileNotFoundError:
+                missing.append(name)
+                continue
+
+            # PDFs are compressed already, they are stored as they are
+            info = zipfile.ZipInfo(name, zip_date(paper.get("update_date") or paper.get("submission_date")))
+            with source, archive.open(info, "w", force_zip64=True) as entry:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                    entry.write(chunk)
+                    yield sink.drain()
+            # The data descriptor is written when the entry closes
+            yield sink.drain()
+
+        if missing:
+            archive.writestr("missing.txt", "\n".join(missing) + "\n")
+    yield sink.drain()
@@ -0,0 +1,86 @@
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from extensions import mongo
+
+
+def review_score(review):
+    """Returns what a review adds to its paper's (score_weighted_sum, confidence_sum)."""
+    try:
+        evaluation = float(review.get("evaluation") or 0)
+    except (TypeError, ValueError):
+        evaluation = 0.0
+    try:
+        confidence = float(review.get("confidence") or 1)
+    except (TypeError, ValueError):
+        confidence = 1.0
+    return evaluation * confidence, confidence
+
+
+def average_acceptance(score_weighted_sum, confidence_sum):
+    return score_weighted_sum / confidence_sum if confidence_sum else 0.0
+
+
+def apply_score_delta(paper_id, weighted_delta, confidence_delta):
+    if not weighted_delta and not confidence_delta:
+        return
+
+    paper = mongo.db.papers.find_one_and_update(
+        {"_id": ObjectId(paper_id)},
+        {"$inc": {"score_weighted_sum": weighted_delta, "confidence_sum": confidence_delta}},
+        projection={"score_weighted_sum": 1, "confidence_sum": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not paper:
+        return
+
+    # Only write the average if no other update moved the sums since ours,
+    # otherwise that later update writes it from newer sums
+    mongo.db.papers.update_one(
+        {
+            "_id": paper["_id"],
+            "score_weighted_sum": paper["score_weighted_sum"],
+            "confidence_sum": paper["confidence_sum"]
+        },
+        {"$set": {"avg_acceptance": average_acceptance(paper["score_weighted_sum"], paper["confidence_sum"])}}
+    )
+
+
+def record_review_score(review):
+    apply_score_delta(review["paper_id"], *review_score(review))
+
+
+def record_review_score_change(old_review, new_review):
+    old_weighted, old_confidence = review_score(old_review)
+    new_weighted, new_confidence = review_score(new_review)
+    apply_score_delta(old_review["paper_id"], new_weighted - old_weighted, new_confidence - old_confidence)
+
+
+def rebuild_paper_scores():
+    """Recomputes the score sums and avg_acceptance of every paper from its reviews. Returns the number of papers written."""
+    sums = {}
+    for review in mongo.db.reviews.find({}, {"paper_id": 1, "evaluation": 1, "confidence": 1}):
+        if not ObjectId.is_valid(str(review.get("paper_id"))):
+            continue
+        weighted, confidence = review_score(review)
+        paper_sums = sums.setdefault(str(review["paper_id"]), [0.0, 0.0])
+        paper_sums[0] += weighted
+        paper_sums[1] += confidence
+
+    mongo.db.papers.update_many(
+        {"_id": {"$nin": [ObjectId(paper_id) for paper_id in sums]}},
+        {"$set": {"score_weighted_sum": 0.0, "confidence_sum": 0.0, "avg_acceptance": 0.0}}
+    )
+    operations = [
+        UpdateOne(
+            {"_id": ObjectId(paper_id)},
+            {"$set": {
+                "score_weighted_sum": weighted,
+                "confidence_sum": confidence,
+                "avg_acceptance": average_acceptance(weighted, confidence)
+            }}
+        )
+        for paper_id, (weighted, confidence) in sums.items()
+    ]
+    if operations:
+        mongo.db.papers.bulk_write(operations, ordered=False)
+    return len(operations)
@@ -0,0 +1,324 @@
+import threading
+import time
+from collections import Counter
+import numpy as np
+from scipy import sparse
+from bson import ObjectId
+from extensions import mongo
+from services.relevance import tokenize, keyword_terms
+
+# One in-process BM25 index over all papers, rebuilt in the background once it
+# is older than MAX_INDEX_AGE (changes made by other processes or replicas
+# only show up then). New or edited paper texts mark it stale, which rebuilds
+# it at most once every REBUILD_DELAY seconds, so a burst of submissions costs
+# one rebuild. Decisions and reviews only patch the paper's facet values.
+# Searches never wait for a rebuild, except for the very first one.
+MAX_INDEX_AGE = 300
+REBUILD_DELAY = 30
+BM25_K1 = 1.2
+BM25_B = 0.75
+# A title word counts as this many occurrences, keywords use KEYWORD_WEIGHT from relevance
+TITLE_WEIGHT = 3
+# Extracted PDF text only counts when asked for, and less than the metadata. Its
+# matrix is built on the first fulltext search against each index.
+FULLTEXT_WEIGHT = 0.5
+MAX_FULLTEXT_CHARS = 20000
+DEFAULT_SEARCH_SIZE = 20
+
+DECISIONS = ["pending", "accepted", "rejected"]
+REVIEW_COUNT_BUCKETS = ["0", "1", "2", "3+"]
+# Evaluations go from -2 to 2
+ACCEPTANCE_EDGES = [-1.0, 0.0, 1.0]
+ACCEPTANCE_BUCKETS = ["unreviewed", "< -1", "-1 to 0", "0 to 1", ">= 1"]
+FACETS = ("conference_id", "track_id", "decision", "review_count", "avg_acceptance")
+
+_index = None
+# Bumped by mark_search_index_stale, an index built from an older generation is refreshed
+_generation = 0
+_building = False
+# (paper_ids of the index it belongs to, fulltext matrix)
+_fulltext = None
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+_fulltext_lock = threading.Lock()
+
+
+def bm25_matrix(documents, n_documents):
+    """
+    documents yields (row, terms). Returns {"vocabulary", "matrix"} where
+    matrix is a CSC documents x terms matrix of BM25 weights, so a query
+    only has to add up the columns of its terms.
+    """
+    vocabulary = {}
+    document_rows, document_sizes, columns, counts = [], [], [], []
+    lengths = np.zeros(n_documents)
+    for row, terms in documents:
+        lengths[row] = len(terms)
+        term_counts = Counter(terms)
+        document_rows.append(row)
+        document_sizes.append(len(term_counts))
+        columns.extend([vocabulary.setdefault(term, len(vocabulary)) for term in term_counts])
+        counts.extend(term_counts.values())
+
+    rows = np.repeat(np.asarray(document_rows, dtype=np.int64), document_sizes)
+    columns = np.asarray(columns, dtype=np.int64)
+    counts = np.asarray(counts, dtype=float)
+    document_frequency = np.bincount(columns, minlength=len(vocabulary))
+    idf = np.log(1.0 + (n_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+    average_length = lengths.mean() if n_documents and lengths.mean() else 1.0
+    norms = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths[rows] / average_length)
+    weights = idf[columns] * counts * (BM25_K1 + 1.0) / (counts + norms)
+
+    matrix = sparse.csc_matrix((weights, (rows, columns)), shape=(n_documents, len(vocabulary)))
+    return {"vocabulary": vocabulary, "matrix": matrix}
+
+
+def bm25_scores(field_index, terms):
+    columns = [field_index["vocabulary"][term] for term in set(terms) if term in field_index["vocabulary"]]
+    if not columns:
+        return np.zeros(field_index["matrix"].shape[0])
+    return np.asarray(field_index["matrix"][:, columns].sum(axis=1)).ravel()
+
+
+def facet_codes(values, labels=None):
+    """Maps values to integer codes. Without labels, the distinct values become the labels."""
+    if labels is None:
+        labels = sorted({value for value in values if value is not None})
+    positions = {label: code for code, label in enumerate(labels)}
+    codes = np.array([positions.get(value, -1) for value in values], dtype=np.int32)
+    return labels, codes
+
+
+def decision_label(decision):
+    if decision is True:
+        return "accepted"
+    if decision is False:
+        return "rejected"
+    return "pending"
+
+
+def acceptance_codes(review_counts, avg_acceptance):
+    return np.where(review_counts > 0, 1 + np.digitize(avg_acceptance, ACCEPTANCE_EDGES), 0).astype(np.int32)
+
+
+def build_search_index():
+    papers = list(mongo.db.papers.aggregate([{"$project": {
+        "title": 1, "abstract": 1, "keywords": 1, "track": 1, "decision": 1, "avg_acceptance": 1,
+        "file_sha256": 1, "created_at": 1, "review_count": {"$size": {"$ifNull": ["$reviews", []]}}
+    }}]))
+    track_conferences = {
+        str(track["_id"]): str(track.get("conference_id") or "")
+        for track in mongo.db.tracks.find({}, {"conference_id": 1})
+    }
+
+    meta = bm25_matrix(
+        (
+            (row, tokenize(paper.get("title")) * TITLE_WEIGHT + tokenize(paper.get("abstract"))
+             + keyword_terms(paper.get("keywords")))
+            for row, paper in enumerate(papers)
+        ),
+        len(papers)
+    )
+
+    review_counts = np.array([paper.get("review_count", 0) for paper in papers], dtype=np.int32)
+    avg_acceptance = np.array([float(paper.get("avg_acceptance") or 0.0) for paper in papers])
+    track_ids = [str(paper.get("track") or "") or None for paper in papers]
+    paper_ids = [str(paper["_id"]) for paper in papers]
+
+    return {
+        "paper_ids": paper_ids,
+        "paper_rows": {paper_id: row for row, paper_id in enumerate(paper_ids)},
+        "titles": [paper.get("title", "") for paper in papers],
+        "track_ids": track_ids,
+        "review_counts": review_counts,
+        "avg_acceptance": avg_acceptance,
+        "created": np.array([
+            paper["created_at"].timestamp() if paper.get("created_at") else paper["_id"].generation_time.timestamp()
+            for paper in papers
+        ]),
+        "meta": meta,
+        "file_sha256": [paper.get("file_sha256") for paper in papers],
+        "facets": {
+            "conference_id": facet_codes([track_conferences.get(track_id) or None for track_id in track_ids]),
+            "track_id": facet_codes(track_ids),
+            "decision": facet_codes([decision_label(paper.get("decision")) for paper in papers], DECISIONS),
+            "review_count": (REVIEW_COUNT_BUCKETS, np.minimum(review_counts, len(REVIEW_COUNT_BUCKETS) - 1)),
+            "avg_acceptance": (ACCEPTANCE_BUCKETS, acceptance_codes(review_counts, avg_acceptance))
+        }
+    }
+
+
+def build_fulltext_index(index):
+    """BM25 over the extracted PDF texts, with the rows of index."""
+    # Only the beginning of long texts, read straight from the cursor so the texts are never all in memory
+    sha_rows = {}
+    for row, sha256 in enumerate(index["file_sha256"]):
+        if sha256:
+            sha_rows.setdefault(sha256, []).append(row)
+    texts = mongo.db.pdf_derived.aggregate([
+        {"$match": {"sha256": {"$in": list(sha_rows)}, "valid": True}},
+        {"$project": {"sha256": 1, "text": {"$substrCP": [{"$ifNull": ["$text", ""]}, 0, MAX_FULLTEXT_CHARS]}}}
+    ])
+    return bm25_matrix(
+        ((row, tokenize(text["text"])) for text in texts for row in sha_rows[text["sha256"]]),
+        len(index["paper_ids"])
+    )
+
+
+def get_fulltext_index(index):
+    """The fulltext matrix of index, built on first use. Patched copies of an index share its paper_ids and matrix."""
+    global _fulltext
+    with _fulltext_lock:
+        if _fulltext is None or _fulltext[0] is not index["paper_ids"]:
+            _fulltext = (index["paper_ids"], build_fulltext_index(index))
+        return _fulltext[1]
+
+
+def refresh_search_index():
+    """Builds a new index and stores it unless a newer build got there first. Returns the index."""
+    global _index, _building
+    with _build_lock:
+        with _lock:
+            generation = _generation
+            if _index is not None and _index["generation"] == generation and not index_expired(_index):
+                _building = False
+                return _index
+        try:
+            index = {**build_search_index(), "generation": generation, "built_at": time.monotonic()}
+        except Exception:
+            with _lock:
+                _building = False
+            raise
+        with _lock:
+            _building = False
+            if _index is None or _index["generation"] <= generation:
+                _index = index
+        return index
+
+
+def index_expired(index):
+    age = time.monotonic() - index["built_at"]
+    return age > MAX_INDEX_AGE or (index["generation"] != _generation and age > REBUILD_DELAY)
+
+
+def get_search_index():
+    """Returns the current index. A stale one is still returned while its replacement is built in a thread."""
+    global _building
+    with _lock:
+        index = _index
+        rebuild = index is not None and index_expired(index) and not _building
+        if rebuild:
+            _building = True
+
+    if index is None:
+        return refresh_search_index()
+    if rebuild:
+        threading.Thread(target=refresh_search_index, daemon=True).start()
+    return index
+
+
+def mark_search_index_stale():
+    """Call after papers are added or change title, abstract, keywords, track or file."""
+    global _generation
+    with _lock:
+        _generation += 1
+
+
+def refresh_search_paper(paper_id):
+    """
+    Call after a paper's decision or reviews change. Its facet values are
+    replaced in a copy of the index, the BM25 matrices are left as they are.
+    """
+    global _index, _generation
+    with _lock:
+        index = _index
+    if index is None:
+        return
+    row = index["paper_rows"].get(str(paper_id))
+    if row is None:
+        mark_search_index_stale()
+        return
+    paper = mongo.db.papers.find_one({"_id": ObjectId(paper_id)}, {"decision": 1, "avg_acceptance": 1, "reviews": 1})
+    if not paper:
+        mark_search_index_stale()
+        return
+
+    review_counts, avg_acceptance = index["review_counts"].copy(), index["avg_acceptance"].copy()
+    review_counts[row] = len(paper.get("reviews") or [])
+    avg_acceptance[row] = float(paper.get("avg_acceptance") or 0.0)
+    decision_codes = index["facets"]["decision"][1].copy()
+    decision_codes[row] = DECISIONS.index(decision_label(paper.get("decision")))
+    facets = {
+        **index["facets"],
+        "decision": (DECISIONS, decision_codes),
+        "review_count": (REVIEW_COUNT_BUCKETS, np.minimum(review_counts, len(REVIEW_COUNT_BUCKETS) - 1)),
+        "avg_acceptance": (ACCEPTANCE_BUCKETS, acceptance_codes(review_counts, avg_acceptance))
+    }
+    with _lock:
+        patched = _index is index
+        if patched:
+            _index = {**index, "review_counts": review_counts, "avg_acceptance": avg_acceptance, "facets": facets}
+        if _building or not patched:
+            # Replaced meanwhile, or a build running now may have read the paper before the change
+            _generation += 1
+
+
+def rank_papers(query="", filters=None, fulltext=False, limit=DEFAULT_SEARCH_SIZE, offset=0):
+    """
+    Ranks papers by BM25 on their title, abstract and keywords (and the
+    extracted PDF text when fulltext is set), newest first without a query.
+    filters maps facet names to a label, e.g. {"decision": "accepted"}.
+    Facet counts leave out the facet's own filter, so every other option of
+    a filtered facet is still shown with its count.
+    """
+    index = get_search_index()
+    filters = {name: value for name, value in (filters or {}).items() if name in FACETS and value not in (None, "")}
+    terms = tokenize(query)
+
+    if terms:
+        scores = bm25_scores(index["meta"], terms)
+        if fulltext:
+            scores += FULLTEXT_WEIGHT * bm25_scores(get_fulltext_index(index), terms)
+        matched = scores > 0
+    else:
+        scores = np.zeros(len(index["paper_ids"]))
+        matched = np.ones(len(index["paper_ids"]), dtype=bool)
+
+    masks = {}
+    for name, value in filters.items():
+        labels, codes = index["facets"][name]
+        masks[name] = codes == labels.index(value) if value in labels else np.zeros(len(codes), dtype=bool)
+
+    selected = matched.copy()
+    for mask in masks.values():
+        selected &= mask
+
+    facets = {}
+    for name in FACETS:
+        labels, codes = index["facets"][name]
+        subset = matched.copy()
+        for other, mask in masks.items():
+            if other != name:
+                subset &= mask
+        counts = np.bincount(codes[subset & (codes >= 0)], minlength=len(labels))
+        facets[name] = {labels[code]: int(count) for code, count in enumerate(counts) if count}
+
+    hits = np.flatnonzero(selected)
+    hits = hits[np.lexsort((-index["created"][hits], -scores[hits]))]
+    page = hits[offset:offset + limit]
+
+    decision_labels, decision_codes = index["facets"]["decision"]
+    results = [
+        {
+            "_id": index["paper_ids"][i],
+            "title": index["titles"][i],
+            "track": index["track_ids"][i],
+            "decision": decision_labels[decision_codes[i]],
+            "review_count": int(index["review_counts"][i]),
+            "avg_acceptance": round(float(index["avg_acceptance"][i]), 4),
+            "score": round(float(scores[i]), 4) if terms else None
+        }
+        for i in page
+    ]
+    next_offset = offset + limit if offset + limit < len(hits) else None
+    return {"results": results, "total": int(len(hits)), "next_offset": next_offset, "facets": facets}
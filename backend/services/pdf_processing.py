@@ -0,0 +1,327 @@
+import hashlib
+import multiprocessing
+import os
+import shutil
+import socket
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from io import BytesIO
+import pypdfium2 as pdfium
+from bson import Binary, ObjectId
+from pymongo import ReturnDocument
+from extensions import mongo
+from services.storage import CHUNK_SIZE, paper_blob, storage_root
+
+# One pdf_jobs document per paper, re-queued whenever the paper gets a new file.
+# Results are stored per content in pdf_derived (keyed by file_sha256) and
+# summarised in papers.pdf_info.
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 60
+# A job whose worker stopped renewing its lease is picked up again
+LEASE_SECONDS = 300
+POLL_SECONDS = 2
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# Keeps pdf_derived documents well under MongoDB's 16 MB limit
+MAX_TEXT_CHARS = 2_000_000
+THUMBNAIL_WIDTH = 320
+
+
+def extract_pdf(path, expected_sha256=None):
+    """
+    Reads one PDF: checksum, page count, text and a PNG of the first page.
+    Runs inside the process pool, so it must not touch Flask or MongoDB.
+    Files that cannot be parsed come back with valid=False and an error
+    instead of raising.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    result = {
+        "valid": False, "error": None, "page_count": None,
+        "text": "", "text_truncated": False, "thumbnail": None
+    }
+    if expected_sha256 and digest.hexdigest() != expected_sha256:
+        result["error"] = "Stored file does not match its checksum"
+        return result
+
+    try:
+        pdf = pdfium.PdfDocument(path)
+    except pdfium.PdfiumError as e:
+        result["error"] = f"Unreadable PDF: {e}"
+        return result
+
+    try:
+        result["page_count"] = len(pdf)
+        if not len(pdf):
+            result["error"] = "PDF has no pages"
+            return result
+
+        parts, length = [], 0
+        for index in range(len(pdf)):
+            page = pdf[index]
+            text_page = page.get_textpage()
+            text = text_page.get_text_range()
+            text_page.close()
+            page.close()
+            if length + len(text) > MAX_TEXT_CHARS:
+                parts.append(text[:MAX_TEXT_CHARS - length])
+                result["text_truncated"] = True
+                break
+            parts.append(text)
+            length += len(text)
+        result["text"] = "\n".join(parts)
+
+        page = pdf[0]
+        image = page.render(scale=THUMBNAIL_WIDTH / page.get_width()).to_pil()
+        page.close()
+        thumbnail = BytesIO()
+        image.save(thumbnail, "PNG", optimize=True)
+        result["thumbnail"] = thumbnail.getvalue()
+        result["valid"] = True
+    except pdfium.PdfiumError as e:
+        result["error"] = f"Unreadable PDF: {e}"
+    finally:
+        pdf.close()
+    return result
+
+
+def enqueue_pdf_job(paper_id, sha256):
+    """Queues (or re-queues) the processing of a paper's current file. Cheap enough for the request thread."""
+    now = datetime.utcnow()
+    mongo.db.pdf_jobs.update_one(
+        {"paper_id": str(paper_id)},
+        {
+            "$set": {"sha256": sha256, "status": "queued", "attempts": 0, "available_at": now, "updated_at": now},
+            "$unset": {"error": "", "worker": "", "lease_until": ""},
+            "$setOnInsert": {"created_at": now}
+        },
+        upsert=True
+    )
+    mongo.db.papers.update_one({"_id": ObjectId(paper_id)}, {"$set": {"pdf_info": {"status": "queued"}}})
+
+
+def enqueue_missing_pdf_jobs():
+    """Queues every paper with a file that has no pdf_info yet. Returns the number of jobs queued."""
+    count = 0
+    for paper in mongo.db.papers.find(
+        {"file_sha256": {"$ne": None}, "pdf_info": {"$exists": False}}, {"file_sha256": 1}
+    ):
+        enqueue_pdf_job(paper["_id"], paper["file_sha256"])
+        count += 1
+    return count
+
+
+def claim_job(worker_id):
+    now = datetime.utcnow()
+    return mongo.db.pdf_jobs.find_one_and_update(
+        {
+            "attempts": {"$lt": MAX_ATTEMPTS},
+            "$or": [
+                {"status": "queued", "available_at": {"$lte": now}},
+                {"status": "running", "lease_until": {"$lt": now}}
+            ]
+        },
+        {
+            "$set": {
+                "status": "running", "worker": worker_id,
+                "lease_until": now + timedelta(seconds=LEASE_SECONDS), "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("available_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def renew_leases(worker_id, job_ids):
+    if job_ids:
+        mongo.db.pdf_jobs.update_many(
+            {"_id": {"$in": job_ids}, "worker": worker_id, "status": "running"},
+            {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)}}
+        )
+
+
+def fail_abandoned_jobs():
+    """Jobs whose last allowed attempt died with its worker are marked failed."""
+    now = datetime.utcnow()
+    for job in mongo.db.pdf_jobs.find(
+        {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$gte": MAX_ATTEMPTS}},
+        {"paper_id": 1, "sha256": 1}
+    ):
+        finish_job(job, "failed", "Worker stopped while processing the file")
+
+
+def set_paper_info(job, pdf_info):
+    # A paper that got another file meanwhile is left to the job of that file
+    mongo.db.papers.update_one(
+        {"_id": ObjectId(job["paper_id"]), "file_sha256": job["sha256"]},
+        {"$set": {"pdf_info": pdf_info}}
+    )
+
+
+def finish_job(job, status, error=None):
+    now = datetime.utcnow()
+    result = mongo.db.pdf_jobs.update_one(
+        {"_id": job["_id"], "sha256": job["sha256"], "status": "running"},
+        {"$set": {"status": status, "error": error, "updated_at": now}, "$unset": {"lease_until": ""}}
+    )
+    if status == "failed" and result.modified_count:
+        set_paper_info(job, {"status": "failed", "error": error, "processed_at": now})
+
+
+def retry_job(job, error):
+    if job["attempts"] >= MAX_ATTEMPTS:
+        finish_job(job, "failed", error)
+        return
+    now = datetime.utcnow()
+    mongo.db.pdf_jobs.update_one(
+        {"_id": job["_id"], "sha256": job["sha256"], "status": "running"},
+        {
+            "$set": {
+                "status": "queued", "error": error, "updated_at": now,
+                "available_at": now + timedelta(seconds=RETRY_DELAY_SECONDS * job["attempts"])
+            },
+            "$unset": {"lease_until": ""}
+        }
+    )
+
+
+def summarize(derived):
+    return {
+        "status": "done",
+        "valid": derived["valid"],
+        "error": derived.get("error"),
+        "page_count": derived.get("page_count"),
+        "text_length": derived.get("text_length", 0),
+        "has_thumbnail": derived.get("has_thumbnail", False),
+        "processed_at": derived["processed_at"]
+    }
+
+
+def store_result(job, result):
+    derived = {
+        **result,
+        "thumbnail": Binary(result["thumbnail"]) if result["thumbnail"] else None,
+        "text_length": len(result["text"]),
+        "has_thumbnail": result["thumbnail"] is not None,
+        "processed_at": datetime.utcnow()
+    }
+    mongo.db.pdf_derived.update_one({"sha256": job["sha256"]}, {"$set": derived}, upsert=True)
+    set_paper_info(job, summarize(derived))
+    finish_job(job, "done", result["error"])
+
+
+def local_copy(job):
+    """
+    Returns (path, is_temporary) of the job's file on this machine. Blobs
+    outside the local disk are streamed into a temporary file first, the pool
+    processes only ever get a path.
+    """
+    paper = mongo.db.papers.find_one(
+        {"_id": ObjectId(job["paper_id"])},
+        {"paper_path": 1, "file_sha256": 1, "storage_backend": 1, "storage_key": 1}
+    )
+    if not paper or paper.get("file_sha256") != job["sha256"]:
+        return None, False
+
+    store, key = paper_blob(paper)
+    if key and store.local_path(key):
+        return store.local_path(key), False
+
+    directory = os.path.join(storage_root(), ".tmp")
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, prefix="pdf-job-")
+    with os.fdopen(fd, "wb") as target, store.open(key) as source:
+        shutil.copyfileobj(source, target, CHUNK_SIZE)
+    return path, True
+
+
+def new_pool(workers):
+    # spawn keeps the MongoDB client of this process out of the children
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def dispatch_job(pool, job):
+    """Submits a claimed job to the pool. Returns (future, path, is_temporary), or None if the job needed no parsing."""
+    derived = mongo.db.pdf_derived.find_one({"sha256": job["sha256"]}, {"text": 0, "thumbnail": 0})
+    if derived:
+        # The same content was already processed for another paper
+        set_paper_info(job, summarize(derived))
+        finish_job(job, "done", derived.get("error"))
+        return None
+
+    try:
+        path, is_temporary = local_copy(job)
+    except OSError as e:
+        retry_job(job, f"File not available: {e}")
+        return None
+    if path is None:
+        # The paper is gone or has another file, which has its own job
+        finish_job(job, "done", "Superseded")
+        return None
+    return pool.submit(extract_pdf, path, job["sha256"]), path, is_temporary
+
+
+def run_pdf_worker(workers=DEFAULT_WORKERS, once=False):
+    """
+    Claims queued jobs and parses their PDFs in a process pool until stopped,
+    or until the queue is empty when once is set. Returns the number of files
+    parsed. Jobs live in MongoDB, so a restarted worker resumes where the
+    previous one stopped.
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    parsed = 0
+    pending = {}
+    pool = new_pool(workers)
+
+    try:
+        while True:
+            fail_abandoned_jobs()
+            while len(pending) < workers:
+                job = claim_job(worker_id)
+                if not job:
+                    break
+                dispatched = dispatch_job(pool, job)
+                if dispatched:
+                    future, path, is_temporary = dispatched
+                    pending[future] = (job, path, is_temporary)
+
+            if not pending:
+                if once:
+                    return parsed
+                time.sleep(POLL_SECONDS)
+                continue
+
+            done, _ = wait(pending, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                job, path, is_temporary = pending.pop(future)
+                if is_temporary and os.path.exists(path):
+                    os.remove(path)
+                try:
+                    store_result(job, future.result())
+                    parsed += 1
+                except BrokenProcessPool:
+                    # A child died, e.g. on a file that crashed the PDF library
+                    broken = True
+                    retry_job(job, "PDF processing crashed")
+                except Exception as e:
+                    retry_job(job, str(e))
+
+            if broken:
+                # Every job still in the pool fails with it, they are retried too
+                for job, path, is_temporary in pending.values():
+                    if is_temporary and os.path.exists(path):
+                        os.remove(path)
+                    retry_job(job, "PDF processing crashed")
+                pending.clear()
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = new_pool(workers)
+            renew_leases(worker_id, [job["_id"] for job, _, _ in pending.values()])
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
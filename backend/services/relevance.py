@@ -0,0 +1,227 @@
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+import numpy as np
+from scipy import sparse
+from bson import ObjectId
+from extensions import mongo
+
+# Paper x reviewer relevance per track, least recently used tracks are dropped first
+MAX_TRACKS = 64
+# Paper updates reuse the idf weights of the last full build, past this many the track is rebuilt
+MAX_INCREMENTAL_UPDATES = 200
+# Changes made by other processes or replicas only show up once the entry is this old
+MAX_ENTRY_AGE = 300
+# A keyword counts as this many occurrences of each of its words
+KEYWORD_WEIGHT = 3
+MIN_TOKEN_LENGTH = 3
+STOPWORDS = frozenset(
+    "and are but can for from has have into its not our that the their these this those "
+    "was were which while will with using based via new paper approach study results".split()
+)
+
+PAPER_TEXT_PROJECTION = {"title": 1, "abstract": 1, "keywords": 1}
+
+_entries = OrderedDict()
+# Bumped by every invalidation so a build that raced with one is not stored
+_generation = 0
+_lock = threading.Lock()
+
+
+def tokenize(text):
+    return [
+        token for token in re.findall(r"\w+", str(text or "").lower())
+        if len(token) >= MIN_TOKEN_LENGTH and token not in STOPWORDS and not token.isdigit()
+    ]
+
+
+def keyword_terms(keywords):
+    terms = []
+    for keyword in keywords or []:
+        terms.extend(tokenize(keyword) * KEYWORD_WEIGHT)
+    return terms
+
+
+def paper_terms(paper):
+    return tokenize(paper.get("title")) + tokenize(paper.get("abstract")) + keyword_terms(paper.get("keywords"))
+
+
+def reviewer_terms(reviewer, reviewed_papers):
+    """A reviewer is described by their preferred keywords and the papers they reviewed before."""
+    terms = keyword_terms(reviewer.get("preferred_keywords"))
+    for paper in reviewed_papers:
+        terms.extend(paper_terms(paper))
+    return terms
+
+
+def tfidf_matrix(term_lists, vocabulary, idf):
+    """Sparse rows of L2-normalized sublinear tf-idf weights, terms outside the vocabulary are ignored."""
+    rows, columns, weights = [], [], []
+    for row, terms in enumerate(term_lists):
+        for term, count in Counter(term for term in terms if term in vocabulary).items():
+            column = vocabulary[term]
+            rows.append(row)
+            columns.append(column)
+            weights.append((1.0 + math.log(count)) * idf[column])
+
+    matrix = sparse.csr_matrix((weights, (rows, columns)), shape=(len(term_lists), len(vocabulary)))
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix)
+
+
+def load_reviewed_papers(reviewer_ids):
+    # reviewer id -> texts of the papers they reviewed, two queries for all reviewers
+    reviews = list(mongo.db.reviews.find({"reviewer_id": {"$in": reviewer_ids}}, {"reviewer_id": 1, "paper_id": 1}))
+    paper_ids = {ObjectId(review["paper_id"]) for review in reviews if ObjectId.is_valid(str(review.get("paper_id")))}
+    papers = {
+        str(paper["_id"]): paper
+        for paper in mongo.db.papers.find({"_id": {"$in": list(paper_ids)}}, PAPER_TEXT_PROJECTION)
+    }
+
+    reviewed = {}
+    for review in reviews:
+        paper = papers.get(str(review.get("paper_id")))
+        if paper:
+            reviewed.setdefault(str(review["reviewer_id"]), []).append(paper)
+    return reviewed
+
+
+def build_track_relevance(track):
+    """Computes the cosine similarity of every paper of the track to every track member."""
+    started = time.monotonic()
+    paper_ids = [ObjectId(paper_id) for paper_id in track.get("papers", [])]
+    papers = list(mongo.db.papers.find({"_id": {"$in": paper_ids}}, PAPER_TEXT_PROJECTION))
+    member_ids = [ObjectId(member_id) for member_id in track.get("track_members", [])]
+    reviewers = list(mongo.db.users.find({"_id": {"$in": member_ids}}, {"preferred_keywords": 1}))
+
+    reviewer_ids = [str(reviewer["_id"]) for reviewer in reviewers]
+    reviewed = load_reviewed_papers(reviewer_ids)
+
+    paper_term_lists = [paper_terms(paper) for paper in papers]
+    document_frequency = Counter(term for terms in paper_term_lists for term in set(terms))
+    vocabulary = {term: column for column, term in enumerate(sorted(document_frequency))}
+    # Smoothed idf over the papers of the track
+    idf = np.array([
+        math.log((1 + len(papers)) / (1 + document_frequency[term])) + 1.0
+        for term in sorted(document_frequency)
+    ])
+
+    paper_matrix = tfidf_matrix(paper_term_lists, vocabulary, idf)
+    reviewer_matrix = tfidf_matrix(
+        [reviewer_terms(reviewer, reviewed.get(str(reviewer["_id"]), [])) for reviewer in reviewers],
+        vocabulary,
+        idf
+    )
+
+    return {
+        "paper_ids": [str(paper["_id"]) for paper in papers],
+        "reviewer_ids": reviewer_ids,
+        "vocabulary": vocabulary,
+        "idf": idf,
+        "reviewer_matrix": reviewer_matrix,
+        "similarity": (paper_matrix @ reviewer_matrix.T).toarray(),
+        "updates": 0,
+        "built_at": started
+    }
+
+
+def entry_expired(entry):
+    return time.monotonic() - entry["built_at"] > MAX_ENTRY_AGE
+
+
+def get_track_relevance(track):
+    """
+    Returns the cached relevance entry of a track, building it when missing
+    or older than MAX_ENTRY_AGE.
+    similarity has one row per paper_ids entry and one column per
+    reviewer_ids entry. Entries are replaced, never changed, so the arrays
+    can be read without holding the lock.
+    """
+    track_id = str(track["_id"])
+    with _lock:
+        entry = _entries.get(track_id)
+        if entry and not entry_expired(entry):
+            _entries.move_to_end(track_id)
+            return entry
+        generation = _generation
+
+    entry = build_track_relevance(track)
+    with _lock:
+        if generation != _generation:
+            return entry
+        _entries[track_id] = entry
+        _entries.move_to_end(track_id)
+        while len(_entries) > MAX_TRACKS:
+            _entries.popitem(last=False)
+    return entry
+
+
+def relevance_scores(track, paper_ids, reviewer_ids):
+    """Relevance aligned to the given ids, 0 for papers or reviewers the entry does not know."""
+    entry = get_track_relevance(track)
+    paper_rows = {paper_id: i for i, paper_id in enumerate(entry["paper_ids"])}
+    reviewer_columns = {reviewer_id: j for j, reviewer_id in enumerate(entry["reviewer_ids"])}
+
+    rows = np.array([paper_rows.get(str(paper_id), -1) for paper_id in paper_ids], dtype=int)
+    columns = np.array([reviewer_columns.get(str(reviewer_id), -1) for reviewer_id in reviewer_ids], dtype=int)
+
+    scores = np.zeros((len(rows), len(columns)))
+    known_rows = np.flatnonzero(rows >= 0)
+    known_columns = np.flatnonzero(columns >= 0)
+    scores[np.ix_(known_rows, known_columns)] = entry["similarity"][np.ix_(rows[known_rows], columns[known_columns])]
+    return scores
+
+
+def update_paper_relevance(track_id, paper):
+    """
+    Call after a paper is submitted or its title, abstract or keywords change.
+    Only the paper's row is recomputed, against the vocabulary and idf of the
+    last full build. Tracks that are not cached are built on their next read.
+    """
+    track_id = str(track_id)
+    with _lock:
+        entry = _entries.get(track_id)
+    if not entry or entry_expired(entry):
+        return
+
+    if entry["updates"] >= MAX_INCREMENTAL_UPDATES:
+        invalidate_track_relevance(track_id)
+        return
+
+    row = tfidf_matrix([paper_terms(paper)], entry["vocabulary"], entry["idf"])
+    scores = (row @ entry["reviewer_matrix"].T).toarray()
+
+    paper_id = str(paper["_id"])
+    if paper_id in entry["paper_ids"]:
+        similarity = entry["similarity"].copy()
+        similarity[entry["paper_ids"].index(paper_id)] = scores[0]
+        paper_ids = entry["paper_ids"]
+    else:
+        similarity = np.vstack([entry["similarity"], scores])
+        paper_ids = entry["paper_ids"] + [paper_id]
+
+    with _lock:
+        # Drop the update if the entry was rebuilt or invalidated meanwhile
+        if _entries.get(track_id) is entry:
+            _entries[track_id] = {**entry, "paper_ids": paper_ids, "similarity": similarity, "updates": entry["updates"] + 1}
+
+
+def invalidate_track_relevance(track_id):
+    """Call when the members of a track change."""
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.pop(str(track_id), None)
+
+
+def invalidate_reviewer_relevance(reviewer_id):
+    """Call when a reviewer's preferred keywords or reviewed papers change."""
+    global _generation
+    reviewer_id = str(reviewer_id)
+    with _lock:
+        _generation += 1
+        for track_id in [track_id for track_id, entry in _entries.items() if reviewer_id in entry["reviewer_ids"]]:
+            del _entries[track_id]
@@ -0,0 +1,233 @@
+from datetime import datetime
+import numpy as np
+from bson import ObjectId
+from extensions import mongo
+
+# Running sums kept per reviewer in the reviewer_stats collection
+STAT_FIELDS = (
+    "review_count",
+    "total_words",
+    "total_review_time",
+    "total_submit_time",
+    "total_evaluation",
+    "total_rating",
+    "rating_count",
+)
+
+
+def to_naive(value):
+    # Dates are stored both as datetimes and ISO strings, compare them naive
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    return value
+
+
+def evaluation_value(review):
+    try:
+        return float(review.get("evaluation"))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def find_paper_conference(paper):
+    # paper -> track -> conference, the conference end date is the review deadline
+    if not paper or not paper.get("track"):
+        return None
+    track = mongo.db.tracks.find_one({"_id": ObjectId(paper["track"])}, {"conference_id": 1})
+    if not track or not track.get("conference_id"):
+        return None
+    return mongo.db.conferences.find_one({"_id": ObjectId(track["conference_id"])}, {"end_date": 1})
+
+
+def review_contribution(review, paper, conference):
+    """
+    Returns what a single review adds to its reviewer's running sums.
+    The rating is the sum of the rates other users gave the review; the old
+    per-review loop read a review_rating field that nothing writes, so it was
+    always 0. Ratings count for every review, while times, words and
+    evaluation still only count when the conference deadline is known.
+    """
+    rates = review.get("rates", [])
+    contribution = {
+        "review_count": 1,
+        "total_rating": sum(r["rate"] for r in rates),
+        "rating_count": len(rates),
+    }
+
+    # Timing, words and evaluation only count when the deadline is known
+    if not paper or not conference or not conference.get("end_date"):
+        return contribution
+
+    conf_end_date = to_naive(conference["end_date"])
+    review_created = to_naive(review["created_at"])
+    paper_created = to_naive(paper["created_at"])
+
+    contribution["total_submit_time"] = (conf_end_date - review_created).total_seconds() / 3600
+    contribution["total_review_time"] = (review_created - paper_created).total_seconds() / 3600
+    contribution["total_words"] = len((review.get("evaluation_text") or "").split())
+    contribution["total_evaluation"] = evaluation_value(review)
+    return contribution
+
+
+def apply_stats_delta(reviewer_id, delta):
+    delta = {field: value for field, value in delta.items() if value}
+    if not delta:
+        return
+
+    mongo.db.reviewer_stats.update_one(
+        {"reviewer_id": str(reviewer_id)},
+        {"$inc": delta, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+
+def record_new_review(review, paper):
+    conference = find_paper_conference(paper)
+    apply_stats_delta(review["reviewer_id"], review_contribution(review, paper, conference))
+
+
+def record_review_change(old_review, new_review):
+    paper = mongo.db.papers.find_one({"_id": ObjectId(old_review["paper_id"])}, {"track": 1, "created_at": 1})
+    conference = find_paper_conference(paper)
+
+    old = review_contribution(old_review, paper, conference)
+    new = review_contribution(new_review, paper, conference)
+    apply_stats_delta(
+        old_review["reviewer_id"],
+        {field: new.get(field, 0) - old.get(field, 0) for field in STAT_FIELDS}
+    )
+
+
+def record_rate_change(review, old_rate, new_rate):
+    # old_rate is None when this user rates the review for the first time
+    apply_stats_delta(review["reviewer_id"], {
+        "total_rating": new_rate - (old_rate or 0),
+        "rating_count": 1 if old_rate is None else 0,
+    })
+
+
+def summarize_stats(stats):
+    """
+    Turns the running sums of one reviewer into averages. review_rating is
+    the average rate given to the reviewer's reviews, see review_contribution.
+    """
+    review_count = stats.get("review_count", 0)
+    rating_count = stats.get("rating_count", 0)
+    return {
+        "review_count": review_count,
+        "avg_submit_time_before_deadline": stats.get("total_submit_time", 0) / review_count,
+        "review_rating": stats.get("total_rating", 0) / rating_count if rating_count > 0 else 0,
+        "avg_words_per_review": stats.get("total_words", 0) / review_count,
+        "avg_time_to_review": stats.get("total_review_time", 0) / review_count,
+        "avg_rating_given": stats.get("total_evaluation", 0) / review_count,
+    }
+
+
+def load_review_context(reviews):
+    # Bulk-loads the papers, tracks and conferences referenced by the reviews,
+    # one $in query per collection
+    paper_ids = {ObjectId(review["paper_id"]) for review in reviews}
+    papers = {
+        str(paper["_id"]): paper
+        for paper in mongo.db.papers.find({"_id": {"$in": list(paper_ids)}}, {"track": 1, "created_at": 1})
+    }
+
+    track_ids = {ObjectId(paper["track"]) for paper in papers.values() if paper.get("track")}
+    tracks = {
+        str(track["_id"]): track
+        for track in mongo.db.tracks.find({"_id": {"$in": list(track_ids)}}, {"conference_id": 1})
+    }
+
+    conference_ids = {ObjectId(track["conference_id"]) for track in tracks.values() if track.get("conference_id")}
+    conferences = {
+        str(conference["_id"]): conference
+        for conference in mongo.db.conferences.find({"_id": {"$in": list(conference_ids)}}, {"end_date": 1})
+    }
+    return papers, tracks, conferences
+
+
+def compute_reviewer_totals(reviewer_ids=None):
+    """
+    Computes the reviewer_stats running sums straight from the reviews with a
+    constant number of queries. Pass reviewer_ids to limit it to some reviewers.
+    """
+    query = {} if reviewer_ids is None else {"reviewer_id": {"$in": list(reviewer_ids)}}
+    reviews = list(mongo.db.reviews.find(query, {
+        "reviewer_id": 1, "paper_id": 1, "created_at": 1, "evaluation_text": 1, "evaluation": 1, "rates": 1
+    }))
+    if not reviews:
+        return {}
+
+    papers, tracks, conferences = load_review_context(reviews)
+
+    reviewer_keys = sorted({str(review["reviewer_id"]) for review in reviews})
+    reviewer_index = {reviewer_id: i for i, reviewer_id in enumerate(reviewer_keys)}
+
+    count = len(reviews)
+    owner = np.empty(count, dtype=np.intp)
+    # Unresolved reviews keep the zero timestamps so their time deltas are 0
+    deadline = np.zeros(count, dtype="datetime64[us]")
+    review_created = np.zeros(count, dtype="datetime64[us]")
+    paper_created = np.zeros(count, dtype="datetime64[us]")
+    words = np.zeros(count)
+    evaluation = np.zeros(count)
+    rating_total = np.zeros(count)
+    rating_count = np.zeros(count)
+
+    for i, review in enumerate(reviews):
+        owner[i] = reviewer_index[str(review["reviewer_id"])]
+        rates = review.get("rates") or []
+        rating_total[i] = sum(r["rate"] for r in rates)
+        rating_count[i] = len(rates)
+
+        paper = papers.get(str(review["paper_id"]))
+        track = tracks.get(str(paper.get("track"))) if paper else None
+        conference = conferences.get(str(track.get("conference_id"))) if track else None
+        if not conference or not conference.get("end_date"):
+            continue
+
+        deadline[i] = to_naive(conference["end_date"])
+        review_created[i] = to_naive(review["created_at"])
+        paper_created[i] = to_naive(paper["created_at"])
+        words[i] = len((review.get("evaluation_text") or "").split())
+        evaluation[i] = evaluation_value(review)
+
+    one_hour = np.timedelta64(1, "h")
+    columns = {
+        "review_count": np.ones(count),
+        "total_words": words,
+        "total_review_time": (review_created - paper_created) / one_hour,
+        "total_submit_time": (deadline - review_created) / one_hour,
+        "total_evaluation": evaluation,
+        "total_rating": rating_total,
+        "rating_count": rating_count,
+    }
+    sums = {
+        field: np.bincount(owner, weights=column, minlength=len(reviewer_keys))
+        for field, column in columns.items()
+    }
+
+    counters = ("review_count", "rating_count")
+    return {
+        reviewer_id: {
+            field: int(sums[field][i]) if field in counters else float(sums[field][i])
+            for field in STAT_FIELDS
+        }
+        for i, reviewer_id in enumerate(reviewer_keys)
+    }
+
+
+def rebuild_reviewer_stats():
+    """Recomputes reviewer_stats from every stored review. Returns the number of reviewers written."""
+    totals = compute_reviewer_totals()
+
+    now = datetime.utcnow()
+    mongo.db.reviewer_stats.delete_many({})
+    if totals:
+        mongo.db.reviewer_stats.insert_many([
+            {"reviewer_id": reviewer_id, **reviewer_totals, "updated_at": now}
+            for reviewer_id, reviewer_totals in totals.items()
+        ])
+    return len(totals)
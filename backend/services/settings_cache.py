@@ -0,0 +1,125 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from extensions import mongo
+
+# Resolved effective settings per track, least recently used entries are dropped first
+MAX_ENTRIES = 2048
+# Entries are rebuilt after this many seconds even if no version changed
+MAX_ENTRY_AGE = 600
+# An entry whose stamp was checked this recently is served without any query
+VERSION_CHECK_SECONDS = 5
+
+# The version counters live in the settings_versions collection, one
+# {"_id": "<kind>:<key>", "version"} document each, so an update made by any
+# process or replica invalidates the entries cached by all of them. Checking
+# them costs one indexed query, so a repeat read only checks once every
+# VERSION_CHECK_SECONDS: another process may serve the old settings for that
+# long after an update, the process that made the update drops its entries
+# at once.
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+def version_id(kind, key):
+    return f"{kind}:{key}"
+
+
+def version_of(kind, key):
+    document = mongo.db.settings_versions.find_one({"_id": version_id(kind, key)}, {"version": 1})
+    return document["version"] if document else 0
+
+
+def versions_of(conference_id, track_id):
+    """Returns the (conference version, track version) stamp with one query on _id."""
+    conference_key, track_key = version_id("conference", conference_id), version_id("track", track_id)
+    versions = {
+        document["_id"]: document["version"]
+        for document in mongo.db.settings_versions.find({"_id": {"$in": [conference_key, track_key]}})
+    }
+    return versions.get(conference_key, 0), versions.get(track_key, 0)
+
+
+def bump_version(kind, key):
+    """Invalidates every cached entry that depends on this conference or track."""
+    mongo.db.settings_versions.update_one({"_id": version_id(kind, key)}, {"$inc": {"version": 1}}, upsert=True)
+    key = str(key)
+    with _lock:
+        if kind == "track":
+            _entries.pop(key, None)
+        else:
+            for track_id in [track_id for track_id, entry in _entries.items() if entry["conference_id"] == key]:
+                del _entries[track_id]
+
+
+def get_cached_settings(track_id):
+    """
+    Returns the cached entry ({"payload", "etag"}) if it is still current,
+    otherwise None. The version stamps are only read again once the last
+    check is VERSION_CHECK_SECONDS old.
+    """
+    track_id = str(track_id)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(track_id)
+        if entry and now - entry["stored_at"] <= MAX_ENTRY_AGE and now - entry["checked_at"] <= VERSION_CHECK_SECONDS:
+            _entries.move_to_end(track_id)
+            return entry
+    if not entry:
+        return None
+
+    current = now - entry["stored_at"] <= MAX_ENTRY_AGE
+    if current:
+        current = entry["stamp"] == versions_of(entry["conference_id"], track_id)
+
+    with _lock:
+        # Only touch it if no newer entry replaced it meanwhile
+        if _entries.get(track_id) is not entry:
+            return entry if current else None
+        if not current:
+            del _entries[track_id]
+            return None
+        entry = {**entry, "checked_at": now}
+        _entries[track_id] = entry
+        _entries.move_to_end(track_id)
+    return entry
+
+
+def store_settings(track_id, conference_id, stamp, payload):
+    """
+    Caches a resolved payload. stamp is the (conference version, track version)
+    pair read before the documents were loaded, so a concurrent update is never
+    hidden behind a stale entry.
+    """
+    etag = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    entry = {
+        "conference_id": str(conference_id),
+        "stamp": stamp,
+        "payload": payload,
+        "etag": f"{stamp[0]}.{stamp[1]}-{etag}",
+        "stored_at": time.monotonic(),
+        "checked_at": time.monotonic(),
+    }
+
+    with _lock:
+        _entries[str(track_id)] = entry
+        _entries.move_to_end(str(track_id))
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+    return entry
+
+
+def setting_value(track, conference, key, default=None):
+    # Track overrides win over the conference value, settings are {"value", "scope"} objects
+    track_settings = track.get("settings")
+    override = track_settings.get(key) if isinstance(track_settings, dict) else None
+    if isinstance(override, dict) and override.get("value") is not None:
+        return override["value"]
+
+    value = (conference or {}).get(key)
+    if isinstance(value, dict):
+        value = value.get("value")
+    return default if value is None else value
@@ -0,0 +1,348 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+import gridfs
+from flask import Request
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from werkzeug.exceptions import RequestEntityTooLarge
+from config import Config
+from extensions import mongo
+
+# Content-addressed blobs keyed <ab>/<cd>/<sha256>.pdf, identical files are stored once.
+# The key is a path under UPLOAD_FOLDER for the local driver and a file name in the bucket for GridFS.
+CHUNK_SIZE = 64 * 1024
+GRIDFS_BUCKET = "paper_files"
+GRIDFS_CHUNK_SIZE = 255 * 1024
+# Every blob has a blob_refs document {"_id": "<backend>:<key>", "count", "state"}
+# counting the papers that use it. The release that brings the count to zero
+# marks it "deleting" and removes the blob; uploads of the same content wait
+# until that is done instead of deduplicating against a blob about to go away.
+DELETE_WAIT_SECONDS = 0.05
+# A "deleting" mark older than this was left by a process that died mid-delete
+STALE_DELETE_SECONDS = 60
+
+
+def storage_root():
+    return Config.UPLOAD_FOLDER
+
+
+def blob_key(sha256, extension="pdf"):
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension}"
+
+
+def blob_path(key):
+    return os.path.join(storage_root(), *key.split("/"))
+
+
+class HashingUpload:
+    """
+    Writable, readable file handed to Werkzeug for every uploaded file part.
+    The part is written straight to a temporary file next to the blobs while
+    its SHA-256 and size are computed, and writing stops as soon as the size
+    limit is passed. The temporary file is deleted on close unless it was
+    moved into the store.
+    """
+
+    def __init__(self, max_bytes=None):
+        directory = os.path.join(storage_root(), ".tmp")
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix="upload-")
+        self.file = os.fdopen(fd, "w+b")
+        self.max_bytes = Config.MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.stored = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            # Werkzeug never wraps a part that failed, so clean up here
+            self.close()
+            raise RequestEntityTooLarge(f"Files are limited to {self.max_bytes // (1024 * 1024)} MB")
+        self.sha256.update(data)
+        return self.file.write(data)
+
+    def close(self):
+        self.file.close()
+        if not self.stored and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        # read, seek, tell, flush... come from the underlying file
+        return getattr(self.file, name)
+
+    def __iter__(self):
+        return iter(self.file)
+
+
+class UploadRequest(Request):
+    """Request class that streams uploaded files through HashingUpload instead of spooling them."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingUpload()
+
+
+class LocalBlobStore:
+    """Blobs sharded under UPLOAD_FOLDER. Only works across replicas if the folder is shared storage."""
+
+    name = "local"
+
+    def exists(self, key):
+        return os.path.exists(blob_path(key))
+
+    def put(self, key, upload):
+        """Moves a HashingUpload into the store. Returns False if the blob was already there."""
+        target = blob_path(key)
+        if os.path.exists(target):
+            return False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(upload.path, target)
+        upload.stored = True
+        return True
+
+    def open(self, key):
+        return open(blob_path(key), "rb")
+
+    def delete(self, key):
+        if os.path.exists(blob_path(key)):
+            os.remove(blob_path(key))
+
+    def local_path(self, key):
+        return os.path.abspath(blob_path(key))
+
+    def reference(self, key):
+        return "/" + blob_path(key).replace(os.sep, "/").lstrip("/")
+
+
+class GridFSBlobStore:
+    """
+    Blobs kept in a GridFS bucket of the application database, so every
+    replica sees the same files. Uploads and downloads go chunk by chunk,
+    a whole PDF is never held in memory.
+    """
+
+    name = "gridfs"
+
+    def __init__(self, bucket_name=GRIDFS_BUCKET):
+        self.bucket_name = bucket_name
+        self._bucket = None
+
+    @property
+    def bucket(self):
+        # mongo.db only exists once the app is initialised
+        if self._bucket is None:
+            self._bucket = gridfs.GridFSBucket(mongo.db, bucket_name=self.bucket_name, chunk_size_bytes=GRIDFS_CHUNK_SIZE)
+        return self._bucket
+
+    def exists(self, key):
+        return mongo.db[f"{self.bucket_name}.files"].count_documents({"filename": key}, limit=1) > 0
+
+    def put(self, key, upload):
+        """Copies a HashingUpload into the bucket. Returns False if the blob was already there."""
+        if self.exists(key):
+            return False
+        upload.seek(0)
+        # Two replicas racing on the same content may both write it, reads take the newest
+        # revision and delete removes them all
+        self.bucket.upload_from_stream(
+            key, upload, metadata={"sha256": upload.sha256.hexdigest(), "size": upload.size}
+        )
+        return True
+
+    def open(self, key):
+        """Returns a seekable GridOut with length and upload_date."""
+        try:
+            return self.bucket.open_download_stream_by_name(key)
+        except gridfs.NoFile:
+            raise FileNotFoundError(key)
+
+    def delete(self, key):
+        for grid_file in self.bucket.find({"filename": key}):
+            self.bucket.delete(grid_file._id)
+
+    def local_path(self, key):
+        return None
+
+    def reference(self, key):
+        return f"gridfs://{self.bucket_name}/{key}"
+
+
+BLOB_STORES = {"local": LocalBlobStore, "gridfs": GridFSBlobStore}
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_blob_store(name=None):
+    """The driver for a backend name, STORAGE_BACKEND by default."""
+    name = name or Config.STORAGE_BACKEND
+    if name not in BLOB_STORES:
+        raise ValueError(f"Unknown storage backend: {name}")
+    with _stores_lock:
+        if name not in _stores:
+            _stores[name] = BLOB_STORES[name]()
+        return _stores[name]
+
+
+def paper_blob(paper):
+    """
+    Returns (store, key) of a paper's file. Papers written before the
+    storage drivers have no storage_backend and live in the local store;
+    the key is None for legacy files that were not content-addressed.
+    """
+    store = get_blob_store(paper.get("storage_backend") or LocalBlobStore.name)
+    if paper.get("storage_key"):
+        return store, paper["storage_key"]
+    if paper.get("file_sha256"):
+        extension = os.path.splitext(paper.get("paper_path") or "")[1].lstrip(".") or "pdf"
+        return store, blob_key(paper["file_sha256"], extension)
+    return store, None
+
+
+def blob_ref_id(store, key):
+    return f"{store.name}:{key}"
+
+
+def acquire_blob(store, key):
+    """Adds a reference to a blob, waiting while a release is deleting it."""
+    ref_id = blob_ref_id(store, key)
+    while True:
+        try:
+            mongo.db.blob_refs.update_one(
+                {"_id": ref_id, "state": {"$ne": "deleting"}},
+                {"$inc": {"count": 1}, "$setOnInsert": {"state": "live"}},
+                upsert=True
+            )
+            return
+        except DuplicateKeyError:
+            # The blob is being deleted, its reference document goes once it is gone
+            mongo.db.blob_refs.delete_one({
+                "_id": ref_id, "state": "deleting",
+                "deleting_at": {"$lt": datetime.utcnow() - timedelta(seconds=STALE_DELETE_SECONDS)}
+            })
+            time.sleep(DELETE_WAIT_SECONDS)
+
+
+def release_blob(store, key):
+    """Drops a reference to a blob and deletes the blob with the last one."""
+    ref_id = blob_ref_id(store, key)
+    ref = mongo.db.blob_refs.find_one_and_update(
+        {"_id": ref_id, "count": {"$gt": 0}},
+        {"$inc": {"count": -1}},
+        return_document=ReturnDocument.AFTER
+    )
+    # Blobs without a reference document predate the counts and are kept, see backfill_blob_refs
+    if not ref or ref["count"] > 0:
+        return
+
+    claimed = mongo.db.blob_refs.update_one(
+        {"_id": ref_id, "count": 0, "state": "live"},
+        {"$set": {"state": "deleting", "deleting_at": datetime.utcnow()}}
+    )
+    if claimed.modified_count:
+        try:
+            store.delete(key)
+        finally:
+            mongo.db.blob_refs.delete_one({"_id": ref_id, "state": "deleting"})
+
+
+def backfill_blob_refs():
+    """Sets the reference count of every blob from the papers using it. Returns the number of blobs counted."""
+    counts = Counter()
+    for paper in mongo.db.papers.find(
+        {"file_sha256": {"$ne": None}}, {"file_sha256": 1, "paper_path": 1, "storage_backend": 1, "storage_key": 1}
+    ):
+        store, key = paper_blob(paper)
+        if key:
+            counts[blob_ref_id(store, key)] += 1
+
+    for ref_id, count in counts.items():
+        mongo.db.blob_refs.update_one(
+            {"_id": ref_id}, {"$set": {"count": count, "state": "live"}, "$unset": {"deleting_at": ""}}, upsert=True
+        )
+    return len(counts)
+
+
+def store_upload(file_storage, extension="pdf", store=None):
+    """
+    Moves an uploaded file into the configured blob store and adds a
+    reference to it, which release_upload drops again. Returns
+    {"backend", "key", "path", "sha256", "size", "deduplicated"}; path is
+    what papers.paper_path keeps, a /-prefixed relative path for the local
+    store and a gridfs:// reference otherwise.
+    """
+    store = store or get_blob_store()
+    upload = file_storage.stream
+    if not isinstance(upload, HashingUpload):
+        # Uploads that did not come through UploadRequest are copied once
+        upload = HashingUpload()
+        shutil.copyfileobj(file_storage.stream, upload, CHUNK_SIZE)
+
+    upload.flush()
+    sha256 = upload.sha256.hexdigest()
+    key = blob_key(sha256, extension)
+    try:
+        # Referenced before put, so a concurrent release cannot delete the blob this upload reuses
+        acquire_blob(store, key)
+        try:
+            deduplicated = not store.put(key, upload)
+        except Exception:
+            release_blob(store, key)
+            raise
+    finally:
+        upload.close()
+
+    return {
+        "backend": store.name,
+        "key": key,
+        "path": store.reference(key),
+        "sha256": sha256,
+        "size": upload.size,
+        "deduplicated": deduplicated
+    }
+
+
+def resolve_paper_file(paper):
+    """
+    Returns (absolute path, path relative to the storage root) of a locally
+    stored paper file without touching the disk. The relative path is None
+    for legacy files stored outside the root.
+    """
+    store, key = paper_blob(paper)
+    if key:
+        return store.local_path(key), key
+
+    path = os.path.abspath((paper.get("paper_path") or "").lstrip("/"))
+    relative = os.path.relpath(path, os.path.abspath(storage_root()))
+    if relative.startswith(".."):
+        return path, None
+    return path, relative.replace(os.sep, "/")
+
+
+def open_paper_file(paper):
+    """Opens a paper's file for reading from whichever store holds it. Raises FileNotFoundError."""
+    store, key = paper_blob(paper)
+    if key:
+        return store.open(key)
+    return open((paper.get("paper_path") or "").lstrip("/"), "rb")
+
+
+def release_upload(paper):
+    """Drops a paper's reference to its file, which is deleted once no paper uses the same content."""
+    store, key = paper_blob(paper)
+    if key is None:
+        path = (paper.get("paper_path") or "").lstrip("/")
+        if path and os.path.exists(path):
+            os.remove(path)
+        return
+    release_blob(store, key)
+
+
+def discard_upload(stored):
+    """Drops the reference store_upload took, for an upload no paper ended up pointing at."""
+    release_blob(get_blob_store(stored["backend"]), stored["key"])
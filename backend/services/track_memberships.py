@@ -0,0 +1,59 @@
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from extensions import mongo
+
+
+def membership_upsert(track_id, user_id, position, conference_id=None, role_id=None):
+    # (track_id, user_id, position) is unique, so re-appointing someone is a no-op
+    query = {"track_id": str(track_id), "user_id": str(user_id), "position": position}
+    update = {
+        "$set": {
+            "conference_id": str(conference_id) if conference_id else None,
+            "role_id": str(role_id) if role_id else None
+        },
+        "$setOnInsert": {"created_at": datetime.utcnow()}
+    }
+    return query, update
+
+
+def add_track_membership(track_id, user_id, position, conference_id=None, role_id=None):
+    """Records that a user holds a position in a track. Does nothing for roles without a track."""
+    if not track_id or str(track_id) == "None":
+        return
+
+    query, update = membership_upsert(track_id, user_id, position, conference_id, role_id)
+    mongo.db.track_memberships.update_one(query, update, upsert=True)
+
+
+def backfill_track_memberships():
+    """Builds track_memberships from the users' role ids. Returns the number of memberships written."""
+    # Every role that belongs to a track, keyed the way users store them
+    track_roles = {}
+    for role in mongo.db.roles.find({"track_id": {"$nin": [None, "None"]}}):
+        track_roles[str(role["_id"])] = role
+
+    operations = []
+    for user in mongo.db.users.find({"roles": {"$ne": []}}, {"roles": 1}):
+        for role_ref in user.get("roles", []):
+            # Older documents embed the role itself instead of its id
+            if isinstance(role_ref, dict):
+                role = role_ref
+            else:
+                try:
+                    role = track_roles.get(str(ObjectId(role_ref)))
+                except (InvalidId, TypeError):
+                    continue
+
+            if not role or not role.get("track_id") or role.get("track_id") == "None":
+                continue
+
+            query, update = membership_upsert(
+                role["track_id"], user["_id"], role.get("position"), role.get("conference_id"), role.get("_id")
+            )
+            operations.append(UpdateOne(query, update, upsert=True))
+
+    if operations:
+        mongo.db.track_memberships.bulk_write(operations, ordered=False)
+    return len(operations)
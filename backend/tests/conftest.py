@@ -0,0 +1,232 @@
+import os
+import sys
+from types import SimpleNamespace
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extensions import mongo
+
+
+MISSING = object()
+
+
+def field_values(document, field):
+    value = document.get(field, MISSING)
+    if value is MISSING:
+        return value, [None]
+    return value, value if isinstance(value, list) else [value]
+
+
+def compare(values, operator, argument):
+    checks = {"$gt": lambda a, b: a > b, "$gte": lambda a, b: a >= b, "$lt": lambda a, b: a < b, "$lte": lambda a, b: a <= b}
+    for item in values:
+        try:
+            if item is not None and checks[operator](item, argument):
+                return True
+        except TypeError:
+            pass
+    return False
+
+
+def matches_condition(value, values, condition):
+    if not (isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition)):
+        return condition == (None if value is MISSING else value) or condition in values
+    for operator, argument in condition.items():
+        if operator == "$in":
+            ok = any(item in argument for item in values)
+        elif operator == "$nin":
+            ok = not any(item in argument for item in values)
+        elif operator == "$ne":
+            ok = not matches_condition(value, values, argument)
+        elif operator == "$exists":
+            ok = (value is not MISSING) == bool(argument)
+        else:
+            ok = compare(values, operator, argument)
+        if not ok:
+            return False
+    return True
+
+
+def matches(document, query):
+    for field, condition in (query or {}).items():
+        if field == "$or":
+            if not any(matches(document, part) for part in condition):
+                return False
+        elif field == "$and":
+            if not all(matches(document, part) for part in condition):
+                return False
+        elif not matches_condition(*field_values(document, field), condition):
+            return False
+    return True
+
+
+def apply_update(document, update):
+    for field, value in update.get("$set", {}).items():
+        document[field] = value
+    for field in update.get("$unset", {}):
+        document.pop(field, None)
+    for field, value in update.get("$inc", {}).items():
+        document[field] = document.get(field, 0) + value
+    for field, value in update.get("$push", {}).items():
+        items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+        document[field] = list(document.get(field) or []) + list(items)
+    for field, value in update.get("$addToSet", {}).items():
+        items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+        current = list(document.get(field) or [])
+        document[field] = current + [item for item in items if item not in current]
+    for field, condition in update.get("$pull", {}).items():
+        document[field] = [item for item in document.get(field) or [] if not matches_condition(item, [item], condition)]
+
+
+def sort_key(value):
+    # Missing and null values sort before everything else, as in MongoDB
+    return (0, 0) if value is MISSING or value is None else (1, value)
+
+
+class FakeCursor(list):
+    def sort(self, key, direction=1):
+        order = [(key, direction)] if isinstance(key, str) else key
+        for field, field_direction in reversed(order):
+            super().sort(key=lambda document: sort_key(document.get(field, MISSING)), reverse=field_direction == -1)
+        return self
+
+    def limit(self, count):
+        return FakeCursor(self[:count]) if count else self
+
+    def batch_size(self, size):
+        return self
+
+
+def project(document, projection):
+    if not projection:
+        return dict(document)
+    return {field: value for field, value in document.items() if field == "_id" or projection.get(field)}
+
+
+class FakeCollection:
+    """In-memory collection for the queries the routes send; every read is logged."""
+
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+        self.documents = []
+        self.unique_keys = []
+
+    def find(self, query=None, projection=None):
+        self.log.append((self.name, query, projection))
+        return FakeCursor(project(document, projection) for document in self.documents if matches(document, query))
+
+    def find_one(self, query=None, projection=None):
+        found = self.find(query, projection)
+        return found[0] if found else None
+
+    def create_index(self, keys, unique=False, **kwargs):
+        fields = [keys] if isinstance(keys, str) else [field for field, _ in keys]
+        if unique:
+            self.unique_keys.append(fields)
+
+    def insert_one(self, document):
+        document.setdefault("_id", ObjectId())
+        for fields in [["_id"], *self.unique_keys]:
+            key = [document.get(field) for field in fields]
+            if any([existing.get(field) for field in fields] == key for existing in self.documents):
+                raise DuplicateKeyError("duplicate key", 11000)
+        self.documents.append(document)
+        return SimpleNamespace(inserted_id=document["_id"])
+
+    def insert_many(self, documents, ordered=True):
+        errors = []
+        for index, document in enumerate(documents):
+            try:
+                self.insert_one(document)
+            except DuplicateKeyError:
+                errors.append({"index": index, "code": 11000})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+        return SimpleNamespace(inserted_ids=[document["_id"] for document in documents])
+
+    def update_one(self, query, update, upsert=False):
+        return self._update(query, update, upsert, many=False)
+
+    def update_many(self, query, update, upsert=False):
+        return self._update(query, update, upsert, many=True)
+
+    def _update(self, query, update, upsert, many):
+        found = [document for document in self.documents if matches(document, query)]
+        if not many:
+            found = found[:1]
+        for document in found:
+            apply_update(document, update)
+        upserted_id = None
+        if not found and upsert:
+            document = {field: value for field, value in query.items()
+                        if not field.startswith("$") and not isinstance(value, dict)}
+            document.update(update.get("$setOnInsert", {}))
+            apply_update(document, update)
+            upserted_id = self.insert_one(document).inserted_id
+        return SimpleNamespace(matched_count=len(found), modified_count=len(found), upserted_id=upserted_id)
+
+    def find_one_and_update(self, query, update, upsert=False, return_document=False):
+        found = next((document for document in self.documents if matches(document, query)), None)
+        before = dict(found) if found else None
+        result = self._update(query, update, upsert, many=False)
+        if return_document:
+            return self.find_one({"_id": found["_id"] if found else result.upserted_id})
+        return before
+
+    def delete_one(self, query):
+        return self._delete(query, many=False)
+
+    def delete_many(self, query):
+        return self._delete(query, many=True)
+
+    def _delete(self, query, many):
+        found = [document for document in self.documents if matches(document, query)]
+        if not many:
+            found = found[:1]
+        self.documents = [document for document in self.documents if not any(document is gone for gone in found)]
+        return SimpleNamespace(deleted_count=len(found))
+
+    def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            self.update_one(operation._filter, operation._doc, operation._upsert)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.log = []
+        self.collections = {}
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(name, self.log)
+        return self.collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return self[name]
+
+    def queries(self, name):
+        """The (query, projection) of every read sent to one collection."""
+        return [(query, projection) for collection, query, projection in self.log if collection == name]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(mongo, "db", database)
+    return database
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.secret_key = "test"
+    return app
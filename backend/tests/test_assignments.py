@@ -0,0 +1,47 @@
+from bson import ObjectId
+import services.assignments as assignments
+from services.assignments import bulk_create_assignments
+
+
+def add_track(db, paper_count=2):
+    paper_ids = [str(ObjectId()) for _ in range(paper_count)]
+    track_id = db.tracks.insert_one({"papers": paper_ids, "assignments": []}).inserted_id
+    db.assignments.create_index([("track_id", 1), ("paper_id", 1), ("reviewer_id", 1)], unique=True)
+    return db.tracks.find_one({"_id": track_id}), paper_ids
+
+
+def test_repeated_bulk_assignment_reports_existing(db, monkeypatch):
+    monkeypatch.setattr(assignments, "find_conflicting_pairs", lambda pairs: set())
+    track, paper_ids = add_track(db)
+    reviewer_id = str(ObjectId())
+    items = [{"paper_id": paper_id, "reviewer_id": reviewer_id} for paper_id in paper_ids]
+
+    first = bulk_create_assignments(track, items + items[:1])
+    again = bulk_create_assignments(track, items)
+
+    assert [result["status"] for result in first] == ["created", "created", "exists"]
+    assert first[2]["assignment_id"] == first[0]["assignment_id"]
+    assert [result["status"] for result in again] == ["exists", "exists"]
+    assert [result["assignment_id"] for result in again] == [result["assignment_id"] for result in first[:2]]
+    assert len(db.assignments.documents) == 2
+    assert db.tracks.documents[0]["assignments"] == [result["assignment_id"] for result in first[:2]]
+
+
+def test_assignment_created_concurrently_is_reported_existing(db, monkeypatch):
+    track, paper_ids = add_track(db)
+    reviewer_id = str(ObjectId())
+    raced_id = str(ObjectId())
+
+    def concurrent_request(pairs):
+        # Another request assigns the first pair between the check and the insert
+        db.assignments.insert_one({"id": raced_id, "track_id": str(track["_id"]),
+                                   "paper_id": paper_ids[0], "reviewer_id": reviewer_id})
+        return set()
+
+    monkeypatch.setattr(assignments, "find_conflicting_pairs", concurrent_request)
+    results = bulk_create_assignments(track, [{"paper_id": paper_id, "reviewer_id": reviewer_id} for paper_id in paper_ids])
+
+    assert [result["status"] for result in results] == ["exists", "created"]
+    assert results[0]["assignment_id"] == raced_id
+    assert len(db.assignments.documents) == 2
+    assert db.tracks.documents[0]["assignments"] == [results[1]["assignment_id"]]
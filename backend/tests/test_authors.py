@@ -0,0 +1,22 @@
+import json
+from services.authors import normalize_all_paper_authors, normalize_authors
+
+
+def test_name_only_legacy_authors_are_kept():
+    authors, emails = normalize_authors(["Ada Lovelace", json.dumps("Turing"), "grace@navy.mil", "  "])
+
+    assert [(author["firstname"], author["lastname"], author["email"]) for author in authors] == [
+        ("Ada", "Lovelace", ""),
+        ("", "Turing", ""),
+        ("", "", "grace@navy.mil"),
+    ]
+    assert emails == ["grace@navy.mil"]
+
+
+def test_normalize_all_paper_authors_keeps_name_only_entries(db):
+    db.papers.insert_one({"authors": json.dumps(["Alan Mathison Turing", {"email": "ADA@example.org", "firstname": "Ada"}])})
+
+    assert normalize_all_paper_authors() == 1
+    paper = db.papers.documents[0]
+    assert [(author["firstname"], author["lastname"]) for author in paper["authors"]] == [("Alan Mathison", "Turing"), ("Ada", "")]
+    assert paper["author_emails"] == ["ada@example.org"]
@@ -0,0 +1,60 @@
+import uuid
+import numpy as np
+from services.auto_assignment import FORBIDDEN, plan_track_assignments, solve_assignment
+
+
+def test_solver_respects_capacity_and_forbidden_pairs():
+    cost = np.zeros((4, 3))
+    # Everyone would rather have reviewer 0, who may only take two papers
+    cost[:, 0] = -10
+    cost[1, :] = FORBIDDEN
+    cost[2, 1] = FORBIDDEN
+
+    pairs = solve_assignment(cost, np.array([2, 2, 2, 2]), np.array([2, 3, 3]))
+
+    assert len(pairs) == len(set(pairs))
+    assert all(cost[i, j] < FORBIDDEN for i, j in pairs)
+    assert (2, 1) not in pairs
+    # Reviewer 0 is used up to the cap, paper 1 has nobody it may go to
+    assert np.bincount([j for _, j in pairs], minlength=3)[0] == 2
+    assert np.bincount([i for i, _ in pairs], minlength=4).tolist() == [2, 0, 2, 2]
+
+def test_plan_keeps_load_cap_conflicts_and_existing_assignments(db):
+    conference_id = str(uuid.uuid4())
+    db.conferences.insert_one({"conference_id": conference_id, "reviewers_per_paper": 2})
+    reviewer_ids = [str(db.users.insert_one({"email": f"r{j}@{conference_id}.test"}).inserted_id) for j in range(3)]
+    paper_ids = [
+        str(db.papers.insert_one({"title": "Affiliation conflict"}).inserted_id),
+        str(db.papers.insert_one({"title": "Own paper", "created_by": reviewer_ids[1]}).inserted_id),
+        str(db.papers.insert_one({"title": "Already assigned"}).inserted_id),
+        str(db.papers.insert_one({"title": "Co-author", "author_emails": [f"coauthor@{conference_id}.test"]}).inserted_id),
+    ]
+    track_id = db.tracks.insert_one({
+        "conference_id": conference_id, "papers": paper_ids, "track_members": reviewer_ids
+    }).inserted_id
+    db.track_conflicts.insert_one({"track_id": str(track_id), "conflicts": [
+        {"member": {"id": reviewer_ids[0]}, "papers": [{"id": paper_ids[0]}]}
+    ]})
+    db.coauthor_edges.insert_one({"email": f"r2@{conference_id}.test", "coauthor": f"coauthor@{conference_id}.test"})
+    db.assignments.insert_one({"track_id": str(track_id), "paper_id": paper_ids[2], "reviewer_id": reviewer_ids[2]})
+    # Reviewer 0 bids on everything and would take every paper without the cap
+    for paper_id in paper_ids:
+        db.bids.insert_one({"track_id": str(track_id), "paper_id": paper_id, "user_id": reviewer_ids[0], "preference": 5})
+
+    plan = plan_track_assignments(db.tracks.find_one({"_id": track_id}), max_load=3)
+
+    planned = [(item["paper_id"], item["reviewer_id"]) for item in plan["assignments"]]
+    assert plan["reviewers_per_paper"] == 2
+    assert len(planned) == len(set(planned))
+    for pair in [(paper_ids[0], reviewer_ids[0]), (paper_ids[1], reviewer_ids[1]),
+                 (paper_ids[2], reviewer_ids[2]), (paper_ids[3], reviewer_ids[2])]:
+        assert pair not in planned
+    loads = {reviewer_id: 0 for reviewer_id in reviewer_ids}
+    loads[reviewer_ids[2]] += 1
+    for _, reviewer_id in planned:
+        loads[reviewer_id] += 1
+    assert max(loads.values()) <= 3
+    assert loads[reviewer_ids[0]] == 3
+    # Every paper but the existing one's gets two new reviewers, that one needs a single more
+    assert sorted(paper_id for paper_id, _ in planned) == sorted(paper_ids[:2] * 2 + paper_ids[2:3] + paper_ids[3:] * 2)
+    assert plan["unfilled"] == []
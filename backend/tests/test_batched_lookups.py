@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+from flask import session
+from routes.chad_routes import send_chad
+from routes.conference_routes import get_series_stats
+from routes.role_routes import get_role_status
+from routes.track_routes import get_track_members
+from services.dataloader import get_loader
+
+
+def add_users(db, count):
+    return [
+        str(db.users.insert_one({"name": f"User{i}", "surname": "Test", "password": "hash", "roles": []}).inserted_id)
+        for i in range(count)
+    ]
+
+
+def assert_single_in_query(db, name):
+    queries = db.queries(name)
+    assert len(queries) == 1, queries
+    query, _ = queries[0]
+    assert any(isinstance(condition, dict) and "$in" in condition for condition in query.values())
+    return queries[0]
+
+
+def test_get_track_members_loads_users_in_one_query(app, db):
+    member_ids = add_users(db, 5)
+    track_id = db.tracks.insert_one({"track_name": "Main", "track_members": member_ids}).inserted_id
+
+    with app.test_request_context():
+        session["user_id"] = member_ids[0]
+        response, status = get_track_members(str(track_id))
+
+    assert status == 200
+    assert [member["_id"] for member in response.get_json()["track_members"]] == member_ids
+    assert len(db.queries("tracks")) == 1
+    assert_single_in_query(db, "users")
+
+
+def test_get_role_status_batches_roles_conferences_and_tracks(app, db):
+    past, active = datetime.utcnow() - timedelta(days=30), datetime.utcnow() + timedelta(days=30)
+    conference_ids = [str(db.conferences.insert_one({"name": f"Conf{i}", "end_date": end}).inserted_id)
+                      for i, end in enumerate([past, active, active])]
+    track_ids = [str(db.tracks.insert_one({"track_name": f"Track{i}"}).inserted_id) for i in range(3)]
+    role_ids = [
+        str(db.roles.insert_one({"conference_id": conference_id, "track_id": track_id, "position": "pc_member"}).inserted_id)
+        for conference_id, track_id in zip(conference_ids, track_ids)
+    ]
+    user_id = db.users.insert_one({"name": "A", "surname": "B", "roles": role_ids}).inserted_id
+
+    with app.test_request_context():
+        session["user_id"] = str(user_id)
+        response, status = get_role_status()
+
+    body = response.get_json()
+    assert status == 200
+    assert [role["conference_name"] for role in body["past_roles"]] == ["Conf0"]
+    assert [role["track_name"] for role in body["active_roles"]] == ["Track1", "Track2"]
+    assert len(db.queries("users")) == 1
+    for name in ("roles", "conferences", "tracks"):
+        assert_single_in_query(db, name)
+
+
+def test_get_series_stats_reads_one_query_per_collection(app, db):
+    member_ids = add_users(db, 4)
+    conference_ids = [
+        db.conferences.insert_one({"pc_members": member_ids[:3]}).inserted_id,
+        db.conferences.insert_one({"pc_members": member_ids[1:]}).inserted_id,
+    ]
+    series_id = db.conference_series.insert_one({"conferences": conference_ids}).inserted_id
+    for member_id in member_ids:
+        db.reviewer_stats.insert_one({
+            "reviewer_id": member_id, "review_count": 2, "total_words": 100, "total_review_time": 48,
+            "total_submit_time": 24, "total_evaluation": 2, "total_rating": 6, "rating_count": 2
+        })
+
+    with app.test_request_context():
+        session["user_id"] = member_ids[0]
+        response, status = get_series_stats(str(series_id))
+
+    stats = response.get_json()["pc_member_stats"]
+    assert status == 200
+    assert sorted(stat["pc_member_name"] for stat in stats) == [f"User{i} Test" for i in range(4)]
+    assert len(db.queries("conference_series")) == 1
+    for name in ("conferences", "reviewer_stats"):
+        assert_single_in_query(db, name)
+    # Only the names are read, never the whole user documents
+    _, projection = assert_single_in_query(db, "users")
+    assert projection == {"name": 1, "surname": 1}
+    assert not db.queries("reviews")
+
+
+def test_get_series_stats_computes_missing_members_in_one_batch(app, db):
+    member_ids = add_users(db, 3)
+    conference_id = db.conferences.insert_one({"pc_members": member_ids, "end_date": datetime(2025, 6, 1)}).inserted_id
+    series_id = db.conference_series.insert_one({"conferences": [conference_id]}).inserted_id
+    track_id = db.tracks.insert_one({"conference_id": str(conference_id)}).inserted_id
+    paper_ids = [str(db.papers.insert_one({"track": str(track_id), "created_at": datetime(2025, 5, 1)}).inserted_id)
+                 for _ in range(4)]
+    for i in range(12):
+        db.reviews.insert_one({
+            "paper_id": paper_ids[i % 4], "reviewer_id": member_ids[i % 3], "created_at": datetime(2025, 5, 11),
+            "evaluation_text": "good paper", "evaluation": 1, "rates": []
+        })
+
+    with app.test_request_context():
+        session["user_id"] = member_ids[0]
+        response, status = get_series_stats(str(series_id))
+
+    stats = response.get_json()["pc_member_stats"]
+    assert status == 200
+    assert len(stats) == 3
+    assert {stat["avg_words_per_review"] for stat in stats} == {2}
+    for name in ("reviewer_stats", "reviews", "papers", "tracks", "users"):
+        assert_single_in_query(db, name)
+    # The PC members, then the deadlines of the reviewed papers
+    assert len(db.queries("conferences")) == 2
+
+
+def test_send_chad_loads_only_the_sender_name(app, db):
+    sender_id, recipient_id = add_users(db, 2)
+
+    with app.test_request_context(json={"to_user": recipient_id, "subject": "Hi", "content": "Hello"}):
+        session["user_id"] = sender_id
+        response, status = send_chad()
+
+    assert status == 201
+    _, projection = assert_single_in_query(db, "users")
+    assert projection == {"name": 1, "surname": 1}
+    notification = db.notifications.documents[0]
+    assert "User0 Test" in notification["content"]
+    assert notification["to_whom"] == recipient_id
+
+
+def test_get_loader_keeps_one_loader_per_projection(app, db):
+    user_id = add_users(db, 1)[0]
+
+    with app.test_request_context():
+        slim = get_loader("users", {"name": 1, "surname": 1})
+        assert get_loader("users", {"surname": 1, "name": 1}) is slim
+        assert "password" not in slim.load(user_id)
+        assert get_loader("users").load(user_id)["password"] == "hash"
@@ -0,0 +1,34 @@
+import base64
+import uuid
+import numpy as np
+from bson import ObjectId
+from flask import session
+from routes.track_routes import get_track_bid_matrix
+
+
+def test_bid_matrix_unpacks_to_the_bids_of_a_uuid_conference_track(app, db):
+    conference_id = str(uuid.uuid4())
+    chair_id, member_id, outsider_id = (str(ObjectId()) for _ in range(3))
+    db.conferences.insert_one({"conference_id": conference_id, "superchairs": [chair_id], "chairs_can_view_bids": True})
+    paper_ids = [str(ObjectId()) for _ in range(3)]
+    track_id = str(db.tracks.insert_one({
+        "conference_id": conference_id, "papers": paper_ids, "track_members": [member_id], "track_chairs": []
+    }).inserted_id)
+    bids = {(paper_ids[0], member_id): 5, (paper_ids[2], member_id): 1, (paper_ids[1], outsider_id): 3}
+    for (paper_id, user_id), preference in bids.items():
+        db.bids.insert_one({"track_id": track_id, "paper_id": paper_id, "user_id": user_id, "preference": preference})
+
+    with app.test_request_context():
+        session["user_id"] = chair_id
+        response, status = get_track_bid_matrix(track_id)
+
+    body = response.get_json()
+    assert status == 200
+    assert body["paper_ids"] == paper_ids
+    assert body["user_ids"] == [member_id, outsider_id]
+    matrix = np.frombuffer(base64.b64decode(body["matrix"]), dtype=body["dtype"]).reshape(body["shape"])
+    unpacked = {
+        (body["paper_ids"][i], body["user_ids"][j]): int(matrix[i, j])
+        for i, j in zip(*np.nonzero(matrix))
+    }
+    assert unpacked == bids
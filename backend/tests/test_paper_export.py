@@ -0,0 +1,48 @@
+import csv
+import io
+import uuid
+import zipfile
+from bson import ObjectId
+from flask import session
+from werkzeug.datastructures import FileStorage
+from config import Config
+from routes.track_routes import export_track_papers
+from services.storage import store_upload
+
+
+def test_track_export_is_a_zip_with_its_manifest(app, db, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "UPLOAD_FOLDER", str(tmp_path))
+    conference_id = str(uuid.uuid4())
+    chair_id = str(ObjectId())
+    db.conferences.insert_one({"conference_id": conference_id, "superchairs": [chair_id]})
+
+    stored = store_upload(FileStorage(io.BytesIO(b"%PDF-1.4 accepted paper"), "a.pdf"))
+    paper_ids = [
+        db.papers.insert_one({
+            "title": "Accepted paper", "authors": ["Ada Lovelace", "grace@navy.mil"], "decision": True,
+            "paper_path": stored["path"], "file_sha256": stored["sha256"],
+            "storage_backend": stored["backend"], "storage_key": stored["key"]
+        }).inserted_id,
+        db.papers.insert_one({"title": "Lost file", "decision": True, "paper_path": "/nowhere/lost.pdf"}).inserted_id,
+        db.papers.insert_one({"title": "Rejected paper", "decision": False}).inserted_id,
+    ]
+    track_id = str(db.tracks.insert_one({
+        "track_name": "Main", "conference_id": conference_id, "papers": [str(paper_id) for paper_id in paper_ids]
+    }).inserted_id)
+
+    with app.test_request_context(query_string={"decision": "accepted"}):
+        session["user_id"] = chair_id
+        response = export_track_papers(track_id)
+        assert response.mimetype == "application/zip"
+        data = b"".join(response.response)
+
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert archive.testzip() is None
+    names = archive.namelist()
+    assert names[0] == "manifest.csv"
+    rows = list(csv.DictReader(io.StringIO(archive.read("manifest.csv").decode("utf-8-sig"))))
+    assert [row["title"] for row in rows] == ["Accepted paper", "Lost file"]
+    assert rows[0]["authors"] == "Ada Lovelace; grace@navy.mil"
+    assert rows[0]["decision"] == "accepted"
+    assert archive.read(rows[0]["file"]) == b"%PDF-1.4 accepted paper"
+    assert archive.read("missing.txt").decode().split() == [rows[1]["file"]]
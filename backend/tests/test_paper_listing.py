@@ -0,0 +1,46 @@
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from flask import session
+from routes.paper_routes import get_all_papers
+
+
+def read_all_pages(app, params):
+    ids, pages, cursor = [], 0, None
+    while True:
+        query = {**params, **({"cursor": cursor} if cursor else {})}
+        with app.test_request_context(query_string=query):
+            session["user_id"] = str(ObjectId())
+            response, status = get_all_papers()
+        assert status == 200
+        body = response.get_json()
+        ids.extend(paper["_id"] for paper in body["papers"])
+        pages += 1
+        cursor = body["next_cursor"]
+        if not cursor:
+            return ids, pages
+
+
+@pytest.mark.parametrize("sort", [None, "avg_acceptance", "-avg_acceptance", "submission_date", "-submission_date"])
+def test_cursor_pages_return_every_paper_once(app, db, sort):
+    # Repeated and missing sort values, so the _id tie-break and the null handling are both needed
+    scores = [None, 1.5, 0.0, 1.5, -2.0, None, 0.0, 1.5, 2.0, None, -1.0]
+    for i, score in enumerate(scores):
+        paper = {"title": f"Paper {i}", "submission_date": datetime(2025, 1, 1 + i % 4)}
+        if score is not None:
+            paper["avg_acceptance"] = score
+        db.papers.insert_one(paper)
+
+    params = {"limit": 3, "fields": "title"}
+    if sort:
+        params["sort"] = sort
+    ids, pages = read_all_pages(app, params)
+
+    expected = db.papers.find()
+    if sort:
+        field = sort.lstrip("-")
+        direction = -1 if sort.startswith("-") else 1
+        expected = expected.sort([(field, direction), ("_id", direction)])
+    assert ids == [str(paper["_id"]) for paper in expected]
+    assert len(set(ids)) == len(scores)
+    assert pages == 4
@@ -0,0 +1,49 @@
+import io
+import os
+from bson import ObjectId
+from flask import session
+from werkzeug.datastructures import FileStorage
+from config import Config
+from routes.paper_routes import submit_paper
+from services.storage import blob_path, release_upload, store_upload
+
+PDF = b"%PDF-1.4 same content"
+
+
+def stored_paper(stored):
+    return {"storage_backend": stored["backend"], "storage_key": stored["key"], "file_sha256": stored["sha256"]}
+
+
+def test_blob_is_deleted_with_its_last_reference(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "UPLOAD_FOLDER", str(tmp_path))
+    first = store_upload(FileStorage(io.BytesIO(PDF), "a.pdf"))
+    second = store_upload(FileStorage(io.BytesIO(PDF), "b.pdf"))
+
+    assert second["key"] == first["key"] and second["deduplicated"]
+    assert db.blob_refs.documents[0]["count"] == 2
+
+    release_upload(stored_paper(first))
+    assert os.path.exists(blob_path(first["key"]))
+    assert db.blob_refs.documents[0]["count"] == 1
+
+    release_upload(stored_paper(second))
+    assert not os.path.exists(blob_path(first["key"]))
+    assert db.blob_refs.documents == []
+
+
+def test_failed_submission_releases_its_upload(app, db, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "UPLOAD_FOLDER", str(tmp_path))
+    track_id = str(db.tracks.insert_one({"track_name": "Main", "papers": []}).inserted_id)
+
+    def failing_insert(document):
+        raise RuntimeError("write failed")
+
+    monkeypatch.setattr(db.papers, "insert_one", failing_insert)
+    data = {"title": "T", "track_id": track_id, "conference_id": str(ObjectId()), "file": (io.BytesIO(PDF), "paper.pdf")}
+    with app.test_request_context(method="POST", data=data, content_type="multipart/form-data"):
+        session["user_id"] = str(ObjectId())
+        response, status = submit_paper()
+
+    assert status == 500
+    assert db.blob_refs.documents == []
+    assert not any(files for _, _, files in os.walk(tmp_path) if files)
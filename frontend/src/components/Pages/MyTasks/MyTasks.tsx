@@ -266,7 +266,7 @@ const MyTasks: React.FC = () => {
                   <TableRow key={paper._id}>
                     <TableCell style={titleCellStyle}>{paper.title}</TableCell>
                     <TableCell style={tableCellStyle}>
-                      {formatAuthors(JSON.parse(paper.authors))}
+                      {formatAuthors(typeof paper.authors === "string" ? JSON.parse(paper.authors) : paper.authors)}
                     </TableCell>
                     <TableCell style={tableCellStyle}>
                       {trackNames[paper.track] || "Loading..."}
@@ -311,7 +311,7 @@ const MyTasks: React.FC = () => {
                   <TableRow key={paper._id}>
                     <TableCell style={titleCellStyle}>{paper.title}</TableCell>
                     <TableCell style={tableCellStyle}>
-                      {formatAuthors(JSON.parse(paper.authors))}
+                      {formatAuthors(typeof paper.authors === "string" ? JSON.parse(paper.authors) : paper.authors)}
                     </TableCell>
                     <TableCell style={tableCellStyle}>
                       {trackNames[paper.track] || "Loading..."}
@@ -82,9 +82,9 @@ const ReviewPage: React.FC = () => {
     fetchTrackName();
   }, [paper?.track]);
 
-  const formatAuthors = (authors: string) => {
+  const formatAuthors = (authors: any) => {
     try {
-      const authorArray = JSON.parse(authors);
+      const authorArray = typeof authors === "string" ? JSON.parse(authors) : authors;
       return authorArray
         .map((author: any) => `${author.lastname}, ${author.firstname}`)
         .join("; ");
@@ -77,9 +77,9 @@ const SelectPaperItem: React.FC<SelectPaperItemProps> = ({
   selectedIds,
   onToggle,
 }) => {
-  const formatAuthors = (authors: string) => {
+  const formatAuthors = (authors: any) => {
     try {
-      const authorArray = JSON.parse(authors);
+      const authorArray = typeof authors === "string" ? JSON.parse(authors) : authors;
       return authorArray
         .map((author: any) => `${author.lastname}, ${author.firstname}`)
         .join("; ");
@@ -112,7 +112,7 @@ const SelectPaperPopup: React.FC<Props> = ({
           data.papers.map((p: any) => ({
             id: p._id,
             title: p.title,
-            authors: p.authors.join(", "),
+            authors: JSON.stringify(p.authors),
           }))
         );
       } catch (error) {